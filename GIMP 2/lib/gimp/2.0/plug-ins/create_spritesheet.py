@@ -6,11 +6,200 @@
 # current image size will be the spritesheet frame sizes
 #
 # 2022-04-30 script updated by BdR
+# optional coordinates file and automatic frame size, see readme
 
 from gimpfu import *
 import math
+import os
+import re
 
-def create_spritesheet(image, tileLayout, spriteCenter):
+SPRITESHEET_PLUGIN_VERSION = "v0.2"
+
+# spritesheet frame metadata
+class sheetFrame(object):
+    def __init__(self, n, x, y, w, h):
+        # remove file extension, same as the spriteatlas layer names
+        if n.endswith(('.png', '.jpg')):
+            n = os.path.splitext(n)[0]
+        self.name = n
+        self.pack_x = x
+        self.pack_y = y
+        self.width = w
+        self.height = h
+
+def layer_alpha_bounds(layer):
+    # Determine bounding box of all non-transparent pixels of a layer,
+    # returns (x, y, w, h) in image coordinates or None when layer is fully transparent
+    xOffset, yOffset = layer.offsets
+    w = layer.width
+    h = layer.height
+    if not layer.has_alpha:
+        return (xOffset, yOffset, w, h)
+
+    # read all pixels at once, then only keep the alpha channel bytes
+    bpp = layer.bpp
+    rgn = layer.get_pixel_rgn(0, 0, w, h, False, False)
+    alpha = rgn[0:w, 0:h][bpp-1::bpp]
+
+    # scan the rows using string functions instead of a per-pixel loop
+    top = -1
+    bottom = -1
+    left = w
+    right = 0
+    for y in xrange(0, h):
+        row = alpha[y*w:(y+1)*w]
+        stripped = row.lstrip('\x00')
+        if not stripped:
+            continue
+        if top < 0:
+            top = y
+        bottom = y
+        left = min(left, w - len(stripped))
+        right = max(right, len(row.rstrip('\x00')))
+
+    if top < 0:
+        return None
+    return (xOffset + left, yOffset + top, right - left, bottom - top + 1)
+
+def calc_common_frame(image, layers):
+    # Smallest frame that contains the visible pixels of all layers,
+    # using one box for all frames keeps the sprites aligned within an animation
+    x1 = image.width
+    y1 = image.height
+    x2 = 0
+    y2 = 0
+    for lyr in layers:
+        bounds = layer_alpha_bounds(lyr)
+        if bounds is None:
+            continue
+        x, y, w, h = bounds
+        # clip to image size, same as the frame sizes without auto-detect
+        x1 = min(x1, max(x, 0))
+        y1 = min(y1, max(y, 0))
+        x2 = max(x2, min(x + w, image.width))
+        y2 = max(y2, min(y + h, image.height))
+
+    if x2 <= x1 or y2 <= y1:
+        # all layers are empty, fall back to image size
+        return (0, 0, image.width, image.height)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+def write_spritesheet_jsonarray(filename, filetag, frames, img_w, img_h):
+    stroutput = "{\n\t\"frames\":["
+
+    # insert all sprite metadata, separated by commas (none when there are no frames)
+    frames_data = []
+    for obj in frames:
+        frame_str = '\n\t\t{"filename":"%s","frame":{"x":%d,"y":%d,"w":%d,"h":%d},"rotated":false,"trimmed":false,' % (obj.name, obj.pack_x, obj.pack_y, obj.width, obj.height)
+        frame_str += '"spriteSourceSize":{"x":0,"y":0,"w":%d,"h":%d},' % (obj.width, obj.height)
+        frame_str += '"sourceSize":{"w":%d,"h":%d}}' % (obj.width, obj.height)
+        frames_data.append(frame_str)
+    stroutput += ",".join(frames_data)
+
+    # meta data
+    stroutput += "\n\t],\n"
+    stroutput += "\t\"meta\":{\n"
+    stroutput += "\t\t\"app\":\"https://github.com/BdR76/GimpSpriteAtlas/\",\n"
+    stroutput += "\t\t\"version\":\"GIMP Spritesheet plug-in %s\",\n" % SPRITESHEET_PLUGIN_VERSION
+    stroutput += ("\t\t\"image\":\"%s.png\",\n" % filetag)
+    stroutput += ("\t\t\"size\":{\"w\":%d,\"h\":%d},\n" % (img_w, img_h))
+    stroutput += "\t\t\"scale\":1\n"
+    stroutput += "\t}\n"
+    stroutput += "}"
+
+    # export coordinate variables to textfile
+    outputfile = open('%s.json' % filename, 'w')
+    outputfile.write(stroutput)
+    outputfile.close()
+    return
+
+def write_spritesheet_jsonhash(filename, filetag, frames, img_w, img_h):
+    stroutput = "{\n\t\"frames\":{"
+
+    # insert all sprite metadata, separated by commas (none when there are no frames)
+    frames_data = []
+    for obj in frames:
+        frame_str = '\n\t\t"%s":{"frame":{"x":%d,"y":%d,"w":%d,"h":%d},"rotated":false,"trimmed":false,' % (obj.name, obj.pack_x, obj.pack_y, obj.width, obj.height)
+        frame_str += '"spriteSourceSize":{"x":0,"y":0,"w":%d,"h":%d},' % (obj.width, obj.height)
+        frame_str += '"sourceSize":{"w":%d,"h":%d}}' % (obj.width, obj.height)
+        frames_data.append(frame_str)
+    stroutput += ",".join(frames_data)
+
+    # meta data
+    stroutput += "\n\t},\n"
+    stroutput += "\t\"meta\":{\n"
+    stroutput += "\t\t\"app\":\"https://github.com/BdR76/GimpSpriteAtlas/\",\n"
+    stroutput += "\t\t\"version\":\"GIMP Spritesheet plug-in %s\",\n" % SPRITESHEET_PLUGIN_VERSION
+    stroutput += ("\t\t\"image\":\"%s.png\",\n" % filetag)
+    stroutput += ("\t\t\"size\":{\"w\":%d,\"h\":%d},\n" % (img_w, img_h))
+    stroutput += "\t\t\"scale\":1\n"
+    stroutput += "\t}\n"
+    stroutput += "}"
+
+    # export coordinate variables to textfile
+    outputfile = open('%s.json' % filename, 'w')
+    outputfile.write(stroutput)
+    outputfile.close()
+    return
+
+def write_spritesheet_libgdx(filename, filetag, frames, img_w, img_h):
+
+    stroutput = ("%s.png\nsize: %d,%d\nformat: RGBA8888\nfilter: Linear,Linear\nrepeat: none\n" % (filetag, img_w, img_h))
+
+    # insert all sprite metadata
+    for obj in frames:
+        stroutput +=  ("%s\n  rotate: false\n  xy: %d, %d\n  size: %d, %d\n  orig: %d, %d\n  offset: 0, 0\n  index: -1\n" % (obj.name, obj.pack_x, obj.pack_y, obj.width, obj.height, obj.width, obj.height))
+
+    # export coordinate variables to textfile
+    outputfile = open('%s.atlas' % filename, 'w')
+    outputfile.write(stroutput)
+    outputfile.close()
+    return
+
+def css_class_name(name):
+    # CSS class names can only have letters, digits, '-' and '_' and can't start with a digit,
+    # other characters become '_', same as the GIMP 3 plug-in
+    name = re.sub('[^A-Za-z0-9_-]', '_', name)
+    if re.match('-?[0-9]', name) or not name:
+        name = '_' + name
+    return name
+
+def write_spritesheet_css(filename, filetag, frames):
+
+    stroutput = "/* GIMP Spritesheet plug-in %s */\n" % SPRITESHEET_PLUGIN_VERSION
+
+    # insert all sprite metadata
+    for obj in frames:
+        stroutput += ".%s {\n" % css_class_name(obj.name)
+        stroutput += "\tbackground: url('%s.png') no-repeat -%dpx -%dpx;\n" % (filetag, obj.pack_x, obj.pack_y)
+        stroutput += "\twidth: %dpx;\n" % obj.width
+        stroutput += "\theight: %dpx;\n" % obj.height
+        stroutput += "}\n"
+
+    # export coordinate variables to textfile
+    outputfile = open('%s.css' % filename, 'w')
+    outputfile.write(stroutput)
+    outputfile.close()
+    return
+
+def write_spritesheet_xml(filename, filetag, frames):
+
+    stroutput = ('<TextureAtlas imagePath="%s.png">\n' % filetag)
+    stroutput += '\t<!-- GIMP Spritesheet plug-in %s -->\n' % SPRITESHEET_PLUGIN_VERSION
+
+    # insert all sprite metadata
+    for obj in frames:
+        stroutput += '\t<SubTexture name="%s" x="%d" y="%d" width="%d" height="%d"/>\n' % (obj.name, obj.pack_x, obj.pack_y, obj.width, obj.height)
+
+    stroutput += '</TextureAtlas>\n'
+
+    # export coordinate variables to textfile
+    outputfile = open('%s.xml' % filename, 'w')
+    outputfile.write(stroutput)
+    outputfile.close()
+    return
+
+def create_spritesheet(image, tileLayout, spriteCenter, autoFrameSize, filetag, foldername, outputtype):
 
     # Grab all the layers from the original image, each one of which will become an animation frame
     layers = image.layers
@@ -24,10 +213,12 @@ def create_spritesheet(image, tileLayout, spriteCenter):
         numRows = 1 if (tileLayout == 2) else numLayers # Single row
         numCols = 1 if (tileLayout == 3) else numLayers # Single column
 
-    # Determine frame sizes = current image size
-    frameWidth = image.width
-    frameHeight = image.height
-    
+    # Determine frame sizes = current image size, or smallest size that fits all layers
+    if autoFrameSize:
+        frameX, frameY, frameWidth, frameHeight = calc_common_frame(image, layers)
+    else:
+        frameX, frameY, frameWidth, frameHeight = (0, 0, image.width, image.height)
+
     # Determine new image size, based on the number of rows and columns
     newImgWidth = frameWidth * numCols
     newImgHeight = frameHeight * numRows
@@ -37,11 +228,12 @@ def create_spritesheet(image, tileLayout, spriteCenter):
     newLayer = gimp.Layer(newImage, "Spritesheet", newImgWidth, newImgHeight, RGBA_IMAGE, 100, NORMAL_MODE)
     newImage.add_layer(newLayer, 1)
 
-    # Select image size to ensure uniformly-sized frames (i.e. when original layer is larger than image then "crop" to image size)
-    pdb.gimp_selection_all(image)
+    # Select frame area to ensure uniformly-sized frames (i.e. when original layer is larger than frame then "crop" to frame size)
+    pdb.gimp_image_select_rectangle(image, CHANNEL_OP_REPLACE, frameX, frameY, frameWidth, frameHeight)
 
     # go through all layers (GIMP Layers used to be in the reverse order, not anymore)
     layerIndex = 0
+    frames = []
 
     # Loop over our spritesheet grid filling each one row at a time
     for y in xrange(0, numRows):
@@ -49,33 +241,59 @@ def create_spritesheet(image, tileLayout, spriteCenter):
             # check layerIndex because it's possible there are less layers than grid positions
             # i.e. cannot always fill out entire grid, last tile positions will just be empty
             if layerIndex < numLayers:
-                # Copy the layer's contents and paste it into a "floating" layer in the new image
-                pdb.gimp_edit_copy(layers[layerIndex])
-                floatingLayer = pdb.gimp_edit_paste(newLayer, TRUE)
-
                 # Arrange frames as tiles from top-left to bottom-right
                 xPos = x * frameWidth
                 yPos = y * frameHeight
-                
-                # Floating layer defaults to center, get current offset and corrent for desired position
-                xOffset, yOffset = floatingLayer.offsets
-                xOffset = xPos - xOffset
-                yOffset = yPos - yOffset
+                frames.append(sheetFrame(layers[layerIndex].name, xPos, yPos, frameWidth, frameHeight))
 
-                # center if needed (i.e. when layer size is smaller than frame size)
-                if spriteCenter and (floatingLayer.width < frameWidth):
-                    xOffset += (frameWidth - floatingLayer.width) / 2
-                if spriteCenter and (floatingLayer.height < frameHeight):
-                    yOffset += (frameHeight - floatingLayer.height) / 2
+                # Copy the layer's contents and paste it into a "floating" layer in the new image
+                # (nothing to paste when the layer is completely outside the frame)
+                if pdb.gimp_edit_copy(layers[layerIndex]):
+                    floatingLayer = pdb.gimp_edit_paste(newLayer, TRUE)
 
-                # Move the floating layer into the correct position
-                pdb.gimp_layer_translate(floatingLayer, xOffset, yOffset)
+                    # Floating layer defaults to center, get current offset and correct for desired position
+                    xOffset, yOffset = floatingLayer.offsets
+                    xOffset = xPos - xOffset
+                    yOffset = yPos - yOffset
+
+                    # with a detected frame size, keep the layer position relative to the common frame,
+                    # the frame fits around all layers so centering would move the layer a second time
+                    if autoFrameSize:
+                        lyrX, lyrY = layers[layerIndex].offsets
+                        xOffset += max(lyrX - frameX, 0)
+                        yOffset += max(lyrY - frameY, 0)
+
+                    # otherwise center if needed (i.e. when layer size is smaller than frame size)
+                    else:
+                        if spriteCenter and (floatingLayer.width < frameWidth):
+                            xOffset += (frameWidth - floatingLayer.width) / 2
+                        if spriteCenter and (floatingLayer.height < frameHeight):
+                            yOffset += (frameHeight - floatingLayer.height) / 2
+
+                    # Move the floating layer into the correct position
+                    pdb.gimp_layer_translate(floatingLayer, xOffset, yOffset)
 
                 # Move to the next layer index
                 layerIndex = layerIndex + 1
 
     # Merge the last floating layer into our final 'Spritesheet' layer
     pdb.gimp_image_merge_visible_layers(newImage, 0)
+    pdb.gimp_selection_none(image)
+
+    # write coordinates file, same formats as the spriteatlas plug-in
+    if outputtype > 0:
+        outputname = os.path.join(foldername, filetag)
+        pdb.gimp_file_save(newImage, newImage.active_layer, '%s.png' % outputname, '%s.png' % outputname)
+        if outputtype == 1:
+            write_spritesheet_jsonarray(outputname, filetag, frames, newImgWidth, newImgHeight)
+        elif outputtype == 2:
+            write_spritesheet_jsonhash(outputname, filetag, frames, newImgWidth, newImgHeight)
+        elif outputtype == 3:
+            write_spritesheet_libgdx(outputname, filetag, frames, newImgWidth, newImgHeight)
+        elif outputtype == 4:
+            write_spritesheet_css(outputname, filetag, frames)
+        else: # outputtype == 5
+            write_spritesheet_xml(outputname, filetag, frames)
 
     # Create and show a new image window for our spritesheet
     gimp.Display(newImage)
@@ -94,7 +312,11 @@ register(
     [
         (PF_IMAGE, "image", "Input image:", None),
         (PF_RADIO, "tileLayout", "Spritesheet layout:", 1, (("Grid", 1), ("Single row", 2), ("Single column", 3))),
-        (PF_BOOL, "spriteCenter", "Center sprite in frame\n(when sprites are smaller)", TRUE)
+        (PF_BOOL, "spriteCenter", "Center sprite in frame\n(when sprites are smaller)", TRUE),
+        (PF_BOOL, "autoFrameSize", "Detect smallest frame size\n(crop transparent borders)", FALSE),
+        (PF_STRING, "fileName", "Export file name (without extension):", "spritesheet"),
+        (PF_DIRNAME, "outputFolder", "Export to folder:", "/tmp"),
+        (PF_RADIO, "fileType", "Export coordinates file:", 0, (("None (don't export)", 0), ("JSON-TexturePacker Array", 1), ("JSON-TexturePacker Hash", 2), ("libGDX TextureAtlas", 3), ("CSS", 4), ("XML", 5)))
     ],
     [],
     create_spritesheet, menu="<Image>/Filters/Animation/")
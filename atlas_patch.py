@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Atlas patches for the GIMP SpriteAtlas plug-in
+# the changed pixel rectangles and sprite coordinates between two builds of an atlas,
+# so a game can update its cached texture instead of downloading the whole atlas again
+# plain Python, no GIMP dependencies, pixels are 8-bit RGBA rows top to bottom
+#
+# verify a patch of a PNG atlas from the command line:
+#   python atlas_patch.py previous.png sprites.patch [sprites.png]
+
+import hashlib
+import json
+import struct
+import sys
+import zlib
+
+import png_writer
+
+PATCH_MAGIC = b'GSAP'
+PATCH_VERSION = 1
+# magic, version, previous width, height, new width, height, sha-256 of previous and new pixels, rectangle count
+PATCH_HEADER = struct.Struct('<4sIIIII32s32sI')
+# x, y, width, height, compressed size
+PATCH_RECT = struct.Struct('<IIIII')
+
+def pixels_hash(pixels):
+    return hashlib.sha256(pixels).digest()
+
+def resize_canvas(pixels, width, height, new_width, new_height):
+    # keep the pixels at the top-left, new area is transparent, pixels outside are cut off
+    if (width, height) == (new_width, new_height):
+        return bytes(pixels)
+    stride = width * 4
+    new_stride = new_width * 4
+    copy = min(stride, new_stride)
+    out = bytearray(new_stride * new_height)
+    for y in range(min(height, new_height)):
+        out[y * new_stride:y * new_stride + copy] = pixels[y * stride:y * stride + copy]
+    return bytes(out)
+
+def diff_atlas(old_pixels, old_w, old_h, new_pixels, new_w, new_h, tile=16):
+    # changed rectangles between two atlases, compared in tiles of tile x tile pixels,
+    # neighbouring changed tiles in the same row of tiles are merged into one rectangle
+    base = resize_canvas(old_pixels, old_w, old_h, new_w, new_h)
+    stride = new_w * 4
+    cols = (new_w + tile - 1) // tile
+    rects = []
+    for band_y in range(0, new_h, tile):
+        band_h = min(tile, new_h - band_y)
+        changed = [False] * cols
+        for y in range(band_y, band_y + band_h):
+            row = slice(y * stride, (y + 1) * stride)
+            if base[row] == new_pixels[row]:
+                continue
+            for c in range(cols):
+                if not changed[c]:
+                    i = y * stride + c * tile * 4
+                    j = min(i + tile * 4, (y + 1) * stride)
+                    changed[c] = base[i:j] != new_pixels[i:j]
+        c = 0
+        while c < cols:
+            if not changed[c]:
+                c += 1
+                continue
+            start = c
+            while c < cols and changed[c]:
+                c += 1
+            x = start * tile
+            rects.append((x, band_y, min(c * tile, new_w) - x, band_h))
+    return rects
+
+def crop_pixels(pixels, width, x, y, w, h):
+    stride = width * 4
+    return b''.join(pixels[(y + r) * stride + x * 4:(y + r) * stride + (x + w) * 4] for r in range(h))
+
+def coordinate_changes(old_frames, new_frames):
+    # sprites that are new or moved or resized, and sprites that were removed,
+    # frames are dictionaries of name -> (x, y, w, h)
+    changed = {name: frame for name, frame in new_frames.items() if old_frames.get(name) != tuple(frame)}
+    removed = sorted(name for name in old_frames if name not in new_frames)
+    return {"changed": {name: list(frame) for name, frame in sorted(changed.items())}, "removed": removed}
+
+def write_patch(outputfile, old_pixels, old_w, old_h, new_pixels, new_w, new_h, old_frames, new_frames, tile=16):
+    # write a patch to an open binary file, returns the number of changed rectangles
+    rects = diff_atlas(old_pixels, old_w, old_h, new_pixels, new_w, new_h, tile)
+    outputfile.write(PATCH_HEADER.pack(PATCH_MAGIC, PATCH_VERSION, old_w, old_h, new_w, new_h,
+                                       pixels_hash(old_pixels), pixels_hash(new_pixels), len(rects)))
+    for x, y, w, h in rects:
+        data = zlib.compress(crop_pixels(new_pixels, new_w, x, y, w, h), 9)
+        outputfile.write(PATCH_RECT.pack(x, y, w, h, len(data)))
+        outputfile.write(data)
+    coordinates = zlib.compress(json.dumps(coordinate_changes(old_frames, new_frames)).encode('utf-8'), 9)
+    outputfile.write(struct.pack('<I', len(coordinates)))
+    outputfile.write(coordinates)
+    return len(rects)
+
+class AtlasPatch(object):
+    # a patch read back from file
+    def __init__(self, filename):
+        with open(filename, 'rb') as inputfile:
+            data = inputfile.read()
+        magic, version, self.old_w, self.old_h, self.new_w, self.new_h, self.old_hash, self.new_hash, count = \
+            PATCH_HEADER.unpack_from(data, 0)
+        if magic != PATCH_MAGIC or version != PATCH_VERSION:
+            raise ValueError(f"{filename} is not an atlas patch file")
+        pos = PATCH_HEADER.size
+        self.rects = []
+        for _ in range(count):
+            x, y, w, h, size = PATCH_RECT.unpack_from(data, pos)
+            pos += PATCH_RECT.size
+            self.rects.append((x, y, w, h, zlib.decompress(data[pos:pos + size])))
+            pos += size
+        size = struct.unpack_from('<I', data, pos)[0]
+        self.coordinates = json.loads(zlib.decompress(data[pos + 4:pos + 4 + size]).decode('utf-8'))
+
+    def apply(self, old_pixels):
+        # new atlas pixels from the previous atlas pixels, raises ValueError when a hash doesn't match
+        if pixels_hash(old_pixels) != self.old_hash:
+            raise ValueError("previous atlas does not match the patch")
+        pixels = bytearray(resize_canvas(old_pixels, self.old_w, self.old_h, self.new_w, self.new_h))
+        stride = self.new_w * 4
+        for x, y, w, h, data in self.rects:
+            for r in range(h):
+                i = (y + r) * stride + x * 4
+                pixels[i:i + w * 4] = data[r * w * 4:(r + 1) * w * 4]
+        if pixels_hash(pixels) != self.new_hash:
+            raise ValueError("patched atlas does not match the new atlas hash")
+        return bytes(pixels)
+
+def main(args):
+    # apply a patch to the previous atlas and check the result, optionally against the new atlas file
+    if len(args) not in (2, 3):
+        print("usage: python atlas_patch.py previous.png sprites.patch [sprites.png]")
+        return 2
+    for filename in args[0:1] + args[2:]:
+        with open(filename, 'rb') as inputfile:
+            if inputfile.read(len(png_writer.PNG_SIGNATURE)) != png_writer.PNG_SIGNATURE:
+                # the plug-in makes patches for WebP atlases too, but only PNG can be decoded here
+                print(f"{filename} is not a PNG file, patches can only be checked for PNG atlases")
+                return 2
+    old_w, old_h, old_pixels = png_writer.read_png(args[0])
+    patch = AtlasPatch(args[1])
+    if (old_w, old_h) != (patch.old_w, patch.old_h):
+        print(f"previous atlas is {old_w}x{old_h}, patch expects {patch.old_w}x{patch.old_h}")
+        return 1
+    try:
+        pixels = patch.apply(old_pixels)
+    except ValueError as e:
+        print(f"patch failed: {e}")
+        return 1
+    if len(args) == 3:
+        new_w, new_h, new_pixels = png_writer.read_png(args[2])
+        if (new_w, new_h, new_pixels) != (patch.new_w, patch.new_h, pixels):
+            print(f"patched atlas differs from {args[2]}")
+            return 1
+    print(f"patch OK: {len(patch.rects)} rectangles, {len(patch.coordinates['changed'])} changed and "
+          f"{len(patch.coordinates['removed'])} removed sprites, {patch.new_w}x{patch.new_h} sha256 {patch.new_hash.hex()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
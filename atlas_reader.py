@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Atlas reader for the GIMP SpriteAtlas plug-in
+# reads the coordinate files in all export formats (JSON Array, JSON Hash, libGDX, CSS, XML)
+# into one frame model, and checks that the frames are valid
+# plain Python, no GIMP dependencies
+#
+# validate atlas files from the command line, exit code 1 when there are errors:
+#   python atlas_reader.py [--no-overlaps] sprites.json [more files]
+
+import bisect
+import itertools
+import json
+import operator
+import os
+import re
+import sys
+import xml.etree.ElementTree as ElementTree
+
+class AtlasFrame(object):
+    # one sprite in the atlas, x y w h is the frame in the atlas image (before rotation),
+    # source is the position and size of the frame within the original untrimmed sprite,
+    # rotated is how the frame is turned in the atlas, 0, 90 (clockwise) or 270 degrees
+    __slots__ = ('name', 'x', 'y', 'w', 'h', 'rotated', 'source_x', 'source_y', 'source_w', 'source_h',
+                 'index', 'pivot', 'split', 'pad')
+
+    def __init__(self, name, x, y, w, h, rotated=0, index=-1):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.rotated = rotated
+        self.source_x = 0
+        self.source_y = 0
+        self.source_w = w
+        self.source_h = h
+        self.index = index  # animation frame number, -1 when not part of an animation
+        self.pivot = None   # (x, y) relative to the sprite size
+        self.split = None   # nine-slice borders (left, right, top, bottom) in pixels
+        self.pad = None     # content padding (left, right, top, bottom) in pixels
+
+    def footprint(self):
+        # rectangle the frame covers in the atlas image, rotated frames are stored 90 degrees turned
+        if self.rotated:
+            return self.x, self.y, self.h, self.w
+        return self.x, self.y, self.w, self.h
+
+    def trimmed(self):
+        return (self.source_x, self.source_y, self.source_w, self.source_h) != (0, 0, self.w, self.h)
+
+    def key(self):
+        # name index key, animation frames in libGDX share a name and differ in index
+        return self.name if self.index < 0 else (self.name, self.index)
+
+class Atlas(object):
+    # All frames of an atlas file, width and height are None when the format doesn't store them.
+    # JSON files keep the parsed frame records and only make AtlasFrame objects when the frames
+    # are used, validating a large atlas doesn't need them.
+    def __init__(self, image, width=None, height=None):
+        self.image = image
+        self.width = width
+        self.height = height
+        self._frames = []
+        self._index = None
+        self._records = None # (name, JSON frame) pairs, not turned into frames yet
+
+    @property
+    def frames(self):
+        if self._records is not None:
+            self._frames = [json_frame(name, f) for name, f in self._records]
+            self._records = None
+        return self._frames
+
+    @property
+    def index(self):
+        # frames by key, the first frame wins when a key is used twice
+        if self._index is None:
+            self._index = {}
+            for frame in self.frames:
+                self._index.setdefault(frame.key(), frame)
+        return self._index
+
+    def __len__(self):
+        return len(self._records) if self._records is not None else len(self._frames)
+
+    def add(self, frame):
+        self.frames.append(frame)
+        if self._index is not None:
+            self._index.setdefault(frame.key(), frame)
+
+    def find(self, name, index=-1):
+        # frame by name, and by frame number for libGDX animation frames, None when not found
+        return self.index.get(name if index < 0 else (name, index))
+
+    def columns(self):
+        # names, keys and the footprint x, y, w, h of all frames as lists
+        if self._records is not None:
+            names = [name for name, _ in self._records]
+            rects = [f["frame"] for _, f in self._records]
+            xs = [rect["x"] for rect in rects]
+            ys = [rect["y"] for rect in rects]
+            ws = [rect["w"] for rect in rects]
+            hs = [rect["h"] for rect in rects]
+            if any(f.get("rotated") for _, f in self._records):
+                rotated = [bool(f.get("rotated")) for _, f in self._records]
+                ws, hs = ([h if r else w for w, h, r in zip(ws, hs, rotated)],
+                          [w if r else h for w, h, r in zip(ws, hs, rotated)])
+            return names, names, xs, ys, ws, hs
+        footprints = [frame.footprint() for frame in self._frames]
+        return ([frame.name for frame in self._frames], [frame.key() for frame in self._frames],
+                [f[0] for f in footprints], [f[1] for f in footprints], [f[2] for f in footprints], [f[3] for f in footprints])
+
+def json_frame(name, f):
+    rect = f["frame"]
+    frame = AtlasFrame(name, rect["x"], rect["y"], rect["w"], rect["h"], 90 if f.get("rotated") else 0)
+    source = f.get("spriteSourceSize")
+    if source:
+        frame.source_x = source["x"]
+        frame.source_y = source["y"]
+    source_size = f.get("sourceSize")
+    if source_size:
+        frame.source_w = source_size["w"]
+        frame.source_h = source_size["h"]
+    if "pivot" in f:
+        frame.pivot = (f["pivot"]["x"], f["pivot"]["y"])
+    if "borders" in f:
+        b = f["borders"]
+        frame.split = (b["left"], b["right"], b["top"], b["bottom"])
+    return frame
+
+def read_json(text):
+    # JSON Array or JSON Hash, TexturePacker compatible
+    data = json.loads(text)
+    meta = data.get("meta", {})
+    size = meta.get("size")
+    atlas = Atlas(meta.get("image"), size["w"] if size else None, size["h"] if size else None)
+    frames = data["frames"]
+    atlas._records = list(frames.items()) if isinstance(frames, dict) else [(f["filename"], f) for f in frames]
+    return atlas
+
+def int_values(value):
+    return tuple(int(v) for v in value.split(','))
+
+def read_libgdx(text):
+    # libGDX TextureAtlas, only the first page is read
+    atlas = None
+    frame = None
+    for line in text.splitlines():
+        if not line.strip():
+            if atlas is not None and atlas.frames:
+                break
+            continue
+        if atlas is None:
+            atlas = Atlas(line.strip())
+            continue
+        key, colon, value = line.partition(':')
+        if line[0] in ' \t' and colon:
+            # region property
+            key = key.strip()
+            if key == "xy":
+                frame.x, frame.y = int_values(value)
+            elif key == "size":
+                frame.w, frame.h = int_values(value)
+            elif key == "bounds":
+                frame.x, frame.y, frame.w, frame.h = int_values(value)
+            elif key == "offsets":
+                frame.source_x, frame.source_y, frame.source_w, frame.source_h = int_values(value)
+            elif key == "orig":
+                frame.source_w, frame.source_h = int_values(value)
+            elif key == "offset":
+                frame.source_x, frame.source_y = int_values(value)
+            elif key == "rotate":
+                # libGDX regions are turned counter-clockwise
+                frame.rotated = 270 if value.strip() in ("true", "90") else 0
+            elif key == "index":
+                frame.index = int(value)
+            elif key == "split":
+                frame.split = int_values(value)
+            elif key == "pad":
+                frame.pad = int_values(value)
+        elif colon and not atlas.frames and frame is None:
+            # page property
+            if key.strip() == "size":
+                atlas.width, atlas.height = int_values(value)
+        else:
+            if frame is not None:
+                atlas.add(frame)
+            frame = AtlasFrame(line.strip(), 0, 0, 0, 0)
+    if frame is not None:
+        atlas.add(frame)
+    for frame in atlas.frames:
+        # libGDX offset is from the bottom-left of the original sprite
+        frame.source_y = frame.source_h - frame.h - frame.source_y
+    return atlas
+
+CSS_RULE = re.compile(r"\.([^\s{]+)\s*\{([^}]*)\}")
+CSS_BACKGROUND = re.compile(r"url\(['\"]?([^'\")]*)['\"]?\)[^;]*?(-?\d+)px\s+(-?\d+)px")
+CSS_SIZE = re.compile(r"(width|height)\s*:\s*(\d+)px")
+
+def read_css(text):
+    # CSS sprites, the class name is the sprite name
+    atlas = Atlas(None)
+    for name, body in CSS_RULE.findall(text):
+        background = CSS_BACKGROUND.search(body)
+        if not background:
+            continue
+        size = dict(CSS_SIZE.findall(body))
+        image, x, y = background.groups()
+        if atlas.image is None:
+            atlas.image = image
+        atlas.add(AtlasFrame(name, -int(x), -int(y), int(size.get("width", 0)), int(size.get("height", 0))))
+    return atlas
+
+def read_xml(text):
+    # XML TextureAtlas, Starling compatible
+    root = ElementTree.fromstring(text)
+    atlas = Atlas(root.get("imagePath"))
+    for node in root.iter("SubTexture"):
+        get = node.get
+        frame = AtlasFrame(get("name"), int(get("x")), int(get("y")), int(get("width")), int(get("height")),
+                           90 if get("rotated") == "true" else 0)
+        if get("frameWidth") is not None:
+            # Starling frame offsets are negative
+            frame.source_x = -int(get("frameX", 0))
+            frame.source_y = -int(get("frameY", 0))
+            frame.source_w = int(get("frameWidth"))
+            frame.source_h = int(get("frameHeight"))
+        if get("pivotX") is not None:
+            frame.pivot = (float(get("pivotX")) / frame.w if frame.w else 0.0,
+                           float(get("pivotY")) / frame.h if frame.h else 0.0)
+        if get("split") is not None:
+            frame.split = int_values(get("split"))
+        if get("pad") is not None:
+            frame.pad = int_values(get("pad"))
+        atlas.add(frame)
+    return atlas
+
+READERS = {".json": read_json, ".atlas": read_libgdx, ".css": read_css, ".xml": read_xml}
+
+def read_atlas(filename):
+    # read a coordinate file, the format follows from the file extension
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"unknown atlas file type {ext}")
+    with open(filename, encoding='utf-8') as inputfile:
+        return READERS[ext](inputfile.read())
+
+def find_overlaps(x0s, y0s, x1s, y1s):
+    # Index pairs of overlapping rectangles given as columns of edges, sorted. A sweep line goes down the
+    # frames in order of their top edge, the frames it crosses are kept sorted on x. Those frames
+    # don't overlap each other as long as no overlap was found, so a new frame only has to be
+    # compared with its neighbours in that list, after an overlap with all frames that start left of it.
+    # Frames the sweep line has passed are only dropped when they end up next to a new frame.
+    # two stable sorts instead of a tuple key per frame
+    order = sorted(range(len(x0s)), key=x0s.__getitem__)
+    order.sort(key=y0s.__getitem__)
+    active_x = []  # left edges of the frames in the list, sorted
+    active = []    # their indexes in the same order
+    pairs = []
+    for i in order:
+        x0, y0, x1 = x0s[i], y0s[i], x1s[i]
+        k = bisect.bisect_left(active_x, x0)
+        while k > 0 and y1s[active[k - 1]] <= y0:
+            k -= 1
+            del active_x[k], active[k]
+        while k < len(active) and y1s[active[k]] <= y0:
+            del active_x[k], active[k]
+        if pairs or (k > 0 and x1s[active[k - 1]] > x0) or (k < len(active) and active_x[k] < x1):
+            end = bisect.bisect_left(active_x, x1)
+            pairs += [(min(i, j), max(i, j)) for j in active[:end] if x1s[j] > x0 and y1s[j] > y0]
+        active_x.insert(k, x0)
+        active.insert(k, i)
+    return sorted(pairs)
+
+def validate_atlas(atlas, width=None, height=None, overlaps=True):
+    # list of problems: duplicate names, empty frames, frames outside the atlas and overlapping frames,
+    # overlaps can be left out for speed, width and height override the size from the file (CSS and XML don't store it).
+    # Checked on whole columns first, the frames are only gone through one by one to report errors.
+    width = width if width is not None else atlas.width
+    height = height if height is not None else atlas.height
+    names, keys, xs, ys, ws, hs = atlas.columns()
+    errors = []
+    if len(set(keys)) != len(keys):
+        seen = set()
+        for name, key in zip(names, keys):
+            if key in seen:
+                errors.append(f"duplicate frame name {name}")
+            seen.add(key)
+    if not names:
+        return errors
+
+    x1s = list(map(operator.add, xs, ws))
+    y1s = list(map(operator.add, ys, hs))
+    if (min(ws) <= 0 or min(hs) <= 0 or min(xs) < 0 or min(ys) < 0 or
+            (width is not None and max(x1s) > width) or (height is not None and max(y1s) > height)):
+        for name, x, y, w, h in zip(names, xs, ys, ws, hs):
+            if w <= 0 or h <= 0:
+                errors.append(f"frame {name} is empty ({w}x{h})")
+            elif x < 0 or y < 0 or (width is not None and x + w > width) or (height is not None and y + h > height):
+                errors.append(f"frame {name} ({x},{y} {w}x{h}) is outside the atlas size {width}x{height}")
+
+    if overlaps:
+        columns, valid = (xs, ys, x1s, y1s), names
+        if min(ws) <= 0 or min(hs) <= 0:
+            # empty frames are already reported
+            keep = [w > 0 and h > 0 for w, h in zip(ws, hs)]
+            columns = [list(itertools.compress(column, keep)) for column in columns]
+            valid = list(itertools.compress(names, keep))
+        for a, b in find_overlaps(*columns):
+            errors.append(f"frames {valid[a]} and {valid[b]} overlap")
+    return errors
+
+def main(args):
+    overlaps = "--no-overlaps" not in args
+    args = [arg for arg in args if arg != "--no-overlaps"]
+    if not args:
+        print("usage: python atlas_reader.py [--no-overlaps] sprites.json [more files]")
+        return 2
+    result = 0
+    for filename in args:
+        try:
+            atlas = read_atlas(filename)
+            errors = validate_atlas(atlas, overlaps=overlaps)
+        except (OSError, ValueError, KeyError, ElementTree.ParseError) as e:
+            errors = [f"can't read file: {e}"]
+        for error in errors:
+            print(f"{filename}: {error}")
+        if errors:
+            result = 1
+        else:
+            print(f"{filename}: {len(atlas)} frames OK")
+    return result
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Atlas unpacking for the GIMP SpriteAtlas plug-in
+# slices the sprites out of an atlas image using any supported coordinate file,
+# with rotation undone and trimmed borders restored to the original sprite size
+# plain Python, no GIMP dependencies, pixels are 8-bit RGBA rows top to bottom
+#
+# write all sprites of an atlas as PNG files from the command line:
+#   python atlas_unpack.py sprites.json outputfolder [worker threads]
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import atlas_reader
+import png_writer
+
+def unpack_frame(pixels, width, frame):
+    # pixels of one frame at its original size, returns width, height and pixels
+    x, y, w, h = frame.footprint()
+    stride = width * 4
+    region = [pixels[(y + r) * stride + x * 4:(y + r) * stride + (x + w) * 4] for r in range(h)]
+    if frame.rotated == 90:
+        # stored turned clockwise, the first sprite row is the right column of the region
+        region = [b''.join(region[sx][(w - 1 - sy) * 4:(w - sy) * 4] for sx in range(h)) for sy in range(w)]
+    elif frame.rotated == 270:
+        # stored turned counter-clockwise, the first sprite row is the left column from the bottom up
+        region = [b''.join(region[h - 1 - sx][sy * 4:(sy + 1) * 4] for sx in range(h)) for sy in range(w)]
+    if not frame.trimmed():
+        return frame.w, frame.h, b''.join(region)
+
+    # put the trimmed frame back in a transparent sprite of the original size
+    source_stride = frame.source_w * 4
+    out = bytearray(source_stride * frame.source_h)
+    for r, row in enumerate(region):
+        sy = frame.source_y + r
+        if 0 <= sy < frame.source_h:
+            i = sy * source_stride + frame.source_x * 4
+            row = row[:max(source_stride - frame.source_x * 4, 0)]
+            out[i:i + len(row)] = row
+    return frame.source_w, frame.source_h, bytes(out)
+
+def frame_filename(frame):
+    # file name for a frame, animation frames from libGDX get their frame number back,
+    # folders in sprite names are kept but can't point outside the output folder
+    name = frame.name if frame.index < 0 else f"{frame.name}_{frame.index}"
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    return os.path.join(*parts) + ".png" if parts else "_.png"
+
+def write_frame(folder, frame, pixels, width):
+    w, h, sprite = unpack_frame(pixels, width, frame)
+    filename = os.path.join(folder, frame_filename(frame))
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'wb') as outputfile:
+        writer = png_writer.PngStreamWriter(outputfile, w, h)
+        writer.write_rows(sprite)
+        writer.close()
+
+def unpack_atlas(atlas, pixels, width, folder, workers=4):
+    # write every frame as PNG file, on worker threads (zlib compression runs in parallel)
+    with ThreadPoolExecutor(max(workers, 1)) as executor:
+        futures = [executor.submit(write_frame, folder, frame, pixels, width) for frame in atlas.frames]
+        for future in futures:
+            future.result()
+    return len(futures)
+
+def main(args):
+    if len(args) not in (2, 3):
+        print("usage: python atlas_unpack.py sprites.json outputfolder [worker threads]")
+        return 2
+    atlas = atlas_reader.read_atlas(args[0])
+    width, height, pixels = png_writer.read_png(os.path.join(os.path.dirname(args[0]), atlas.image))
+    errors = atlas_reader.validate_atlas(atlas, width, height)
+    if errors:
+        for error in errors:
+            print(f"{args[0]}: {error}")
+        return 1
+    count = unpack_atlas(atlas, pixels, width, args[1], int(args[2]) if len(args) == 3 else os.cpu_count() or 4)
+    print(f"Unpacked {count} sprites to {args[1]}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
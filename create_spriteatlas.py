@@ -15,21 +15,54 @@ gi.require_version('GimpUi', '3.0')
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gimp, GimpUi, GObject, GLib, Gio, Gegl
 from util import mkenumvalue
-
-
+import texture_container
+import pixel_ops
+import png_writer
+import atlas_patch
+import atlas_reader
+import atlas_unpack
+import sprite_cache
+import sprite_watch
+
+
+import collections
+import hashlib
 import math
 import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import total_ordering
 import sys # Added for sys.argv in Gimp.main
 
 layer_rects = []
 spaces = []
 pixel_space = 1
+ext_size = 1     # pixels per extruded edge
+block_align = 1  # sprite positions and atlas size are multiples of this
+image_ext = "png"        # atlas image file format, "png" or "webp"
+image_compression = 9    # PNG compression level 0-9
+image_indexed = False    # quantize atlas image to a 256 color palette
+premultiply_alpha = False # export color values multiplied by alpha
+keep_transparent = False # export the colors of fully transparent pixels, needed for alpha bleeding
+stable_order = False     # sort sprites on all properties, layout does not depend on layer order
+packing_order = "Height" # sort order used for packing, see PACKING_ORDERS
+packing_width = 100      # start width of the packing area in percent of the square-ish default
+worker_threads = 0       # threads for file I/O and encoding next to the GIMP calls, 0 runs everything in order
+pixel_format = "RGBA8888" # atlas pixel format as named in libGDX, see PIXEL_FORMATS
 ATLAS_PLUGIN_VERSION = "v0.4-GIMP3" # Updated version
 
+def align_up(value, align):
+    # round value up to a multiple of align
+    return ((value + align - 1) // align) * align
+
 # empty space
 @total_ordering
 class spaceobj(object):
+    # fixed attributes without a __dict__, there can be as many spaces as sprites
+    __slots__ = ('x', 'y', 'width', 'height')
+
     def __init__(self, x, y, width, height):
         self.x = x
         self.y = y
@@ -45,9 +78,18 @@ class spaceobj(object):
             return NotImplemented
         return (self.width * self.height < other.width * other.height)
 
+    def area(self):
+        # sort key, same order as __lt__ but computed once per space instead of per comparison
+        return self.width * self.height
+
 # image layer metadata
 @total_ordering
 class imgRect(object):
+    # fixed attributes without a __dict__, saves memory with 100k+ sprites
+    __slots__ = ('name', 'width', 'height', 'index', 'layer', 'pack_x', 'pack_y', 'packed',
+                 'vertices', 'anim_name', 'anim_index', 'ext_up', 'ext_down', 'ext_left', 'ext_right',
+                 'pivot', 'split', 'pad', 'tot_width', 'tot_height', 'digest')
+
     def __init__(self, n, w, h, i, layer_obj): # Added layer_obj
         # process stuff
         if n.endswith(('.png', '.jpg')):
@@ -61,25 +103,54 @@ class imgRect(object):
         # extra stuff
         self.pack_x = 0
         self.pack_y = 0
+        self.packed = False
+        self.vertices = None # optional polygon around the visible pixels
+        self.anim_name = None # animation sequence name and frame number, "walk_0002" -> "walk", 2
+        self.anim_index = -1
         self.ext_up = 0
         self.ext_down = 0
         self.ext_left = 0
         self.ext_right = 0
-        # determinate name and optional extend direction, example "green_pipe [ext=UD].png" -> name="green_pipe" ext_up=1 ext_down=1
+        self.pivot = None  # (x, y) relative to sprite size
+        self.split = None  # nine-slice borders (left, right, top, bottom) in pixels
+        self.pad = None    # content padding (left, right, top, bottom) in pixels
+        self.digest = b''  # hash of the pixels, only set to tell apart sprites with the same size and name
+        # determinate name and optional tags, example "green_pipe [ext=UD pivot=0.5,1].png" -> name="green_pipe" ext_up=1 ext_down=1 pivot=(0.5, 1.0)
         pos1 = n.find('[')
         pos2 = n.find(']')
         if pos1 >= 0 and pos2 >= 0 and pos1 < pos2:
             self.name = n[0:pos1].strip()
-            ex = n[pos1+1:pos2].strip().lower()
-            if ex.startswith("ext="):
-                ex = ex[4:]
-                self.ext_up = 1 if "u" in ex else 0
-                self.ext_down = 1 if "d" in ex else 0
-                self.ext_left = 1 if "l" in ex else 0
-                self.ext_right = 1 if "r" in ex else 0
+            for tag in n[pos1+1:pos2].strip().lower().split():
+                key, _, value = tag.partition('=')
+                try:
+                    self.parse_tag(key, value)
+                except ValueError:
+                    print(f"Warning: Invalid tag '{tag}' in layer {n}")
         # total width and height, including extruding parts
-        self.tot_width = self.width + self.ext_left + self.ext_right
-        self.tot_height = self.height + self.ext_up + self.ext_down
+        # rounded up so that box plus padding keeps the packed positions aligned
+        self.tot_width = align_up(self.width + self.ext_left + self.ext_right + pixel_space, block_align) - pixel_space
+        self.tot_height = align_up(self.height + self.ext_up + self.ext_down + pixel_space, block_align) - pixel_space
+
+    def parse_tag(self, key, value):
+        # one key=value tag from the layer name, raises ValueError for invalid values
+        if key == "ext":
+            self.ext_up = ext_size if "u" in value else 0
+            self.ext_down = ext_size if "d" in value else 0
+            self.ext_left = ext_size if "l" in value else 0
+            self.ext_right = ext_size if "r" in value else 0
+        elif key == "pivot":
+            px, py = value.split(',')
+            self.pivot = (float(px), float(py))
+        elif key in ("slice", "split", "pad"):
+            borders = tuple(int(v) for v in value.split(','))
+            if len(borders) != 4 or min(borders) < 0:
+                raise ValueError(value)
+            if key == "pad":
+                self.pad = borders
+            else:
+                self.split = borders
+        else:
+            raise ValueError(key)
 
     # Replaced __cmp__ with __eq__ and __lt__ for Python 3 / total_ordering
     def __eq__(self, other):
@@ -92,6 +163,101 @@ class imgRect(object):
         # Sort by height descending (so less than means greater height)
         return self.height > other.height # Note the change for descending sort
 
+    def height_key(self):
+        # sort key, same order as __lt__ but computed once per sprite instead of per comparison
+        return -self.height
+
+    def stable_key(self):
+        # total order: height and width descending, then name and pixel hash
+        return (-self.height, -self.width, self.name, self.digest)
+
+def prefetch(func, items, workers):
+    # run func for all items on worker threads and yield the results in order,
+    # at most 2 results per worker are waiting so memory use stays limited
+    with ThreadPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) > workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# default size of the decoded sprite cache in MB
+DEFAULT_CACHE_SIZE = 512
+
+def read_cached_sprite(cache, path):
+    # width, height and pixels of a cached sprite, None when the file is not in the cache,
+    # the pixels are copied once from the memory-mapped file into the bytes that GEGL needs
+    sprite = cache.get(path) if cache else None
+    if sprite is None:
+        return None
+    with sprite:
+        return sprite.width, sprite.height, bytes(sprite.pixels)
+
+def load_sprite_folder(folder, cache=None):
+    # Open all PNG files in a folder as layers of a new image, much faster than Open As Layers.
+    # Files that didn't change since the last run are read from the decoded sprite cache,
+    # on worker threads while the main thread creates the layers when worker_threads is set.
+    imgSprites = Gimp.Image.new(1, 1, Gimp.ImageBaseType.RGB)
+    filenames = sorted(f for f in os.listdir(folder) if f.lower().endswith('.png'))
+    paths = [os.path.join(folder, name) for name in filenames]
+    if cache and worker_threads > 0:
+        cached = prefetch(lambda path: read_cached_sprite(cache, path), paths, worker_threads)
+    else:
+        cached = (read_cached_sprite(cache, path) for path in paths)
+    for idx, (name, path, sprite) in enumerate(zip(filenames, paths, cached)):
+        if sprite is None:
+            lyr = Gimp.file_load_layer(Gimp.RunMode.NONINTERACTIVE, imgSprites, Gio.File.new_for_path(path))
+            imgSprites.insert_layer(lyr, None, idx)
+            lyr.set_name(name)
+            if not lyr.has_alpha():
+                lyr.add_alpha()
+            if cache:
+                cache.put(path, lyr.get_width(), lyr.get_height(), read_layer_pixels(lyr))
+        else:
+            w, h, pixels = sprite
+            lyr = Gimp.Layer.new(imgSprites, name, w, h, Gimp.ImageType.RGBA_IMAGE, 100.0, Gimp.LayerMode.NORMAL)
+            imgSprites.insert_layer(lyr, None, idx)
+            write_layer_pixels(lyr, pixels)
+    return imgSprites
+
+def sprite_layer_name(frame):
+    # layer name for an unpacked frame, with the tags that recreate its pivot and nine-slice borders
+    name = frame.name if frame.index < 0 else f"{frame.name}_{frame.index}"
+    tags = []
+    if frame.pivot:
+        tags.append(f"pivot={frame.pivot[0]:g},{frame.pivot[1]:g}")
+    if frame.split:
+        tags.append("slice=%d,%d,%d,%d" % tuple(frame.split))
+    if frame.pad:
+        tags.append("pad=%d,%d,%d,%d" % tuple(frame.pad))
+    return f"{name} [{' '.join(tags)}]" if tags else name
+
+def load_atlas_sprites(filename):
+    # Unpack an existing atlas into the layers of a new image, so it can be packed again with
+    # other settings without writing the sprites to files first. The atlas image is the one
+    # named in the coordinate file, in the same folder.
+    atlas = atlas_reader.read_atlas(filename)
+    imgAtlas = Gimp.file_load(Gimp.RunMode.NONINTERACTIVE, Gio.File.new_for_path(os.path.join(os.path.dirname(filename), atlas.image)))
+    try:
+        layer = imgAtlas.get_layers()[0]
+        width = layer.get_width()
+        pixels = read_layer_pixels(layer)
+        errors = atlas_reader.validate_atlas(atlas, width, layer.get_height())
+    finally:
+        imgAtlas.delete()
+    for error in errors:
+        print(f"Warning: {filename}: {error}")
+
+    imgSprites = Gimp.Image.new(1, 1, Gimp.ImageBaseType.RGB)
+    for idx, frame in enumerate(atlas.frames):
+        w, h, sprite = atlas_unpack.unpack_frame(pixels, width, frame)
+        lyr = Gimp.Layer.new(imgSprites, sprite_layer_name(frame), w, h, Gimp.ImageType.RGBA_IMAGE, 100.0, Gimp.LayerMode.NORMAL)
+        imgSprites.insert_layer(lyr, None, idx)
+        write_layer_pixels(lyr, sprite)
+    return imgSprites
+
 def prepare_layers_metadata(image): # Pass image object
     global layer_rects, spaces, pixel_space
     layer_rects = [] # Clear global list
@@ -100,8 +266,6 @@ def prepare_layers_metadata(image): # Pass image object
     # Collect metadata from all layers as custom list
     layers = image.get_layers() # GIMP 3 API
     idx = 0
-    area = 0
-    maxWidth = 0
     for lyr in layers:
         if not lyr.get_visible(): # Skip invisible layers
              continue
@@ -111,23 +275,121 @@ def prepare_layers_metadata(image): # Pass image object
         h = lyr.get_height() # GIMP 3 API
         newrec = imgRect(n, w, h, idx, lyr) # Pass layer object
         layer_rects.append(newrec)
-        # calculate total layer area and maximum layer width
-        area += (newrec.tot_width + pixel_space) * (newrec.tot_height + pixel_space);
-        maxWidth = max(newrec.tot_width + pixel_space, maxWidth + pixel_space)
         idx = idx + 1
 
     # sort the layer data for packing by height, descending
-    layer_rects.sort() # Uses the __lt__ defined in imgRect
-
-    # aim for a square-ish resulting container,
-    # slightly adjusted for sub-100% space utilization
-    startWidth = max(math.ceil(math.sqrt(area / 0.95)), maxWidth) if area > 0 else maxWidth
+    if stable_order:
+        # equal heights are sorted on the other properties instead of layer order,
+        # so the same set of sprites always gives the same atlas, the pixels are
+        # only hashed for sprites with the same size and name
+        counts = collections.Counter((obj.height, obj.width, obj.name) for obj in layer_rects)
+        for obj in layer_rects:
+            if counts[(obj.height, obj.width, obj.name)] > 1:
+                obj.digest = hashlib.sha1(read_layer_pixels(obj.layer)).digest()
+        layer_rects.sort(key=imgRect.stable_key)
+    else:
+        layer_rects.sort(key=imgRect.height_key) # Same order as the __lt__ defined in imgRect
 
     # also initialise list of spaces, start with a single empty space based on average layer size
+    startWidth = calc_start_width(layer_rects, packing_width)
     spaces.append(spaceobj(0, 0, startWidth, (startWidth+startWidth)))
     return
 
-def calc_layers_packing():
+def calc_start_width(rects, width_percent=100):
+    # calculate total layer area and maximum layer width
+    area = 0
+    maxWidth = 0
+    for rec in rects:
+        area += (rec.tot_width + pixel_space) * (rec.tot_height + pixel_space);
+        maxWidth = max(rec.tot_width + pixel_space, maxWidth + pixel_space)
+    # aim for a square-ish resulting container,
+    # slightly adjusted for sub-100% space utilization
+    return max(math.ceil(math.sqrt(area / 0.95) * (width_percent / 100)), maxWidth) if area > 0 else maxWidth
+
+# sort orders for packing, largest first, ties keep the order from prepare_layers_metadata
+PACKING_ORDERS = {
+    "Height": imgRect.height_key,
+    "Area": lambda obj: -obj.tot_width * obj.tot_height,
+    "Max side": lambda obj: -max(obj.tot_width, obj.tot_height),
+    "Width": lambda obj: -obj.tot_width,
+    "Perimeter": lambda obj: -(obj.tot_width + obj.tot_height),
+}
+
+# start widths in percent tried by calc_best_packing, the default width first
+PACKING_WIDTHS = [100, 90, 110, 80, 125]
+# (width percent, order) of each packing trial, in the order they are tried
+PACKING_TRIALS = [(width_percent, order) for width_percent in PACKING_WIDTHS for order in PACKING_ORDERS]
+
+def calc_best_packing(max_trials):
+    # Pack with the first max_trials sort orders and start widths and keep the result with the
+    # smallest atlas area, returns the winning order and width percent. The trials are a fixed
+    # list, so the result doesn't depend on the speed of the machine. The default height order
+    # is tried first, so the result is never worse than the default.
+    global layer_rects, spaces
+    prepared = list(layer_rects)
+    best = None
+    start_widths = {}
+    for width_percent, order in PACKING_TRIALS[:max(1, max_trials)]:
+        if width_percent not in start_widths:
+            start_widths[width_percent] = calc_start_width(prepared, width_percent)
+        layer_rects = sorted(prepared, key=PACKING_ORDERS[order])
+        calc_layers_packing_fit(start_widths[width_percent])
+        img_w, img_h = calc_spriteatlas_size()
+        unplaced = sum(1 for obj in layer_rects if not obj.packed)
+        print(f"Packing order {order} at {width_percent}% width: {img_w}x{img_h}, {unplaced} unplaced")
+        score = (unplaced, img_w * img_h, max(img_w, img_h))
+        if best is None or score < best[0]:
+            best = (score, order, width_percent, layer_rects, spaces,
+                    [(obj.pack_x, obj.pack_y, obj.packed) for obj in layer_rects])
+
+    _, order, width_percent, layer_rects, spaces, positions = best
+    for obj, (x, y, packed) in zip(layer_rects, positions):
+        obj.pack_x, obj.pack_y, obj.packed = x, y, packed
+    return order, width_percent
+
+def calc_layers_packing_fit(start_width):
+    # Pack in the default start space of twice its width, other orders than height and narrow
+    # start widths can leave sprites unplaced there, then repack in a start space that fits
+    # all sprites below each other.
+    global spaces
+    heights = [start_width + start_width]
+    total_height = sum(obj.tot_height + pixel_space for obj in layer_rects)
+    if total_height > heights[0]:
+        heights.append(total_height)
+    for height in heights:
+        spaces = [spaceobj(0, 0, start_width, height)]
+        for obj in layer_rects:
+            obj.pack_x = obj.pack_y = 0
+            obj.packed = False
+        calc_layers_packing(warn_unplaced=height == heights[-1])
+        if all(obj.packed for obj in layer_rects):
+            break
+
+def calc_layers_packing_preserved(previous_frames, prev_w, prev_h):
+    # Layout preserving packing for atlas patches, sprites with the same name and size as in the
+    # previous build keep their position, other sprites are packed below the previous atlas.
+    global layer_rects, spaces
+    all_rects = layer_rects
+    new_rects = []
+    for obj in all_rects:
+        frame = previous_frames.get(obj.name)
+        if frame and tuple(frame[2:]) == (obj.width, obj.height):
+            obj.pack_x, obj.pack_y = frame[0], frame[1]
+            obj.packed = True
+        else:
+            new_rects.append(obj)
+    # the free area within the kept layout is not known, only the space below it
+    spaces = []
+    if new_rects:
+        start_width = max(prev_w, calc_start_width(new_rects))
+        top = align_up(prev_h + pixel_space, block_align)
+        spaces = [spaceobj(0, top, start_width, sum(obj.tot_height + pixel_space for obj in new_rects))]
+        layer_rects = new_rects
+        calc_layers_packing()
+        layer_rects = all_rects
+    print(f"Kept {len(all_rects) - len(new_rects)} sprites in place, packed {len(new_rects)} new or resized sprites")
+
+def calc_layers_packing(warn_unplaced=True):
     global layer_rects, spaces, pixel_space
     # packing algorithm, explanation and code example by Volodymyr Agafonkin
     # https://observablehq.com/@mourner/simple-rectangle-packing
@@ -135,7 +397,7 @@ def calc_layers_packing():
 
         # look through spaces backwards so that we check smaller spaces first
         # Sort spaces smallest first to optimize finding a fit
-        spaces.sort()
+        spaces.sort(key=spaceobj.area)
         found_space = False
         i = 0
         while i < len(spaces):
@@ -189,13 +451,15 @@ def calc_layers_packing():
                 spaces[i].height -= (box.tot_height + pixel_space);
 
             found_space = True
+            box.packed = True
             break # Exit the inner loop once space is found
 
         if not found_space:
              # This should ideally not happen if startWidth is calculated correctly
              # but as a fallback, we might need to expand the canvas conceptually
              # For now, log or raise an error
-             print(f"Warning: Could not find space for layer {box.name}")
+             if warn_unplaced:
+                 print(f"Warning: Could not find space for layer {box.name}")
 
 
     return
@@ -260,18 +524,152 @@ def copy_paste_layer_region(src_layer, dest_layer, src_x, src_y, width, height,
 
 
 
-def render_spriteatlas(image, filetag): # Pass original image
-    global layer_rects, spaces, pixel_space
-    # render output atlas based on current layer coordinates
+def read_layer_pixels(layer, premultiplied=False):
+    # read all pixels of a layer at once as 8-bit RGBA bytes,
+    # optionally let GEGL multiply the colors by alpha while reading
+    rect = Gegl.Rectangle.new(0, 0, layer.get_width(), layer.get_height())
+    pixel_format = "R'aG'aB'aA u8" if premultiplied else "R'G'B'A u8"
+    return layer.get_buffer().get(rect, 1.0, pixel_format, Gegl.AbyssPolicy.NONE)
 
+def write_layer_pixels(layer, pixels):
+    # write all pixels of a layer at once from 8-bit RGBA bytes
+    rect = Gegl.Rectangle.new(0, 0, layer.get_width(), layer.get_height())
+    buffer = layer.get_buffer()
+    buffer.set(rect, "R'G'B'A u8", bytes(pixels))
+    buffer.flush()
+    layer.update(0, 0, layer.get_width(), layer.get_height())
+
+# atlas pixel formats and the matching uncompressed GPU texture format
+PIXEL_FORMATS = {"RGBA8888": "RGBA8", "RGB565": "RGB565", "RGBA4444": "RGBA4444", "Alpha": "A8"}
+
+def detect_pixel_format():
+    # smallest pixel format that keeps all sprite pixels exactly: Alpha when all visible pixels are white,
+    # otherwise RGBA8888, the lossy RGB565 and RGBA4444 are only suggested
+    opaque = gray = white = True
+    for obj in layer_rects:
+        if obj.packed:
+            o, g, w = pixel_ops.analyze_channels(read_layer_pixels(obj.layer))
+            opaque, gray, white = opaque and o, gray and g, white and w
+            if not (opaque or gray or white):
+                break
+    if white:
+        return "Alpha"
+    if opaque:
+        print("Sprites are opaque, RGB565 can halve the texture memory at the cost of color depth")
+    elif gray:
+        print("Sprites are grayscale, RGBA4444 or an engine-side luminance format can save memory")
+    return "RGBA8888"
+
+def quantize_layer(layer):
+    # reduce the atlas pixels to the selected pixel format, so the exported image shows what the GPU gets
+    pixels = read_layer_pixels(layer)
+    write_layer_pixels(layer, pixel_ops.quantize_pixels(pixels, layer.get_width(), layer.get_height(), pixel_format))
+
+def premultiply_layer(layer):
+    # store the premultiplied colors as-is, so the exported file contains premultiplied values
+    write_layer_pixels(layer, read_layer_pixels(layer, True))
+
+def bleed_layer(layer, iterations):
+    # spread sprite edge colors into the surrounding transparent pixels
+    pixels = read_layer_pixels(layer)
+    write_layer_pixels(layer, pixel_ops.bleed_alpha(pixels, layer.get_width(), layer.get_height(), iterations))
+
+def calc_spriteatlas_size():
     # determine total width, height
     img_w = 0
     img_h = 0
     for obj in layer_rects:
+        if not obj.packed:
+            continue
         w = obj.pack_x + obj.width + obj.ext_right
         h = obj.pack_y + obj.height + obj.ext_down # Corrected: use ext_down for height calc
         img_w = max(img_w, w)
         img_h = max(img_h, h)
+    return align_up(img_w, block_align), align_up(img_h, block_align)
+
+def read_layer_rows(layer, y, rows, premultiplied=False):
+    # read a number of complete rows of a layer as 8-bit RGBA bytes
+    rect = Gegl.Rectangle.new(0, y, layer.get_width(), rows)
+    pixel_format = "R'aG'aB'aA u8" if premultiplied else "R'G'B'A u8"
+    return layer.get_buffer().get(rect, 1.0, pixel_format, Gegl.AbyssPolicy.NONE)
+
+def render_sprite_band(band, band_y, band_h, img_w, obj):
+    # copy the rows of one sprite that fall within a band of the atlas, including extruded edges
+    stride = img_w * 4
+    y0 = max(band_y, obj.pack_y - obj.ext_up)
+    y1 = min(band_y + band_h, obj.pack_y + obj.height + obj.ext_down)
+    # extruded rows repeat the first or last sprite row
+    s0 = min(max(y0 - obj.pack_y, 0), obj.height - 1)
+    s1 = min(max(y1 - 1 - obj.pack_y, 0), obj.height - 1) + 1
+    src = read_layer_rows(obj.layer, s0, s1 - s0, premultiply_alpha)
+    w4 = obj.width * 4
+    for ay in range(y0, y1):
+        sy = ay - obj.pack_y
+        i = (min(max(sy, 0), obj.height - 1) - s0) * w4
+        row = src[i:i + w4]
+        offset = (ay - band_y) * stride + obj.pack_x * 4
+        if 0 <= sy < obj.height:
+            # extruded columns repeat the first or last pixel
+            row = row[:4] * obj.ext_left + row + row[-4:] * obj.ext_right
+            offset -= obj.ext_left * 4
+        band[offset:offset + len(row)] = row
+
+def render_spriteatlas_strips(filename, img_w, img_h, strip_height, build_hash=False):
+    # Composite the atlas in bands of strip_height rows and encode each band to PNG right away,
+    # only the sprites that overlap a band are read, so memory use depends on the band size
+    # and not on the atlas size. Returns the build hash text entries when requested.
+    stride = img_w * 4
+    sprites = sorted((obj for obj in layer_rects if obj.packed), key=lambda obj: obj.pack_y - obj.ext_up)
+    hasher = hashlib.sha256() if build_hash else None
+    text_chunks = []
+
+    def encode_band(writer, band):
+        if hasher:
+            hasher.update(band)
+        writer.write_rows(band)
+
+    def write_png(tmpname):
+        with open(tmpname, 'wb') as outputfile, ThreadPoolExecutor(1) as encoder:
+            writer = png_writer.PngStreamWriter(outputfile, img_w, img_h, image_compression)
+            # with worker threads the previous band is compressed while the next one is composed,
+            # zlib and sha256 release the GIL so both run at the same time
+            encoding = None
+            active = []
+            next_sprite = 0
+            for band_y in range(0, img_h, strip_height):
+                band_h = min(strip_height, img_h - band_y)
+                # sprites that start in this band, sprites that ended above this band
+                while next_sprite < len(sprites) and sprites[next_sprite].pack_y - sprites[next_sprite].ext_up < band_y + band_h:
+                    active.append(sprites[next_sprite])
+                    next_sprite += 1
+                active = [obj for obj in active if obj.pack_y + obj.height + obj.ext_down > band_y]
+
+                band = bytearray(stride * band_h)
+                for obj in active:
+                    render_sprite_band(band, band_y, band_h, img_w, obj)
+                if pixel_format != "RGBA8888":
+                    band = pixel_ops.quantize_pixels(band, img_w, band_h, pixel_format, band_y)
+                if encoding:
+                    encoding.result()
+                    encoding = None
+                if worker_threads > 0:
+                    encoding = encoder.submit(encode_band, writer, band)
+                else:
+                    encode_band(writer, band)
+            if encoding:
+                encoding.result()
+            if hasher:
+                text_chunks[:] = [("Software", f"GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION}"),
+                                  ("BuildHash", hasher.hexdigest())]
+            writer.close(text_chunks)
+
+    write_atomic(filename, write_png)
+    return text_chunks
+
+def render_spriteatlas(image, filetag, show=True): # Pass original image
+    global layer_rects, spaces, pixel_space
+    # render output atlas based on current layer coordinates
+    img_w, img_h = calc_spriteatlas_size()
 
     if img_w <= 0 or img_h <= 0:
          print("Warning: Calculated atlas size is zero or negative. No layers processed?")
@@ -286,6 +684,8 @@ def render_spriteatlas(image, filetag): # Pass original image
 
     # copy all layers to new positions using PixelRegion
     for obj in layer_rects:
+        if not obj.packed:
+            continue # sprites that didn't fit are left out, see calc_layers_packing_fit
         src_layer = obj.layer # Get the layer object stored earlier
 
         # Copy the main part of the layer
@@ -293,54 +693,302 @@ def render_spriteatlas(image, filetag): # Pass original image
                                 0, 0, obj.width, obj.height, # Source region (full layer)
                                 obj.pack_x, obj.pack_y)      # Destination position
 
-        # Extrude edges using copy_paste_layer_region
-        if obj.ext_up == 1: # up
-            copy_paste_layer_region(src_layer, newLayer, 0, 0, obj.width, 1, obj.pack_x, obj.pack_y - 1)
-        if obj.ext_down == 1: # down
-            copy_paste_layer_region(src_layer, newLayer, 0, obj.height - 1, obj.width, 1, obj.pack_x, obj.pack_y + obj.height)
-        if obj.ext_left == 1: # left
-            copy_paste_layer_region(src_layer, newLayer, 0, 0, 1, obj.height, obj.pack_x - 1, obj.pack_y)
-        if obj.ext_right == 1: # right
-            copy_paste_layer_region(src_layer, newLayer, obj.width - 1, 0, 1, obj.height, obj.pack_x + obj.width, obj.pack_y)
-
+        # Extrude edges using copy_paste_layer_region, repeat edge pixels ext_size times
+        for e in range(obj.ext_up): # up
+            copy_paste_layer_region(src_layer, newLayer, 0, 0, obj.width, 1, obj.pack_x, obj.pack_y - 1 - e)
+        for e in range(obj.ext_down): # down
+            copy_paste_layer_region(src_layer, newLayer, 0, obj.height - 1, obj.width, 1, obj.pack_x, obj.pack_y + obj.height + e)
+        for e in range(obj.ext_left): # left
+            copy_paste_layer_region(src_layer, newLayer, 0, 0, 1, obj.height, obj.pack_x - 1 - e, obj.pack_y)
+        for e in range(obj.ext_right): # right
+            copy_paste_layer_region(src_layer, newLayer, obj.width - 1, 0, 1, obj.height, obj.pack_x + obj.width + e, obj.pack_y)
 
-    # Watermark code removed for GIMP 3 conversion simplicity.
-    # Implementing this correctly requires Gimp.PixelRegion manipulation.
 
     # No need to merge layers as we drew directly onto the target layer buffer
 
-    # Create and show a new image window for our spritesheet
-    Gimp.Display.new(imgAtlas)
-    Gimp.displays_flush() # Still useful
+    # Create and show a new image window for our spritesheet, not in batch mode
+    if show:
+        Gimp.Display.new(imgAtlas)
+        Gimp.displays_flush() # Still useful
 
     return imgAtlas, img_w, img_h # Return the new image object and dimensions
 
+def find_watermark_space(img_w, img_h):
+    # smallest empty space that fits the watermark with 1 pixel margin,
+    # returns x, y and horizontal or None when there is no space
+    mark_w = pixel_ops.WATERMARK_WIDTH + 1
+    mark_h = pixel_ops.WATERMARK_HEIGHT + 1
+    for sp in sorted(spaces): # sort smallest first
+        # adjust space for out-of-bounds of final image size
+        w = min(sp.x + sp.width, img_w) - sp.x
+        h = min(sp.y + sp.height, img_h) - sp.y
+        if w >= mark_w and h >= mark_h:
+            return sp.x, sp.y, True
+        if w >= mark_h and h >= mark_w:
+            return sp.x, sp.y, False
+    return None
+
+def render_watermark(layer, img_w, img_h):
+    # add small watermark in an empty space, read and write the pixel block in one go
+    found = find_watermark_space(img_w, img_h)
+    if found is None:
+        print("Warning: No empty space for the watermark")
+        return
+    x, y, horizontal = found
+    w = pixel_ops.WATERMARK_WIDTH if horizontal else pixel_ops.WATERMARK_HEIGHT
+    h = pixel_ops.WATERMARK_HEIGHT if horizontal else pixel_ops.WATERMARK_WIDTH
+    rect = Gegl.Rectangle.new(x, y, w, h)
+    buffer = layer.get_buffer()
+    block = buffer.get(rect, 1.0, "R'G'B'A u8", Gegl.AbyssPolicy.NONE)
+    buffer.set(rect, "R'G'B'A u8", bytes(pixel_ops.draw_watermark(block, horizontal)))
+    buffer.flush()
+    layer.update(x, y, w, h)
+
+def build_hash_text(pixels):
+    # hash of the atlas pixels as exported and the plug-in version as PNG text entries
+    build_hash = hashlib.sha256(pixels).hexdigest()
+    return [("Software", f"GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION}"), ("BuildHash", build_hash)]
+
+def calc_sprite_meshes(max_vertices):
+    # convex polygon around the visible pixels of each sprite, so engines can skip drawing transparent areas
+    for obj in layer_rects:
+        pixels = read_layer_pixels(obj.layer)
+        obj.vertices = pixel_ops.alpha_hull(pixels, obj.width, obj.height, max_vertices)
+
+def calc_animations():
+    # group numbered sprite names into animations, example walk_0001, walk_0002 -> "walk": [1, 2]
+    # returns dictionary of animation name and list of sprites sorted by frame number
+    sequences = {}
+    for obj in layer_rects:
+        match = re.match(r'^(.*?)[_\-. ]?(\d+)$', obj.name)
+        if match and match.group(1):
+            sequences.setdefault(match.group(1), []).append((int(match.group(2)), obj))
+
+    animations = {}
+    for anim_name in sorted(sequences):
+        frames = sequences[anim_name]
+        if len(frames) < 2:
+            continue # a single numbered sprite is not an animation
+        frames.sort(key=lambda frame: frame[0])
+        for number, obj in frames:
+            obj.anim_name = anim_name
+            obj.anim_index = number
+        animations[anim_name] = [obj for _, obj in frames]
+    return animations
+
+# --- Packing report ---
+
+def calc_packing_report(img_w, img_h):
+    # statistics about how well the sprites fill the atlas
+    atlas_area = img_w * img_h
+    used_area = 0
+    sprites = []
+    for obj in layer_rects:
+        if not obj.packed:
+            continue
+        area = (obj.width + obj.ext_left + obj.ext_right) * (obj.height + obj.ext_up + obj.ext_down)
+        used_area += area
+        sprites.append((obj.name, area))
+
+    # free spaces left by the packing, clipped to the final atlas size
+    largest_free = (0, 0, 0, 0)
+    for sp in spaces:
+        w = min(sp.x + sp.width, img_w) - sp.x
+        h = min(sp.y + sp.height, img_h) - sp.y
+        if w > 0 and h > 0 and w * h > largest_free[2] * largest_free[3]:
+            largest_free = (sp.x, sp.y, w, h)
+
+    return {
+        "size": (img_w, img_h),
+        "packing_order": packing_order,
+        "packing_width": packing_width,
+        "sprite_count": len(layer_rects),
+        "unplaced": sum(1 for obj in layer_rects if not obj.packed),
+        "used_area": used_area,
+        "wasted_area": atlas_area - used_area,
+        "occupancy": 100.0 * used_area / atlas_area if atlas_area > 0 else 0.0,
+        "largest_free": largest_free,
+        "sprites": [(name, 100.0 * area / atlas_area if atlas_area > 0 else 0.0) for name, area in sprites],
+    }
+
+def write_spriteatlas_report(filename, report):
+    stroutput = "{\n"
+    stroutput += f"\t\"size\":{{\"w\":{report['size'][0]},\"h\":{report['size'][1]}}},\n"
+    stroutput += f"\t\"packingOrder\":\"{report['packing_order']}\",\n"
+    stroutput += f"\t\"packingWidth\":{report['packing_width']},\n"
+    stroutput += f"\t\"sprites\":{report['sprite_count']},\n"
+    stroutput += f"\t\"unplaced\":{report['unplaced']},\n"
+    stroutput += f"\t\"usedArea\":{report['used_area']},\n"
+    stroutput += f"\t\"wastedArea\":{report['wasted_area']},\n"
+    stroutput += f"\t\"occupancy\":{report['occupancy']:.2f},\n"
+    x, y, w, h = report['largest_free']
+    stroutput += f"\t\"largestFree\":{{\"x\":{x},\"y\":{y},\"w\":{w},\"h\":{h}}},\n"
+    stroutput += "\t\"areaShare\":{"
+    stroutput += ",".join(f'\n\t\t"{name}":{share:.3f}' for name, share in report['sprites'])
+    stroutput += "\n\t}\n"
+    stroutput += "}"
+
+    # export filename
+    outputname = f'{filename}_report.json'
+
+    try:
+        write_text_atomic(outputname, stroutput)
+    except IOError as e:
+        print(f"Error writing packing report {outputname}: {e}")
+    return
+
+def calc_occupancy_heatmap(img_w, img_h, cell_size):
+    # occupancy per cell of cell_size x cell_size pixels as gray values, white is completely filled
+    cols = (img_w + cell_size - 1) // cell_size
+    rows = (img_h + cell_size - 1) // cell_size
+    covered = [0] * (cols * rows)
+    for obj in layer_rects:
+        if not obj.packed:
+            continue
+        x1 = obj.pack_x - obj.ext_left
+        y1 = obj.pack_y - obj.ext_up
+        x2 = obj.pack_x + obj.width + obj.ext_right
+        y2 = obj.pack_y + obj.height + obj.ext_down
+        for row in range(y1 // cell_size, (y2 - 1) // cell_size + 1):
+            h = min(y2, (row + 1) * cell_size) - max(y1, row * cell_size)
+            for col in range(x1 // cell_size, (x2 - 1) // cell_size + 1):
+                w = min(x2, (col + 1) * cell_size) - max(x1, col * cell_size)
+                covered[row * cols + col] += w * h
+
+    heatmap = bytearray(cols * rows)
+    for row in range(rows):
+        cell_h = min(img_h, (row + 1) * cell_size) - row * cell_size
+        for col in range(cols):
+            cell_w = min(img_w, (col + 1) * cell_size) - col * cell_size
+            heatmap[row * cols + col] = min(255, covered[row * cols + col] * 255 // (cell_w * cell_h))
+    return heatmap, cols, rows
+
+def export_occupancy_heatmap(basename, img_w, img_h, cell_size=16):
+    # save the occupancy heatmap as a small grayscale image
+    heatmap, cols, rows = calc_occupancy_heatmap(img_w, img_h, cell_size)
+    imgHeatmap = Gimp.Image.new(cols, rows, Gimp.ImageBaseType.GRAY)
+    heatLayer = Gimp.Layer.new(imgHeatmap, "Occupancy", cols, rows, Gimp.ImageType.GRAY_IMAGE, 100.0, Gimp.LayerMode.NORMAL)
+    imgHeatmap.insert_layer(heatLayer, None, 0)
+    buffer = heatLayer.get_buffer()
+    buffer.set(Gegl.Rectangle.new(0, 0, cols, rows), "Y' u8", bytes(heatmap))
+    buffer.flush()
+    Gimp.file_save(Gimp.RunMode.NONINTERACTIVE, imgHeatmap, Gio.File.new_for_path(f"{basename}_heatmap.png"), None)
+    imgHeatmap.delete()
+
 # --- Output Functions ---
 # Use 'with open' for Python 3 file handling
 
-def write_spriteatlas_jsonarray(filename, filetag, sizex, sizey):
+def polygon_json(obj, scale):
+    # TexturePacker polygon fields, vertices relative to the sprite and in atlas pixels (UV)
+    if not obj.vertices:
+        return ""
+    x, y, _, _ = scaled_frame(obj, scale)
+    vertices = [(round(vx * scale), round(vy * scale)) for vx, vy in obj.vertices]
+    strvertices = ",".join(f"[{vx},{vy}]" for vx, vy in vertices)
+    struv = ",".join(f"[{x + vx},{y + vy}]" for vx, vy in vertices)
+    strtriangles = ",".join(f"[{a},{b},{c}]" for a, b, c in pixel_ops.fan_triangles(len(vertices)))
+    return f',"vertices":[{strvertices}],"verticesUV":[{struv}],"triangles":[{strtriangles}]'
+
+def scaled_borders(borders, scale):
+    return tuple(int(round(b * scale)) for b in borders)
+
+def sprite_tags_json(obj, scale):
+    # pivot and nine-slice borders from the layer name tags
+    strtags = ""
+    if obj.pivot:
+        strtags += f',"pivot":{{"x":{obj.pivot[0]:g},"y":{obj.pivot[1]:g}}}'
+    if obj.split:
+        left, right, top, bottom = scaled_borders(obj.split, scale)
+        strtags += f',"borders":{{"left":{left},"top":{top},"right":{right},"bottom":{bottom}}}'
+    return strtags
+
+def animations_json():
+    # top level animations index with the frame names per animation
+    animations = {}
+    for obj in layer_rects:
+        if not obj.packed:
+            continue
+        if obj.anim_name is not None:
+            animations.setdefault(obj.anim_name, []).append(obj)
+    if not animations:
+        return ""
+    stranims = []
+    for anim_name in sorted(animations):
+        frames = sorted(animations[anim_name], key=lambda obj: obj.anim_index)
+        stranims.append(f'\n\t\t"{anim_name}":[' + ",".join(f'"{obj.name}"' for obj in frames) + ']')
+    return "\t\"animations\":{" + ",".join(stranims) + "\n\t},\n"
+
+def replace_file(tmpname, filename):
+    # temporary files are private, give the output the permissions of the file it replaces
+    os.chmod(tmpname, os.stat(filename).st_mode & 0o777 if os.path.exists(filename) else 0o644)
+    os.replace(tmpname, filename)
+
+def write_atomic(filename, write_func):
+    # let write_func write to a temporary file next to filename, then rename it,
+    # so a game that reloads the files never reads a half-written file,
+    # the temporary name is unique so builds writing the same file don't mix their data,
+    # and it keeps the extension so GIMP can load the file before it is renamed
+    folder, name = os.path.split(filename)
+    handle, tmpname = tempfile.mkstemp(prefix=f".{name}.", suffix=os.path.splitext(name)[1], dir=folder or None)
+    os.close(handle)
+    try:
+        write_func(tmpname)
+        replace_file(tmpname, filename)
+    except Exception:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+def write_text_atomic(filename, text):
+    def write_text(tmpname):
+        with open(tmpname, 'w', encoding='utf-8') as outputfile:
+            outputfile.write(text)
+    write_atomic(filename, write_text)
+
+def scaled_frame(obj, scale):
+    # sprite rectangle in a downscaled atlas, edges rounded outwards so no pixels are cut off
+    if scale == 1:
+        return obj.pack_x, obj.pack_y, obj.width, obj.height
+    x = int(math.floor(obj.pack_x * scale))
+    y = int(math.floor(obj.pack_y * scale))
+    w = int(math.ceil((obj.pack_x + obj.width) * scale)) - x
+    h = int(math.ceil((obj.pack_y + obj.height) * scale)) - y
+    return x, y, w, h
+
+def write_spriteatlas_jsonarray(filename, filetag, sizex, sizey, scale=1):
     global layer_rects
     stroutput = "{\n\t\"frames\":["
 
     # insert all sprite metadata
     frames_data = []
     for obj in layer_rects:
-        frame_str = ('\n\t\t{"filename":"%s","frame":{"x":%d,"y":%d,"w":%d,"h":%d},"rotated":false,"trimmed":false,' % (obj.name, obj.pack_x, obj.pack_y, obj.width, obj.height)
-                   + '"spriteSourceSize":{"x":0,"y":0,"w":%d,"h":%d},' % (obj.width, obj.height)
-                   + '"sourceSize":{"w":%d,"h":%d}}' % (obj.width, obj.height))
+        if not obj.packed:
+            continue
+        x, y, w, h = scaled_frame(obj, scale)
+        frame_str = ('\n\t\t{"filename":"%s","frame":{"x":%d,"y":%d,"w":%d,"h":%d},"rotated":false,"trimmed":false,' % (obj.name, x, y, w, h)
+                   + '"spriteSourceSize":{"x":0,"y":0,"w":%d,"h":%d},' % (w, h)
+                   + '"sourceSize":{"w":%d,"h":%d}' % (w, h)
+                   + sprite_tags_json(obj, scale) + polygon_json(obj, scale) + '}')
         frames_data.append(frame_str)
 
     stroutput += ",".join(frames_data)
 
     # meta data
     stroutput += "\n\t],\n"
+    stroutput += animations_json()
     stroutput += "\t\"meta\":{\n"
     stroutput += "\t\t\"app\":\"https://github.com/BdR76/GimpSpriteAtlas/\",\n"
     stroutput += f"\t\t\"version\":\"GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION}\",\n"
     stroutput += "\t\t\"author\":\"Bas de Reuver\",\n"
-    stroutput += f"\t\t\"image\":\"{filetag}.png\",\n"
+    stroutput += f"\t\t\"image\":\"{filetag}.{image_ext}\",\n"
     stroutput += f"\t\t\"size\":{{\"w\":{sizex},\"h\":{sizey}}},\n"
-    stroutput += "\t\t\"scale\":1\n"
+    stroutput += f"\t\t\"format\":\"{pixel_format}\",\n"
+    if premultiply_alpha:
+        stroutput += "\t\t\"premultiplyAlpha\":true,\n"
+    if packing_order != "Height" or packing_width != 100:
+        stroutput += f"\t\t\"packingOrder\":\"{packing_order}\",\n"
+        stroutput += f"\t\t\"packingWidth\":{packing_width},\n"
+    stroutput += f"\t\t\"scale\":{scale:g}\n"
     stroutput += "\t}\n"
     stroutput += "}"
 
@@ -349,35 +997,45 @@ def write_spriteatlas_jsonarray(filename, filetag, sizex, sizey):
 
     # export coordinate variables to textfile
     try:
-        with open(outputname, 'w', encoding='utf-8') as outputfile:
-            outputfile.write(stroutput)
+        write_text_atomic(outputname, stroutput)
     except IOError as e:
         print(f"Error writing JSON Array file {outputname}: {e}")
     return
 
-def write_spriteatlas_jsonhash(filename, filetag, img_w, img_h):
+def write_spriteatlas_jsonhash(filename, filetag, img_w, img_h, scale=1):
     global layer_rects
     stroutput = "{\n\t\"frames\":{"
 
     # insert all sprite metadata
     frames_data = []
     for obj in layer_rects:
-        frame_str = ('\n\t\t"%s":{"frame":{"x":%d,"y":%d,"w":%d,"h":%d},"rotated":false,"trimmed":false,' % (obj.name, obj.pack_x, obj.pack_y, obj.width, obj.height)
-                   + '"spriteSourceSize":{"x":0,"y":0,"w":%d,"h":%d},' % (obj.width, obj.height)
-                   + '"sourceSize":{"w":%d,"h":%d}}' % (obj.width, obj.height))
+        if not obj.packed:
+            continue
+        x, y, w, h = scaled_frame(obj, scale)
+        frame_str = ('\n\t\t"%s":{"frame":{"x":%d,"y":%d,"w":%d,"h":%d},"rotated":false,"trimmed":false,' % (obj.name, x, y, w, h)
+                   + '"spriteSourceSize":{"x":0,"y":0,"w":%d,"h":%d},' % (w, h)
+                   + '"sourceSize":{"w":%d,"h":%d}' % (w, h)
+                   + sprite_tags_json(obj, scale) + polygon_json(obj, scale) + '}')
         frames_data.append(frame_str)
 
     stroutput += ",".join(frames_data)
 
     # meta data
     stroutput += "\n\t},\n"
+    stroutput += animations_json()
     stroutput += "\t\"meta\":{\n"
     stroutput += "\t\t\"app\":\"https://github.com/BdR76/GimpSpriteAtlas/\",\n"
     stroutput += f"\t\t\"version\":\"GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION}\",\n"
     stroutput += "\t\t\"author\":\"Bas de Reuver\",\n"
-    stroutput += f"\t\t\"image\":\"{filetag}.png\",\n"
+    stroutput += f"\t\t\"image\":\"{filetag}.{image_ext}\",\n"
     stroutput += f"\t\t\"size\":{{\"w\":{img_w},\"h\":{img_h}}},\n"
-    stroutput += "\t\t\"scale\":1\n"
+    stroutput += f"\t\t\"format\":\"{pixel_format}\",\n"
+    if premultiply_alpha:
+        stroutput += "\t\t\"premultiplyAlpha\":true,\n"
+    if packing_order != "Height" or packing_width != 100:
+        stroutput += f"\t\t\"packingOrder\":\"{packing_order}\",\n"
+        stroutput += f"\t\t\"packingWidth\":{packing_width},\n"
+    stroutput += f"\t\t\"scale\":{scale:g}\n"
     stroutput += "\t}\n"
     stroutput += "}"
 
@@ -386,43 +1044,54 @@ def write_spriteatlas_jsonhash(filename, filetag, img_w, img_h):
 
     # export coordinate variables to textfile
     try:
-        with open(outputname, 'w', encoding='utf-8') as outputfile:
-            outputfile.write(stroutput)
+        write_text_atomic(outputname, stroutput)
     except IOError as e:
         print(f"Error writing JSON Hash file {outputname}: {e}")
     return
 
-def write_spriteatlas_libgdx(filename, filetag, img_w, img_h):
+def write_spriteatlas_libgdx(filename, filetag, img_w, img_h, scale=1):
     global layer_rects
-    stroutput = (f"{filetag}.png\nsize: {img_w},{img_h}\nformat: RGBA8888\nfilter: Linear,Linear\nrepeat: none\n")
+    stroutput = (f"{filetag}.{image_ext}\nsize: {img_w},{img_h}\nformat: {pixel_format}\nfilter: Linear,Linear\nrepeat: none\n")
 
     # insert all sprite metadata
     for obj in layer_rects:
-        stroutput +=  (f"{obj.name}\n  rotate: false\n  xy: {obj.pack_x}, {obj.pack_y}\n  size: {obj.width}, {obj.height}\n  orig: {obj.width}, {obj.height}\n  offset: 0, 0\n  index: -1\n")
+        if not obj.packed:
+            continue
+        x, y, w, h = scaled_frame(obj, scale)
+        # animation frames use the animation name, the frame number is the index
+        region_name = obj.anim_name if obj.anim_name is not None else obj.name
+        stroutput +=  (f"{region_name}\n  rotate: false\n  xy: {x}, {y}\n  size: {w}, {h}\n")
+        if obj.split:
+            stroutput += "  split: %d, %d, %d, %d\n" % scaled_borders(obj.split, scale)
+            if obj.pad:
+                stroutput += "  pad: %d, %d, %d, %d\n" % scaled_borders(obj.pad, scale)
+        stroutput +=  (f"  orig: {w}, {h}\n  offset: 0, 0\n  index: {obj.anim_index}\n")
 
     # export filename
     outputname = f'{filename}.atlas'
 
     # export coordinate variables to textfile
     try:
-        with open(outputname, 'w', encoding='utf-8') as outputfile:
-            outputfile.write(stroutput)
+        write_text_atomic(outputname, stroutput)
     except IOError as e:
         print(f"Error writing libGDX file {outputname}: {e}")
     return
 
-def write_spriteatlas_css(filename, filetag):
+def write_spriteatlas_css(filename, filetag, scale=1):
     global layer_rects
     stroutput = f"/* GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION} by Bas de Reuver */\n" # Removed year for less maintenance
 
     # insert all sprite metadata
     for obj in layer_rects:
+        if not obj.packed:
+            continue
         # CSS class names should be sanitized
         css_class_name = Gimp.canonize_identifier(obj.name, '_') # Basic sanitization
+        x, y, w, h = scaled_frame(obj, scale)
         stroutput += f".{css_class_name} {{\n"
-        stroutput += f"\tbackground: url('{filetag}.png') no-repeat -{obj.pack_x}px -{obj.pack_y}px;\n"
-        stroutput += f"\twidth: {obj.width}px;\n"
-        stroutput += f"\theight: {obj.height}px;\n"
+        stroutput += f"\tbackground: url('{filetag}.{image_ext}') no-repeat -{x}px -{y}px;\n"
+        stroutput += f"\twidth: {w}px;\n"
+        stroutput += f"\theight: {h}px;\n"
         stroutput += "}\n"
 
     # export filename
@@ -430,21 +1099,31 @@ def write_spriteatlas_css(filename, filetag):
 
     # export coordinate variables to textfile
     try:
-        with open(outputname, 'w', encoding='utf-8') as outputfile:
-            outputfile.write(stroutput)
+        write_text_atomic(outputname, stroutput)
     except IOError as e:
         print(f"Error writing CSS file {outputname}: {e}")
     return
 
 
-def write_spriteatlas_xml(filename, filetag):
+def write_spriteatlas_xml(filename, filetag, scale=1):
     global layer_rects
-    stroutput = (f'<TextureAtlas imagePath="{filetag}.png">\n') # Removed xmlns, less common for simple XML data
+    stroutput = (f'<TextureAtlas imagePath="{filetag}.{image_ext}">\n') # Removed xmlns, less common for simple XML data
     stroutput += f'\t<!-- GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION} by Bas de Reuver -->\n' # Removed year
 
     # insert all sprite metadata
     for obj in layer_rects:
-        stroutput += f'\t<SubTexture name="{obj.name}" x="{obj.pack_x}" y="{obj.pack_y}" width="{obj.width}" height="{obj.height}"/>\n' # Use self-closing tag
+        if not obj.packed:
+            continue
+        x, y, w, h = scaled_frame(obj, scale)
+        strtags = ""
+        if obj.pivot:
+            # pivot in pixels, same as Starling
+            strtags += f' pivotX="{obj.pivot[0] * w:g}" pivotY="{obj.pivot[1] * h:g}"'
+        if obj.split:
+            strtags += ' split="%d,%d,%d,%d"' % scaled_borders(obj.split, scale)
+        if obj.pad:
+            strtags += ' pad="%d,%d,%d,%d"' % scaled_borders(obj.pad, scale)
+        stroutput += f'\t<SubTexture name="{obj.name}" x="{x}" y="{y}" width="{w}" height="{h}"{strtags}/>\n' # Use self-closing tag
 
     stroutput += '</TextureAtlas>\n'
 
@@ -453,12 +1132,236 @@ def write_spriteatlas_xml(filename, filetag):
 
     # export coordinate variables to textfile
     try:
-        with open(outputname, 'w', encoding='utf-8') as outputfile:
-            outputfile.write(stroutput)
+        write_text_atomic(outputname, stroutput)
     except IOError as e:
         print(f"Error writing XML file {outputname}: {e}")
     return
 
+# file extension of each coordinate file format
+COORDINATE_EXTS = {"JSON Array": "json", "JSON Hash": "json", "libGDX": "atlas", "CSS": "css", "XML": "xml"}
+
+def start_spriteatlas_coordinates(executor, outputtype, filename, filetag, img_w, img_h):
+    # Write the coordinate file on a worker thread under a unique temporary name next to it,
+    # publish_spriteatlas_coordinates renames it once the image was exported, so a game never
+    # sees coordinates for an atlas image that isn't there. Returns the future and temporary name.
+    folder, name = os.path.split(filename)
+    handle, pending = tempfile.mkstemp(prefix=f".{name}.", dir=folder or None)
+    os.close(handle)
+    return executor.submit(write_spriteatlas_coordinates, outputtype, pending, filetag, img_w, img_h), pending
+
+def publish_spriteatlas_coordinates(coordinates, pending, outputtype, filename, exported):
+    # after the executor was shut down, rename the coordinate file from start_spriteatlas_coordinates
+    # to filename when the image was exported, and remove the temporary files
+    ext = COORDINATE_EXTS[outputtype]
+    try:
+        if exported:
+            coordinates.result()
+            replace_file(f"{pending}.{ext}", f"{filename}.{ext}")
+    finally:
+        for tmpname in (pending, f"{pending}.{ext}"):
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+def write_spriteatlas_coordinates(outputtype, filename, filetag, img_w, img_h, scale=1):
+    # write coordinate file in the selected format
+    if outputtype == "JSON Array":
+        write_spriteatlas_jsonarray(filename, filetag, img_w, img_h, scale)
+    elif outputtype == "JSON Hash":
+        write_spriteatlas_jsonhash(filename, filetag, img_w, img_h, scale)
+    elif outputtype == "libGDX":
+        write_spriteatlas_libgdx(filename, filetag, img_w, img_h, scale)
+    elif outputtype == "CSS":
+        write_spriteatlas_css(filename, filetag, scale)
+    else: # outputtype == "XML"
+        write_spriteatlas_xml(filename, filetag, scale)
+
+# export options that add metadata which changes with every export
+METADATA_OPTIONS = ["include-exif", "include-xmp", "include-iptc", "include-thumbnail", "include-comment",
+                    "include-color-profile"]
+
+def save_spriteatlas_image(imgAtlas, basename, build_hash=False, read_back=False):
+    # export atlas image with the selected format and options, optionally with the build hash as PNG text,
+    # returns filename, encode time in seconds, file size in bytes and the pixels decoded from the
+    # exported file when read back or hashed (None otherwise), the exporter can change the pixels
+    filename = f"{basename}.{image_ext}"
+    imgExport = imgAtlas
+    start = time.perf_counter()
+    if image_indexed or premultiply_alpha:
+        # change a copy, the RGBA atlas is still needed for mipmaps and variants
+        imgExport = imgAtlas.duplicate()
+    if premultiply_alpha:
+        premultiply_layer(imgExport.get_layers()[0])
+    if image_indexed:
+        imgExport.convert_indexed(Gimp.ConvertDitherType.NONE, Gimp.ConvertPaletteType.GENERATE, 256, True, True, "")
+
+    if image_ext == "webp":
+        proc = Gimp.get_pdb().lookup_procedure("file-webp-export")
+        config = proc.create_config()
+        config.set_property("lossless", True)
+        config.set_property("quality", 100.0)
+        config.set_property("alpha-quality", 100.0)
+        # libwebp drops the colors of transparent pixels unless it keeps them exactly
+        if proc.find_argument("exact"):
+            config.set_property("exact", keep_transparent)
+        elif keep_transparent:
+            print("Warning: This WebP exporter has no option to keep the colors of transparent pixels")
+    else:
+        proc = Gimp.get_pdb().lookup_procedure("file-png-export")
+        config = proc.create_config()
+        config.set_property("compression", image_compression)
+        config.set_property("interlaced", False)
+        # without this the exporter sets the color of fully transparent pixels to black
+        config.set_property("save-transparent", keep_transparent)
+        # no modification time in reproducible builds
+        config.set_property("time", not stable_order)
+    if stable_order:
+        # metadata has export dates and document IDs, reproducible builds leave it out
+        for option in METADATA_OPTIONS:
+            if proc.find_argument(option):
+                config.set_property(option, False)
+    config.set_property("run-mode", Gimp.RunMode.NONINTERACTIVE)
+    config.set_property("image", imgExport)
+
+    exported = None
+
+    def export_image(tmpname):
+        nonlocal exported
+        config.set_property("file", Gio.File.new_for_path(tmpname))
+        result = proc.run(config)
+        if result.index(0) != Gimp.PDBStatusType.SUCCESS:
+            raise IOError(f"Could not export {filename}")
+        if build_hash or read_back:
+            _, _, exported = read_image_file_pixels(tmpname)
+        if build_hash and image_ext == "png":
+            png_writer.add_text_chunks(tmpname, build_hash_text(exported))
+
+    try:
+        write_atomic(filename, export_image)
+    finally:
+        if imgExport is not imgAtlas:
+            imgExport.delete()
+    elapsed = time.perf_counter() - start
+    return filename, elapsed, os.path.getsize(filename), exported
+
+def check_reproducible_export(imgAtlas, filename, build_hash):
+    # export the atlas a second time and compare the bytes, returns False when the files differ
+    with tempfile.TemporaryDirectory() as folder:
+        second, _, _, _ = save_spriteatlas_image(imgAtlas, os.path.join(folder, "check"), build_hash)
+        with open(filename, 'rb') as first_file, open(second, 'rb') as second_file:
+            if first_file.read() == second_file.read():
+                return True
+    print(f"Warning: {filename} is not reproducible, a second export gave different bytes")
+    return False
+
+def read_image_file_pixels(filename):
+    # RGBA pixels of an image file as exported, returns width, height and pixels
+    imgFile = Gimp.file_load(Gimp.RunMode.NONINTERACTIVE, Gio.File.new_for_path(filename))
+    try:
+        layer = imgFile.get_layers()[0]
+        return layer.get_width(), layer.get_height(), read_layer_pixels(layer)
+    finally:
+        imgFile.delete()
+
+def check_exported_bleeding(imgAtlas, filename, exported):
+    # the bled colors of the transparent pixels must survive the export, returns False when they didn't
+    if premultiply_alpha or image_indexed:
+        print("Warning: Premultiplied alpha and indexed palette export drop the alpha bleeding colors")
+        return False
+    if pixel_ops.transparent_colors(exported) != pixel_ops.transparent_colors(read_layer_pixels(imgAtlas.get_layers()[0])):
+        print(f"Warning: {filename} lost the alpha bleeding colors of transparent pixels")
+        return False
+    return True
+
+def write_spriteatlas_patch(basename, new_w, new_h, new_pixels, previous):
+    # compact update from the previous build, the changed pixel rectangles and sprite coordinates,
+    # both atlases are compared as decoded from the exported files
+    old_w, old_h, old_pixels, old_frames = previous
+    new_frames = {obj.name: (obj.pack_x, obj.pack_y, obj.width, obj.height) for obj in layer_rects if obj.packed}
+    count = 0
+
+    def write_patch(tmpname):
+        nonlocal count
+        with open(tmpname, 'wb') as outputfile:
+            count = atlas_patch.write_patch(outputfile, old_pixels, old_w, old_h,
+                                            new_pixels, new_w, new_h, old_frames, new_frames)
+
+    filename = f"{basename}.patch"
+    write_atomic(filename, write_patch)
+    print(f"Exported {filename}: {count} changed rectangles, {os.path.getsize(filename)} bytes")
+
+def save_spriteatlas_texture(imgAtlas, basename, container, compression):
+    # export atlas pixels as GPU texture container, straight from the composited layer
+    layer = imgAtlas.get_layers()[0]
+    pixels = read_layer_pixels(layer, premultiply_alpha)
+    width = layer.get_width()
+    height = layer.get_height()
+    if container == "DDS":
+        write_atomic(f"{basename}.dds",
+                     lambda tmpname: texture_container.write_dds(tmpname, pixels, width, height, compression))
+    else:
+        writer = f"GIMP SpriteAtlas plug-in {ATLAS_PLUGIN_VERSION}"
+        write_atomic(f"{basename}.ktx2",
+                     lambda tmpname: texture_container.write_ktx2(tmpname, pixels, width, height, compression, writer, premultiply_alpha))
+
+# padding, extended edges and alignment are 2 ** levels pixels, more levels waste too much space around small sprites
+MAX_MIP_LEVELS = 4
+
+def export_spriteatlas_mipmaps(imgAtlas, foldername, filetag, outputtype, levels, interpolation):
+    # export downsampled copies of the atlas (1/2, 1/4, ...) each with its own coordinate file,
+    # every level is scaled from the previous one so only the in-memory atlas is used
+    imgLevel = imgAtlas.duplicate()
+    Gimp.context_push()
+    Gimp.context_set_interpolation(interpolation)
+    for level in range(1, levels + 1):
+        level_w = max(imgLevel.get_width() // 2, 1)
+        level_h = max(imgLevel.get_height() // 2, 1)
+        imgLevel.scale(level_w, level_h)
+        # scaling mixes the reduced colors, reduce them again so the level is in the atlas pixel format
+        if pixel_format != "RGBA8888":
+            quantize_layer(imgLevel.get_layers()[0])
+
+        level_tag = f"{filetag}_mip{level}"
+        level_basename = os.path.join(foldername, level_tag)
+        save_spriteatlas_image(imgLevel, level_basename)
+        write_spriteatlas_coordinates(outputtype, level_basename, level_tag, level_w, level_h, 0.5 ** level)
+    Gimp.context_pop()
+    imgLevel.delete()
+
+def parse_variant_scales(text):
+    # parse "0.5, 0.25" into a list of scales, largest first, raises ValueError on invalid input
+    scales = []
+    for item in text.replace(';', ',').split(','):
+        item = item.strip().lower().lstrip('@').rstrip('x')
+        if not item:
+            continue
+        scale = float(item)
+        if not 0 < scale < 1:
+            raise ValueError(f"variant scale {scale:g} must be between 0 and 1")
+        if scale not in scales:
+            scales.append(scale)
+    scales.sort(reverse=True)
+    return scales
+
+def export_spriteatlas_variants(imgAtlas, foldername, filetag, outputtype, scales, interpolation):
+    # export smaller versions of the atlas (for example sprites@0.5x.png) using the same layout,
+    # all variants are scaled from the one rendered atlas so the sprites are only packed and copied once
+    Gimp.context_push()
+    Gimp.context_set_interpolation(interpolation)
+    for scale in scales:
+        variant_w = max(int(math.ceil(imgAtlas.get_width() * scale)), 1)
+        variant_h = max(int(math.ceil(imgAtlas.get_height() * scale)), 1)
+        imgVariant = imgAtlas.duplicate()
+        imgVariant.scale(variant_w, variant_h)
+        if pixel_format != "RGBA8888":
+            quantize_layer(imgVariant.get_layers()[0])
+
+        variant_tag = f"{filetag}@{scale:g}x"
+        variant_basename = os.path.join(foldername, variant_tag)
+        save_spriteatlas_image(imgVariant, variant_basename)
+        write_spriteatlas_coordinates(outputtype, variant_basename, variant_tag, variant_w, variant_h, scale)
+        imgVariant.delete()
+    Gimp.context_pop()
+
 # --- Main Plugin Logic ---
 
 def run_create_spriteatlas(procedure, run_mode, image, drawables, args, data):
@@ -473,15 +1376,61 @@ def run_create_spriteatlas(procedure, run_mode, image, drawables, args, data):
         else:
             dialog.destroy()
 
-    
-    
-    global pixel_space, layer_rects
+    sprite_folder_giofile = args.get_property("spriteFolder")
+    sprite_folder = sprite_folder_giofile.get_path() if sprite_folder_giofile else None
+    repack_giofile = args.get_property("repackAtlas")
+    repack_atlas = repack_giofile.get_path() if repack_giofile else None
+    return create_spriteatlas(procedure, run_mode, image, args, args.get_property("fileName"), sprite_folder, repack_atlas,
+                              previous_atlas_path(args, 1))
+
+def previous_atlas_path(args, inputs):
+    # path of the previous atlas coordinate file or None, it belongs to one atlas,
+    # so it can't be used when one run builds several, raises ValueError then
+    previous_path = previous_giofile.get_path() if previous_giofile else None
+    if previous_path and inputs > 1:
+        raise ValueError("A previous atlas can only be used with a single input")
+    return previous_path
+
+def create_spriteatlas(procedure, run_mode, image, args, filetag, sprite_folder=None, repack_atlas=None, previous_path=None,
+                       cache=None, layout=None):
+    # build and export the atlas for the layers of image, for the PNG files in sprite_folder or
+    # for the sprites in the repack_atlas coordinate file, with the output settings in args,
+    # optionally keeping the layout of the previous_path atlas and making a patch against it,
+    # returns the return values for procedure. Repeated builds can pass the sprite cache to use
+    # instead of the one from the cacheSize setting, and a dict that keeps the packed layout,
+    # which is used again while the sprites and their sizes stay the same.
+    global pixel_space, layer_rects, ext_size, block_align
+    global image_ext, image_compression, image_indexed, premultiply_alpha, stable_order, worker_threads, packing_order, packing_width
+    global pixel_format, keep_transparent
 
     # Get arguments using GObject introspection
-    filetag = args.get_property("fileName")
     foldername_giofile = args.get_property("outputFolder") # This is a Gio.File
     outputtype = args.get_property("fileType")
     padding = args.get_property("addPadding")
+    mip_levels = args.get_property("mipLevels")
+    mip_filter = args.get_property("mipFilter")
+    variants = args.get_property("variants")
+    image_ext = "webp" if args.get_property("imageFormat") == "WebP" else "png"
+    image_compression = args.get_property("compressionLevel")
+    image_indexed = args.get_property("indexedPalette")
+    tex_container = args.get_property("textureContainer")
+    tex_compression = args.get_property("textureCompression")
+    pixel_format_choice = args.get_property("pixelFormat")
+    premultiply_alpha = args.get_property("premultiplyAlpha")
+    bleed_iterations = args.get_property("bleedIterations")
+    keep_transparent = bleed_iterations > 0
+    packing_report = args.get_property("packingReport")
+    stable_order = args.get_property("stableOrder")
+    check_reproducible = args.get_property("checkReproducible")
+    watermark = args.get_property("watermark")
+    mesh_vertices = args.get_property("meshVertices")
+    detect_animations = args.get_property("animations")
+    strip_height = args.get_property("stripHeight")
+    cache_size = args.get_property("cacheSize")
+    worker_threads = args.get_property("workerThreads")
+    packing_choice = args.get_property("packingOrder")
+    packing_trials = args.get_property("packingTrials")
+    packing_width = args.get_property("packingWidth")
 
     # Convert Gio.File to path string
     foldername = foldername_giofile.get_path() if foldername_giofile else GLib.get_tmp_dir() # Use temp dir if None
@@ -492,61 +1441,202 @@ def run_create_spriteatlas(procedure, run_mode, image, drawables, args, data):
          return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error()) # Indicate failure
 
 
-    # add 1 pixel padding
-    pixel_space = 1 if padding else 0
+    try:
+        variant_scales = parse_variant_scales(variants or "")
+    except ValueError as e:
+        Gimp.message(f"Invalid variant scales '{variants}': {e}")
+        return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
+
+    # add 1 pixel padding, scaled up with the mip levels and variants so that
+    # padding and extruded edges are still at least 1 pixel in the smallest level
+    mip_factor = 2 ** mip_levels
+    if variant_scales:
+        mip_factor = max(mip_factor, int(math.ceil(1 / variant_scales[-1])))
+    pixel_space = mip_factor if padding else 0
+    ext_size = mip_factor
+    block_align = mip_factor
+    if tex_container != "None":
+        # GPU block compression works on 4x4 pixel blocks
+        block_align = max(block_align, 4)
 
     # Clear any selections on the original image
     # image.selection_none() # GIMP 3 API // FIXME: needed?
 
+    # optional previous build to keep the layout of and to make a patch against,
+    # read before anything is exported because the files can have the same names
+    previous = None
+    if previous_path:
+        try:
+            previous_atlas = atlas_reader.read_atlas(previous_path)
+            previous_frames = {frame.name: (frame.x, frame.y, frame.w, frame.h) for frame in previous_atlas.frames}
+            previous_image = os.path.join(os.path.dirname(previous_path), previous_atlas.image)
+            old_w, old_h, old_pixels = read_image_file_pixels(previous_image)
+            previous = (old_w, old_h, old_pixels, previous_frames)
+        except Exception as e:
+            print(f"Error reading previous atlas {previous_path}: {e}")
+            Gimp.message(f"Error reading previous atlas {previous_path}, no patch is made: {e}")
+
+    # optionally load the sprites from a folder instead of the image layers
+    imgSprites = None
+    if sprite_folder:
+        if not os.path.isdir(sprite_folder):
+            Gimp.message(f"Sprite folder '{sprite_folder}' is not valid.")
+            return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
+        if cache is None and cache_size > 0:
+            cache = sprite_cache.SpriteCache(os.path.join(GLib.get_user_cache_dir(), "gimp-spriteatlas"), cache_size * 1024 * 1024)
+        start = time.perf_counter()
+        imgSprites = load_sprite_folder(sprite_folder, cache)
+        image = imgSprites
+        print(f"Loaded sprite folder in {time.perf_counter() - start:.3f} s")
+    elif repack_atlas:
+        try:
+            imgSprites = load_atlas_sprites(repack_atlas)
+        except Exception as e:
+            Gimp.message(f"Could not unpack atlas '{repack_atlas}': {e}")
+            return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
+        image = imgSprites
+
     prepare_layers_metadata(image) # Pass image
 
     if not layer_rects:
         Gimp.message("No visible layers found to process.")
+        if imgSprites:
+            imgSprites.delete()
         return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
 
     # export filename(s) - Use os.path.join for cross-platform compatibility
     output_basename = os.path.join(foldername, filetag)
 
     # compile image
-    calc_layers_packing()
-    imgAtlas, img_w, img_h = render_spriteatlas(image, filetag) # Pass original image
+    start = time.perf_counter()
+    prepared = list(layer_rects)
+    sizes = [(obj.name, obj.tot_width, obj.tot_height) for obj in prepared]
+    if previous:
+        # kept sprites don't follow a packing order, new sprites are packed tallest first
+        packing_order, packing_width = "Height", 100
+        calc_layers_packing_preserved(previous[3], previous[0], previous[1])
+    elif layout is not None and layout.get("sizes") == sizes:
+        # same sprites with the same sizes as the last build, only the pixels changed
+        packing_order, packing_width = layout["packing"]
+        layer_rects = [prepared[i] for i, _, _, _ in layout["positions"]]
+        for obj, (_, x, y, packed) in zip(layer_rects, layout["positions"]):
+            obj.pack_x, obj.pack_y, obj.packed = x, y, packed
+        print("Sprite sizes didn't change, using the packing of the last build")
+    elif packing_choice == "Best":
+        packing_order, packing_width = calc_best_packing(packing_trials)
+        print(f"Best packing: order {packing_order} at {packing_width}% width")
+    else:
+        packing_order = packing_choice
+        layer_rects.sort(key=PACKING_ORDERS[packing_order])
+        calc_layers_packing_fit(calc_start_width(layer_rects, packing_width))
+    if layout is not None:
+        index = {id(obj): i for i, obj in enumerate(prepared)}
+        layout["sizes"] = sizes
+        layout["packing"] = (packing_order, packing_width)
+        layout["positions"] = [(index[id(obj)], obj.pack_x, obj.pack_y, obj.packed) for obj in layer_rects]
+    if detect_animations:
+        calc_animations()
+    if mesh_vertices > 0 and outputtype in ("JSON Array", "JSON Hash"):
+        calc_sprite_meshes(mesh_vertices)
+    print(f"Packed {len(layer_rects)} sprites in {time.perf_counter() - start:.3f} s")
+
+    # pixel format of the atlas, Auto looks at the channels the sprites use
+    pixel_format = detect_pixel_format() if pixel_format_choice == "Auto" else pixel_format_choice
+    if pixel_format != "RGBA8888":
+        img_w, img_h = calc_spriteatlas_size()
+        pixel_size = texture_container.PIXEL_SIZES[PIXEL_FORMATS[pixel_format]]
+        print(f"Pixel format {pixel_format}: {img_w * img_h * pixel_size} bytes of texture memory instead of {img_w * img_h * 4}")
+
+    if strip_height > 0:
+        if previous:
+            print("Warning: Strip rendering doesn't make atlas patches")
+        # options that need the whole atlas as GIMP image
+        dropped = [option for option, used in (("GPU texture file", tex_container != "None"),
+                                               ("mipmap levels", mip_levels > 0),
+                                               ("variant scales", bool(variant_scales)),
+                                               ("alpha bleeding", bleed_iterations > 0),
+                                               ("pixels watermark", watermark == "Pixels")) if used]
+        if dropped:
+            print(f"Warning: Strip rendering skips the options {', '.join(dropped)}")
+        result = run_spriteatlas_strips(procedure, output_basename, filetag, outputtype, strip_height, watermark == "Text", packing_report)
+        if imgSprites:
+            imgSprites.delete()
+        return result
+
+    if watermark == "Text" and image_ext != "png":
+        print("Warning: The build hash text is only added to PNG files")
+
+    start = time.perf_counter()
+    # batch mode runs without display, the atlas image is deleted when done
+    show = run_mode != Gimp.RunMode.NONINTERACTIVE
+    imgAtlas, img_w, img_h = render_spriteatlas(image, filetag, show) # Pass original image
+    print(f"Rendered atlas in {time.perf_counter() - start:.3f} s")
+    # the loaded sprites are not needed after rendering
+    if imgSprites:
+        imgSprites.delete()
 
     if imgAtlas is None:
         Gimp.message("Failed to render the sprite atlas image.")
         return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, GLib.Error())
 
-    # Save the atlas image using Gimp.file_save
-    try:
-        # Construct Gio.File for saving
-        png_filename = f"{output_basename}.png"
-        png_file = Gio.File.new_for_path(png_filename)
+    # fill transparent pixels around the sprites with the edge colors
+    if bleed_iterations > 0:
+        bleed_layer(imgAtlas.get_layers()[0], bleed_iterations)
 
-        # Gimp.file_save expects drawables as a list/array
-        # drawable_list = imgAtlas.get_layers()
-        # drawable_to_save = drawable_list[0] # Fallback to first layer
+    if watermark == "Pixels":
+        render_watermark(imgAtlas.get_layers()[0], img_w, img_h)
 
-        Gimp.file_save(run_mode, imgAtlas, png_file, None) 
+    if pixel_format != "RGBA8888":
+        quantize_layer(imgAtlas.get_layers()[0])
+
+    # the coordinate file only needs the packed layout, write it on a worker thread while GIMP exports the image,
+    # it is only put in place after the image
+    executor = ThreadPoolExecutor(1) if worker_threads > 0 else None
+    coordinates = None
+    if executor:
+        coordinates, pending = start_spriteatlas_coordinates(executor, outputtype, output_basename, filetag, img_w, img_h)
+
+    # Save the atlas image with the selected format and compression
+    try:
+        # patches and the alpha bleeding check compare the pixels as exported
+        image_filename, encode_time, encode_size, exported = save_spriteatlas_image(
+            imgAtlas, output_basename, watermark == "Text", previous is not None or bleed_iterations > 0)
+
+        # report the tradeoff between encode time and file size compared to raw RGBA pixels
+        raw_size = img_w * img_h * 4
+        print(f"Exported {image_filename}: {encode_size} bytes ({100.0 * encode_size / raw_size:.1f}% of raw RGBA) in {encode_time:.3f} s")
+        if bleed_iterations > 0:
+            check_exported_bleeding(imgAtlas, image_filename, exported)
+        if check_reproducible:
+            check_reproducible_export(imgAtlas, image_filename, watermark == "Text")
 
     except Exception as e:
-        error_message = f"Failed to save atlas image {png_filename}: {e}"
+        error_message = f"Failed to save atlas image {output_basename}.{image_ext}: {e}"
         Gimp.message(error_message)
         # Clean up the created image if saving failed
         Gimp.Image.delete(imgAtlas)
+        if executor:
+            executor.shutdown()
+            # no coordinates without the image
+            publish_spriteatlas_coordinates(coordinates, pending, outputtype, output_basename, False)
         return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, GLib.Error(error_message))
 
 
+    # optional patch from the previous build
+    if previous:
+        try:
+            write_spriteatlas_patch(output_basename, img_w, img_h, exported, previous)
+        except Exception as e:
+            print(f"Error writing atlas patch: {e}")
+            Gimp.message(f"Error writing atlas patch: {e}")
+
     # write coordinate file
     try:
-        if outputtype == "JSON Array":
-            write_spriteatlas_jsonarray(output_basename, filetag, img_w, img_h)
-        elif outputtype == "JSON Hash":
-            write_spriteatlas_jsonhash(output_basename, filetag, img_w, img_h)
-        elif outputtype == "libGDX":
-            write_spriteatlas_libgdx(output_basename, filetag, img_w, img_h)
-        elif outputtype == "CSS":
-            write_spriteatlas_css(output_basename, filetag)
-        else: # outputtype == 5
-            write_spriteatlas_xml(output_basename, filetag)
+        if coordinates:
+            executor.shutdown()
+            publish_spriteatlas_coordinates(coordinates, pending, outputtype, output_basename, True)
+        else:
+            write_spriteatlas_coordinates(outputtype, output_basename, filetag, img_w, img_h)
     except Exception as e:
          # Log error, maybe inform user
          print(f"Error writing coordinate file: {e}")
@@ -554,10 +1644,175 @@ def run_create_spriteatlas(procedure, run_mode, image, drawables, args, data):
          # Don't necessarily fail the whole plugin if only coord file fails,
          # but maybe return a different status or warning.
 
+    # optional packing quality report
+    if packing_report:
+        try:
+            report = calc_packing_report(img_w, img_h)
+            write_spriteatlas_report(output_basename, report)
+            export_occupancy_heatmap(output_basename, img_w, img_h)
+            print(f"Packing occupancy {report['occupancy']:.1f}%, {report['unplaced']} unplaced sprites")
+        except Exception as e:
+            print(f"Error writing packing report: {e}")
+            Gimp.message(f"Error writing packing report: {e}")
+
+    # optional GPU texture container, uncompressed in the atlas pixel format
+    if tex_container != "None":
+        if tex_compression == "RGBA8":
+            tex_compression = PIXEL_FORMATS[pixel_format]
+        try:
+            save_spriteatlas_texture(imgAtlas, output_basename, tex_container, tex_compression)
+        except Exception as e:
+            print(f"Error writing texture file: {e}")
+            Gimp.message(f"Error writing texture file: {e}")
+
+    # optional mipmap levels and smaller variants
+    interpolation = Gimp.InterpolationType.LOHALO if mip_filter == "LoHalo" else Gimp.InterpolationType.LINEAR
+    if mip_levels > 0:
+        try:
+            export_spriteatlas_mipmaps(imgAtlas, foldername, filetag, outputtype, mip_levels, interpolation)
+        except Exception as e:
+            print(f"Error writing mipmap levels: {e}")
+            Gimp.message(f"Error writing mipmap levels: {e}")
+    if variant_scales:
+        try:
+            export_spriteatlas_variants(imgAtlas, foldername, filetag, outputtype, variant_scales, interpolation)
+        except Exception as e:
+            print(f"Error writing variants: {e}")
+            Gimp.message(f"Error writing variants: {e}")
+
+    if not show:
+        imgAtlas.delete()
+
     # Return success
     return procedure.new_return_values(Gimp.PDBStatusType.SUCCESS, GLib.Error())
 
 
+def run_create_spriteatlas_batch(procedure, config, data):
+    # one atlas for each input image file or sprite folder, named after the file or folder,
+    # the loaded images are deleted after each file, returns a result line per file
+    run_mode = config.get_property("run-mode")
+    paths = config.get_property("inputFiles") or []
+    try:
+        previous_path = previous_atlas_path(config, len(paths))
+    except ValueError as e:
+        Gimp.message(str(e))
+        return procedure.new_return_values(Gimp.PDBStatusType.CALLING_ERROR, GLib.Error(str(e)))
+    results = []
+    for path in paths:
+        filetag = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        image = None
+        try:
+            if os.path.isdir(path):
+                result = create_spriteatlas(procedure, run_mode, None, config, filetag, path, previous_path=previous_path)
+            elif os.path.splitext(path)[1].lower() in atlas_reader.READERS:
+                result = create_spriteatlas(procedure, run_mode, None, config, filetag, repack_atlas=path, previous_path=previous_path)
+            else:
+                image = Gimp.file_load(Gimp.RunMode.NONINTERACTIVE, Gio.File.new_for_path(path))
+                result = create_spriteatlas(procedure, run_mode, image, config, filetag, previous_path=previous_path)
+            status = result.index(0)
+            message = "OK" if status == Gimp.PDBStatusType.SUCCESS else f"failed ({status.value_nick})"
+        except Exception as e:
+            message = f"failed ({e})"
+        finally:
+            if image:
+                image.delete()
+        print(f"{path}: {message}")
+        results.append(f"{path}: {message}")
+    return results_return_values(procedure, results)
+
+def results_return_values(procedure, results):
+    # success with the result lines as string array return value
+    retval = procedure.new_return_values(Gimp.PDBStatusType.SUCCESS, GLib.Error())
+    retval.remove(1)
+    retval.insert(1, GObject.Value(GObject.TYPE_STRV, results))
+    return retval
+
+def run_create_spriteatlas_watch(procedure, config, data):
+    # Long running build for sprite folders, each folder is built once and then again every time
+    # its PNG files change. Unchanged sprites come from the sprite cache, so only the changed files
+    # are decoded again. Stops after watchTime seconds, or runs until GIMP is stopped when 0.
+    run_mode = config.get_property("run-mode")
+    folders = [os.path.normpath(path) for path in config.get_property("inputFiles") or []]
+    output_giofile = config.get_property("outputFolder")
+    output_folder = os.path.normpath(output_giofile.get_path()) if output_giofile else None
+    for folder in folders:
+        if not os.path.isdir(folder) or folder == output_folder:
+            # the exported atlas in a watched folder would be a new sprite and start the next build
+            message = f"Watch needs sprite folders that are not the export folder, '{folder}' is not valid."
+            Gimp.message(message)
+            return procedure.new_return_values(Gimp.PDBStatusType.CALLING_ERROR, GLib.Error(message))
+    try:
+        previous_path = previous_atlas_path(config, len(folders))
+    except ValueError as e:
+        Gimp.message(str(e))
+        return procedure.new_return_values(Gimp.PDBStatusType.CALLING_ERROR, GLib.Error(str(e)))
+    # watching always uses the sprite cache, so only changed files are decoded again
+    cache_size = config.get_property("cacheSize") or DEFAULT_CACHE_SIZE
+    cache = sprite_cache.SpriteCache(os.path.join(GLib.get_user_cache_dir(), "gimp-spriteatlas"), cache_size * 1024 * 1024)
+    # last result line and packed layout of each folder
+    results = {}
+    layouts = {folder: {} for folder in folders}
+
+    def build(folder):
+        start = time.perf_counter()
+        try:
+            result = create_spriteatlas(procedure, run_mode, None, config, os.path.splitext(os.path.basename(folder))[0], folder,
+                                        previous_path=previous_path, cache=cache, layout=layouts[folder])
+            status = result.index(0)
+            message = "OK" if status == Gimp.PDBStatusType.SUCCESS else f"failed ({status.value_nick})"
+        except Exception as e:
+            message = f"failed ({e})"
+        print(f"{folder}: {message}, rebuilt in {time.perf_counter() - start:.3f} s")
+        results[folder] = f"{folder}: {message}"
+
+    # snapshot before the first build, so changes made during a build start the next one
+    watcher = sprite_watch.FolderWatcher(folders, config.get_property("debounce") / 1000.0)
+    for folder in folders:
+        build(folder)
+    watch_time = config.get_property("watchTime")
+    deadline = time.monotonic() + watch_time if watch_time > 0 else None
+    print(f"Watching {len(folders)} sprite folders")
+    while deadline is None or time.monotonic() < deadline:
+        changes = watcher.wait(None if deadline is None else max(deadline - time.monotonic(), 0))
+        for folder, paths in changes.items():
+            print(f"{folder}: {len(paths)} changed files")
+            build(folder)
+    return results_return_values(procedure, list(results.values()))
+
+def run_spriteatlas_strips(procedure, output_basename, filetag, outputtype, strip_height, build_hash, packing_report):
+    # low memory mode, the atlas is written directly as PNG without creating a GIMP image
+    global image_ext
+    if image_ext != "png" or image_indexed:
+        print("Warning: Strip rendering only exports RGBA PNG")
+    image_ext = "png"
+
+    img_w, img_h = calc_spriteatlas_size()
+    if img_w <= 0 or img_h <= 0:
+        Gimp.message("Failed to render the sprite atlas image.")
+        return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, GLib.Error())
+
+    image_filename = f"{output_basename}.png"
+    try:
+        start = time.perf_counter()
+        render_spriteatlas_strips(image_filename, img_w, img_h, strip_height, build_hash)
+        print(f"Exported {image_filename}: {os.path.getsize(image_filename)} bytes in {time.perf_counter() - start:.3f} s, {strip_height} rows per strip")
+    except Exception as e:
+        error_message = f"Failed to save atlas image {image_filename}: {e}"
+        Gimp.message(error_message)
+        return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, GLib.Error(error_message))
+
+    try:
+        write_spriteatlas_coordinates(outputtype, output_basename, filetag, img_w, img_h)
+        if packing_report:
+            write_spriteatlas_report(output_basename, calc_packing_report(img_w, img_h))
+            export_occupancy_heatmap(output_basename, img_w, img_h)
+    except Exception as e:
+        print(f"Error writing coordinate file: {e}")
+        Gimp.message(f"Error writing coordinate file: {e}")
+
+    return procedure.new_return_values(Gimp.PDBStatusType.SUCCESS, GLib.Error())
+
+
 # --- GIMP 3 Plugin Registration ---
 
 class SpriteAtlasPlugin(Gimp.PlugIn):
@@ -567,28 +1822,69 @@ class SpriteAtlasPlugin(Gimp.PlugIn):
     
     def do_query_procedures(self):
         # Procedure name for GIMP PDB
-        return ['python-fu-create-spriteatlas']
+        return ['python-fu-create-spriteatlas', 'python-fu-create-spriteatlas-batch', 'python-fu-create-spriteatlas-watch']
 
     def do_create_procedure(self, name):
-        procedure = Gimp.ImageProcedure.new(self, name,
-                                       Gimp.PDBProcType.PLUGIN,
-                                       run_create_spriteatlas, None) # run_func, data
+        # batch and watch name each atlas after its input
+        batch = name in ('python-fu-create-spriteatlas-batch', 'python-fu-create-spriteatlas-watch')
+        if batch:
+            # for scripts and gimp -i, no image or menu entry, works on a list of files
+            watch = name == 'python-fu-create-spriteatlas-watch'
+            procedure = Gimp.Procedure.new(self, name,
+                                           Gimp.PDBProcType.PLUGIN,
+                                           run_create_spriteatlas_watch if watch else run_create_spriteatlas_batch, None)
+            procedure.set_attribution("Bas de Reuver", "Bas de Reuver", "2023-2024")
+            procedure.add_enum_argument(name="run-mode",
+                                        nick="Run mode",
+                                        blurb="The run mode",
+                                        enum_type=Gimp.RunMode,
+                                        value=Gimp.RunMode.NONINTERACTIVE,
+                                        flags=GObject.ParamFlags.READWRITE)
+            if watch:
+                procedure.add_string_array_argument(name="inputFiles",
+                                                    nick="Sprite folders",
+                                                    blurb="Folders with PNG sprites to watch, one atlas for each",
+                                                    flags=GObject.ParamFlags.READWRITE)
+                procedure.add_int_argument(name="debounce",
+                                           nick="Debounce (ms)",
+                                           blurb="Wait until the files didn't change for this many milliseconds before rebuilding",
+                                           min=0, max=60000, value=300,
+                                           flags=GObject.ParamFlags.READWRITE)
+                procedure.add_int_argument(name="watchTime",
+                                           nick="Watch time (s)",
+                                           blurb="Stop watching after this many seconds, 0 to watch until GIMP is stopped",
+                                           min=0, max=2147483647, value=0,
+                                           flags=GObject.ParamFlags.READWRITE)
+            else:
+                procedure.add_string_array_argument(name="inputFiles",
+                                                    nick="Input files",
+                                                    blurb="Image files (.xcf, .psd, .ora...), folders with PNG sprites or atlas coordinate files to repack, one atlas for each",
+                                                    flags=GObject.ParamFlags.READWRITE)
+            procedure.add_string_array_return_value(name="results",
+                                                    nick="Results",
+                                                    blurb="Result for each input file, \"<path>: OK\" or \"<path>: failed (<reason>)\"",
+                                                    flags=GObject.ParamFlags.READWRITE)
+        else:
+            procedure = Gimp.ImageProcedure.new(self, name,
+                                           Gimp.PDBProcType.PLUGIN,
+                                           run_create_spriteatlas, None) # run_func, data
 
-        procedure.set_image_types("*") # Applicable image types
-        procedure.set_sensitivity_mask(Gimp.ProcedureSensitivityMask.DRAWABLE | Gimp.ProcedureSensitivityMask.DRAWABLES | Gimp.ProcedureSensitivityMask.NO_DRAWABLES) # When it's active
-        procedure.set_menu_label("Create SpriteAtlas...")
-        procedure.set_attribution("Bas de Reuver", "Bas de Reuver", "2023-2024") # Author, Copyright, Year
-        procedure.add_menu_path("<Image>/Filters/Animation")
+            procedure.set_image_types("*") # Applicable image types
+            procedure.set_sensitivity_mask(Gimp.ProcedureSensitivityMask.DRAWABLE | Gimp.ProcedureSensitivityMask.DRAWABLES | Gimp.ProcedureSensitivityMask.NO_DRAWABLES) # When it's active
+            procedure.set_menu_label("Create SpriteAtlas...")
+            procedure.set_attribution("Bas de Reuver", "Bas de Reuver", "2023-2024") # Author, Copyright, Year
+            procedure.add_menu_path("<Image>/Filters/Animation")
 
         # Define arguments using GObject ParamSpecs
         # (PF_IMAGE is implicit 'image' parameter)
 
         # (PF_STRING, "fileName", "Export file name (without extension):", "sprites")
-        procedure.add_string_argument(name="fileName",
-                                     nick="Export file name",
-                                     blurb="Export file name (without extension)",
-                                     value="sprites",
-                                     flags=GObject.ParamFlags.READWRITE)
+        if not batch:
+            procedure.add_string_argument(name="fileName",
+                                         nick="Export file name",
+                                         blurb="Export file name (without extension)",
+                                         value="sprites",
+                                         flags=GObject.ParamFlags.READWRITE)
 
         # (PF_DIRNAME, "outputFolder", "Export to folder:", "/tmp") -> Gio.File
         procedure.add_file_argument(name="outputFolder",
@@ -621,6 +1917,214 @@ class SpriteAtlasPlugin(Gimp.PlugIn):
                                       value=True,
                                       flags=GObject.ParamFlags.READWRITE)
 
+        if not batch:
+            procedure.add_file_argument(name="spriteFolder",
+                                         nick="Sprite folder",
+                                         blurb="Load the sprites from the PNG files in this folder instead of the image layers",
+                                         action=Gimp.FileChooserAction.SELECT_FOLDER,
+                                         none_ok=True,
+                                         default_file=None,
+                                         flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="cacheSize",
+                                   nick="Sprite cache size (MB)",
+                                   blurb="Maximum size of the decoded sprite cache for the sprite folder, 0 to disable",
+                                   min=0, max=65536, value=DEFAULT_CACHE_SIZE,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        if not batch:
+            procedure.add_file_argument(name="repackAtlas",
+                                         nick="Repack atlas",
+                                         blurb="Use the sprites of an existing atlas, select its coordinate file",
+                                         action=Gimp.FileChooserAction.OPEN,
+                                         none_ok=True,
+                                         default_file=None,
+                                         flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_file_argument(name="previousAtlas",
+                                     nick="Patch from previous atlas",
+                                     blurb="Coordinate file of the previous build, keep its layout and export a patch with the changes",
+                                     action=Gimp.FileChooserAction.OPEN,
+                                     none_ok=True,
+                                     default_file=None,
+                                     flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="workerThreads",
+                                   nick="Worker threads",
+                                   blurb="Threads for reading cached sprites, writing files and PNG encoding next to GIMP, 0 to run all steps in order",
+                                   min=0, max=64, value=0,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="mipLevels",
+                                   nick="Mipmap levels",
+                                   blurb="Number of downsampled atlas levels to export (1/2, 1/4, ...), 0 for none",
+                                   min=0, max=MAX_MIP_LEVELS, value=0,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        mf_choices = Gimp.Choice()
+        mf_choices.add(nick="Box",    id=0, label="Box (linear)", help="Average of 2x2 pixels, fast")
+        mf_choices.add(nick="LoHalo", id=0, label="LoHalo (Lanczos-like)", help="Sharper, slower")
+
+        procedure.add_choice_argument(name="mipFilter",
+                                   nick="Mipmap filter",
+                                   blurb="Filter used to downsample the mipmap levels and variants",
+                                   choice=mf_choices,
+                                   value="Box",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_string_argument(name="variants",
+                                     nick="Variant scales",
+                                     blurb="Also export smaller variants, for example \"0.5, 0.25\" for sprites@0.5x and sprites@0.25x, empty for none",
+                                     value="",
+                                     flags=GObject.ParamFlags.READWRITE)
+
+        if_choices = Gimp.Choice()
+        if_choices.add(nick="PNG",  id=0, label="PNG", help="")
+        if_choices.add(nick="WebP", id=0, label="WebP (lossless)", help="")
+
+        procedure.add_choice_argument(name="imageFormat",
+                                   nick="Image format",
+                                   blurb="File format of the atlas image",
+                                   choice=if_choices,
+                                   value="PNG",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="compressionLevel",
+                                   nick="PNG compression level",
+                                   blurb="PNG compression level, 0 is fastest and 9 is smallest",
+                                   min=0, max=9, value=9,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_boolean_argument(name="indexedPalette",
+                                      nick="Indexed palette",
+                                      blurb="Reduce atlas image to a palette of 256 colors",
+                                      value=False,
+                                      flags=GObject.ParamFlags.READWRITE)
+
+        tc_choices = Gimp.Choice()
+        tc_choices.add(nick="None", id=0, label="None", help="")
+        tc_choices.add(nick="KTX2", id=0, label="KTX2", help="")
+        tc_choices.add(nick="DDS",  id=0, label="DDS", help="")
+
+        procedure.add_choice_argument(name="textureContainer",
+                                   nick="GPU texture file",
+                                   blurb="Also export the atlas as GPU texture file, atlas size will be a multiple of 4",
+                                   choice=tc_choices,
+                                   value="None",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        tx_choices = Gimp.Choice()
+        tx_choices.add(nick="RGBA8", id=0, label="RGBA8 (uncompressed)", help="")
+        tx_choices.add(nick="BC3",   id=0, label="BC3 / DXT5", help="")
+
+        procedure.add_choice_argument(name="textureCompression",
+                                   nick="GPU texture compression",
+                                   blurb="Pixel format of the GPU texture file",
+                                   choice=tx_choices,
+                                   value="RGBA8",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        pf_choices = Gimp.Choice()
+        pf_choices.add(nick="RGBA8888", id=0, label="RGBA8888", help="")
+        pf_choices.add(nick="RGB565",   id=0, label="RGB565 (opaque)", help="")
+        pf_choices.add(nick="RGBA4444", id=0, label="RGBA4444 (dithered)", help="")
+        pf_choices.add(nick="Alpha",    id=0, label="Alpha only (A8)", help="")
+        pf_choices.add(nick="Auto",     id=0, label="Auto (lossless, from sprite channels)", help="")
+
+        procedure.add_choice_argument(name="pixelFormat",
+                                   nick="Pixel format",
+                                   blurb="Atlas pixel format, reduces the atlas image and GPU texture memory",
+                                   choice=pf_choices,
+                                   value="RGBA8888",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_boolean_argument(name="premultiplyAlpha",
+                                      nick="Premultiply alpha",
+                                      blurb="Export color values multiplied by alpha",
+                                      value=False,
+                                      flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="bleedIterations",
+                                   nick="Alpha bleeding",
+                                   blurb="Number of pixels to spread sprite edge colors into transparent pixels, 0 for none",
+                                   min=0, max=64, value=0,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_boolean_argument(name="packingReport",
+                                      nick="Packing report",
+                                      blurb="Export packing statistics and an occupancy heatmap",
+                                      value=False,
+                                      flags=GObject.ParamFlags.READWRITE)
+
+        po_choices = Gimp.Choice()
+        po_choices.add(nick="Height",    id=0, label="Height", help="Tallest sprites first")
+        po_choices.add(nick="Area",      id=0, label="Area", help="Largest sprites first")
+        po_choices.add(nick="Max side",  id=0, label="Longest side", help="Sprites with the longest side first")
+        po_choices.add(nick="Width",     id=0, label="Width", help="Widest sprites first")
+        po_choices.add(nick="Perimeter", id=0, label="Perimeter", help="Sprites with the largest perimeter first")
+        po_choices.add(nick="Best",      id=0, label="Best of all", help="Try all orders and keep the smallest atlas")
+
+        procedure.add_choice_argument(name="packingOrder",
+                                   nick="Packing order",
+                                   blurb="Order in which the sprites are packed",
+                                   choice=po_choices,
+                                   value="Height",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="packingWidth",
+                                   nick="Packing width (%)",
+                                   blurb="Start width of the packing area in percent of the square default",
+                                   min=25, max=400, value=100,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="packingTrials",
+                                   nick="Packing trials",
+                                   blurb="Number of packing orders and widths tried with Best of all",
+                                   min=1, max=25, value=25,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_boolean_argument(name="stableOrder",
+                                      nick="Reproducible layout",
+                                      blurb="Sort sprites by height, width, name and pixels, so the layer order doesn't change the atlas",
+                                      value=False,
+                                      flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_boolean_argument(name="checkReproducible",
+                                      nick="Check reproducible export",
+                                      blurb="Export the texture a second time and warn when the bytes differ",
+                                      value=False,
+                                      flags=GObject.ParamFlags.READWRITE)
+
+        wm_choices = Gimp.Choice()
+        wm_choices.add(nick="None",   id=0, label="None", help="")
+        wm_choices.add(nick="Pixels", id=0, label="Small text in empty space", help="")
+        wm_choices.add(nick="Text",   id=0, label="Build hash in PNG text", help="")
+
+        procedure.add_choice_argument(name="watermark",
+                                   nick="Watermark",
+                                   blurb="Mark the atlas with the plug-in name or a build hash",
+                                   choice=wm_choices,
+                                   value="None",
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="meshVertices",
+                                   nick="Polygon mesh vertices",
+                                   blurb="Maximum vertices of the polygon around each sprite in the JSON output, 0 for rectangles only",
+                                   min=0, max=64, value=0,
+                                   flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_boolean_argument(name="animations",
+                                      nick="Detect animations",
+                                      blurb="Group numbered sprites (walk_0001, walk_0002, ...) into animations",
+                                      value=False,
+                                      flags=GObject.ParamFlags.READWRITE)
+
+        procedure.add_int_argument(name="stripHeight",
+                                   nick="Strip rendering rows",
+                                   blurb="Render and save the atlas PNG in strips of this many rows to limit memory use, 0 to render in GIMP",
+                                   min=0, max=4096, value=0,
+                                   flags=GObject.ParamFlags.READWRITE)
+
         return procedure
 
 # Register the plugin class with GIMP
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Pixel operations for the GIMP SpriteAtlas plug-in
+# plain Python, no GIMP dependencies, pixels are 8-bit RGBA rows top to bottom
+
+import math
+import re
+import sys
+from array import array
+
+# translate table, any non-zero byte becomes 1
+NONZERO_TO_ONE = bytes([0] + [1] * 255)
+# translate table, zero becomes 255 and anything else 0
+ZERO_TO_FF = bytes([255] + [0] * 255)
+# frontier byte in bleed_alpha
+FRONTIER_PIXEL = re.compile(b'\x01')
+
+def transparent_colors(pixels):
+    # the colors of the fully transparent pixels with all other pixels zeroed,
+    # to check that an exported file kept the colors from alpha bleeding
+    pixels = bytes(pixels)
+    mask = bytearray(len(pixels))
+    mask[0::4] = mask[1::4] = mask[2::4] = pixels[3::4].translate(ZERO_TO_FF)
+    return (int.from_bytes(pixels, 'little') & int.from_bytes(mask, 'little')).to_bytes(len(pixels), 'little')
+
+# rounded average of n neighbour values from their total, AVERAGES[n * 2048 + total] for n = 1..8
+AVERAGES = bytes((total + n // 2) // n if 0 < n and total <= 255 * n else 0
+                 for n in range(9) for total in range(2048))
+# translate table for the high byte of a key in AVERAGES, 1 when the key has known neighbours
+KEY_TO_NEAR = bytes([0] * 8 + [1] * 248)
+# pixels per band of rows in bleed_alpha, the band sums are big integers of 2 bytes per pixel
+BLEED_BAND_PIXELS = 1 << 17
+
+def spread_lanes(values):
+    # one byte per pixel to an integer with a 16-bit lane per pixel, so sums of neighbours don't overflow
+    wide = bytearray(len(values) * 2)
+    wide[0::2] = values
+    return int.from_bytes(wide, 'little')
+
+def bleed_alpha(pixels, width, height, iterations):
+    # Alpha bleeding, give fully transparent pixels next to visible pixels the average color
+    # of their visible neighbours, repeated for a number of iterations so colors spread outwards.
+    # Only the pixel colors change, the alpha channel stays the same.
+    # Neighbour counts and color totals of a band of rows are added up at once, with a 16-bit lane
+    # per pixel in one integer shifted by a pixel and by a row, only the averages of the frontier
+    # pixels are looked up one by one.
+    pixels = bytearray(pixels)
+    stride = width * 4
+    band = max(BLEED_BAND_PIXELS // width, 1)
+    known = bytearray(pixels[3::4].translate(NONZERO_TO_ONE))
+    masks = {}
+
+    def neighbour_sums(v, rows):
+        # total of the 3x3 block around each pixel lane, the lanes of the first and last column
+        # don't take values from the row before or after
+        if rows not in masks:
+            column = b'\xff\xff' * (width - 1)
+            masks[rows] = (int.from_bytes(b'\xff\xff' * width * rows, 'little'),
+                           int.from_bytes((b'\0\0' + column) * rows, 'little'),
+                           int.from_bytes((column + b'\0\0') * rows, 'little'))
+        lanes, not_first, not_last = masks[rows]
+        v = (v + (v << width * 16) + (v >> width * 16)) & lanes
+        return v + ((v << 16) & not_first) + ((v >> 16) & not_last)
+
+    for _ in range(iterations):
+        frontier = bytearray(len(known))
+        found = False
+        for y0 in range(0, height, band):
+            # the band with one row of context above and below
+            top = max(y0 - 1, 0)
+            bottom = min(y0 + band + 1, height)
+            first = (y0 - top) * width
+            last = (min(y0 + band, height) - top) * width
+            band_known = known[top * width:bottom * width]
+            known_lanes = spread_lanes(band_known)
+            visible = known_lanes * 0xffff
+            # each lane adds up to the number of known neighbours times 2048 plus their color total,
+            # the lookup key of the rounded average
+            counts = known_lanes << 11
+            keys = []
+            for c in range(3):
+                colors = spread_lanes(pixels[top * stride + c:bottom * stride:4]) & visible
+                lanes = neighbour_sums(counts + colors, bottom - top).to_bytes(len(band_known) * 2, 'little')
+                if c == 0:
+                    # transparent pixels that have at least one known neighbour (8-connected)
+                    near = lanes[2 * first + 1:2 * last:2].translate(KEY_TO_NEAR)
+                    band_frontier = (int.from_bytes(near, 'little') &
+                                     ~int.from_bytes(band_known[first:last], 'little')).to_bytes(last - first, 'little')
+                    positions = [match.start() + first for match in FRONTIER_PIXEL.finditer(band_frontier)]
+                    if not positions:
+                        break
+                keys.append(array('H', lanes))
+                if sys.byteorder != 'little':
+                    keys[c].byteswap()
+            if not positions:
+                continue
+            frontier[y0 * width:y0 * width + last - first] = band_frontier
+            found = True
+
+            # only the frontier pixels get the averages
+            targets = [top * stride + p * 4 for p in positions]
+            for c in range(3):
+                for i, value in zip(targets, map(AVERAGES.__getitem__, map(keys[c].__getitem__, positions))):
+                    pixels[i + c] = value
+        if not found:
+            break
+        # the frontier pixels are known in the next iteration
+        known = bytearray((int.from_bytes(known, 'little') | int.from_bytes(frontier, 'little')).to_bytes(len(known), 'little'))
+
+    return pixels
+
+# small watermark text, one byte per column and one bit per row (7 rows high), from the GIMP 2 version
+WATERMARK_COLUMNS = [7, 5, 6, 0, 7, 0, 55, 65, 50, 1, 119, 80, 119, 3, 64, 0, 84, 119, 97, 0, 7, 3, 112, 119, 97, 0, 103, 112, 1, 119, 49, 96, 7, 7, 21, 112, 70, 3, 118, 81, 119, 1, 16, 119, 68, 0, 54, 35, 118, 0, 4, 7, 1]
+WATERMARK_WIDTH = len(WATERMARK_COLUMNS)
+WATERMARK_HEIGHT = 7
+
+def draw_watermark(pixels, horizontal, color=(255, 255, 255, 255)):
+    # Draw the watermark into a block of RGBA pixels, the block is WATERMARK_WIDTH x WATERMARK_HEIGHT
+    # when horizontal, or WATERMARK_HEIGHT x WATERMARK_WIDTH when vertical (rotated clockwise).
+    pixels = bytearray(pixels)
+    color = bytes(color)
+    block_w = WATERMARK_WIDTH if horizontal else WATERMARK_HEIGHT
+    for col, bits in enumerate(WATERMARK_COLUMNS):
+        for b in range(WATERMARK_HEIGHT):
+            if bits & (1 << b):
+                x = col if horizontal else WATERMARK_HEIGHT - 1 - b
+                y = b if horizontal else col
+                i = (y * block_w + x) * 4
+                pixels[i:i + 4] = color
+    return pixels
+
+def alpha_row_extents(pixels, width, height):
+    # first and last visible pixel of each row, None for fully transparent rows
+    stride = width * 4
+    extents = []
+    for y in range(height):
+        alpha = pixels[y * stride + 3:(y + 1) * stride:4]
+        left = width - len(alpha.lstrip(b'\0'))
+        if left == width:
+            extents.append(None)
+        else:
+            extents.append((left, len(alpha.rstrip(b'\0')) - 1))
+    return extents
+
+def alpha_bounds(pixels, width, height):
+    # x, y, width and height of the smallest rectangle around all visible pixels,
+    # (0, 0, 0, 0) for a fully transparent sprite
+    extents = alpha_row_extents(pixels, width, height)
+    rows = [y for y, extent in enumerate(extents) if extent]
+    if not rows:
+        return (0, 0, 0, 0)
+    left = min(extents[y][0] for y in rows)
+    right = max(extents[y][1] for y in rows)
+    return (left, rows[0], right - left + 1, rows[-1] - rows[0] + 1)
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def convex_hull(points):
+    # Andrew's monotone chain, counter-clockwise in y-down coordinates is clockwise on screen
+    points = sorted(set(points))
+    if len(points) <= 2:
+        return points
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+def line_intersection(p1, p2, p3, p4):
+    # intersection of the lines through p1-p2 and p3-p4, None when parallel
+    d = (p1[0] - p2[0]) * (p3[1] - p4[1]) - (p1[1] - p2[1]) * (p3[0] - p4[0])
+    if d == 0:
+        return None
+    a = p1[0] * p2[1] - p1[1] * p2[0]
+    b = p3[0] * p4[1] - p3[1] * p4[0]
+    return ((a * (p3[0] - p4[0]) - (p1[0] - p2[0]) * b) / d,
+            (a * (p3[1] - p4[1]) - (p1[1] - p2[1]) * b) / d)
+
+def reduce_hull(hull, max_vertices, width, height):
+    # Remove edges until the hull has at most max_vertices, each time extending the two
+    # neighbouring edges to meet, picking the edge that adds the least area. The polygon only
+    # grows so it still contains all visible pixels, and it never grows outside the sprite.
+    hull = list(hull)
+    while len(hull) > max_vertices:
+        n = len(hull)
+        best = None
+        for i in range(n):
+            a, b, c, d = hull[i - 1], hull[i], hull[(i + 1) % n], hull[(i + 2) % n]
+            p = line_intersection(a, b, c, d)
+            if p is None or not (0 <= p[0] <= width and 0 <= p[1] <= height):
+                continue
+            # new point must be outside edge b-c, else the edges diverge
+            added = cross(b, p, c)
+            if added <= 0:
+                continue
+            if best is None or added < best[0]:
+                best = (added, i, p)
+        if best is None:
+            # no edge can be removed within the sprite bounds, use the full rectangle
+            return [(0, 0), (width, 0), (width, height), (0, height)]
+        _, i, p = best
+        hull[i] = p
+        del hull[(i + 1) % n]
+    return hull
+
+def alpha_hull(pixels, width, height, max_vertices):
+    # convex polygon around the visible pixels of a sprite with at most max_vertices,
+    # in pixel corner coordinates, None when the sprite is fully transparent
+    points = []
+    for y, extent in enumerate(alpha_row_extents(pixels, width, height)):
+        if extent is not None:
+            left, right = extent
+            points += [(left, y), (right + 1, y), (left, y + 1), (right + 1, y + 1)]
+    if not points:
+        return None
+    exact = convex_hull(points)
+    hull = reduce_hull(exact, max(max_vertices, 4), width, height)
+    # round outwards to whole pixels, away from the polygon center
+    cx = sum(p[0] for p in hull) / len(hull)
+    cy = sum(p[1] for p in hull) / len(hull)
+    rounded = []
+    for x, y in hull:
+        x = math.floor(x) if x < cx else math.ceil(x)
+        y = math.floor(y) if y < cy else math.ceil(y)
+        rounded.append((min(max(x, 0), width), min(max(y, 0), height)))
+    # rounding can leave a reflex vertex, so take the hull again before testing containment
+    rounded = convex_hull(rounded)
+    # rounding must not cut off any visible pixel
+    n = len(rounded)
+    if n < 3:
+        return [(0, 0), (width, 0), (width, height), (0, height)]
+    for p in exact:
+        if any(cross(rounded[i], rounded[(i + 1) % n], p) < 0 for i in range(n)):
+            return [(0, 0), (width, 0), (width, height), (0, height)]
+    return rounded
+
+def fan_triangles(count):
+    # triangle indices for a convex polygon
+    return [(0, i, i + 1) for i in range(1, count - 1)]
+
+def analyze_channels(pixels):
+    # which channels a block of RGBA pixels really uses, checked on whole channels at once,
+    # returns (opaque, gray, white): alpha is 255 everywhere, red, green and blue are equal,
+    # all visible pixels are white so only alpha carries information,
+    # the color of fully transparent pixels doesn't count
+    pixels = bytes(pixels)
+    alpha = pixels[3::4]
+    visible = int.from_bytes(alpha.translate(NONZERO_TO_ONE), 'little') * 255
+    r, g, b = (int.from_bytes(pixels[c::4], 'little') & visible for c in range(3))
+    opaque = alpha.count(255) == len(alpha)
+    gray = r == g == b
+    return opaque, gray, gray and r == visible
+
+# 4x4 Bayer matrix for ordered dithering
+BAYER_4X4 = [[0, 8, 2, 10], [12, 4, 14, 6], [3, 11, 1, 9], [15, 7, 13, 5]]
+
+def level_table(bits, threshold=0.5):
+    # translate table that reduces an 8-bit channel to the given number of bits and expands it back,
+    # the threshold 0..1 decides where values round up (0.5 rounds to the nearest level)
+    levels = (1 << bits) - 1
+    return bytes((min(int(v * levels / 255 + threshold), levels) * 255 + levels // 2) // levels for v in range(256))
+
+def quantize_pixels(pixels, width, height, pixel_format, y0=0):
+    # RGBA pixels reduced to what the pixel format can store, still 8-bit RGBA so the atlas image shows the result:
+    # "RGB565" is opaque with 5-6-5 bits, "RGBA4444" has 4 bits per channel with ordered dithering,
+    # "Alpha" keeps only alpha on white, y0 is the atlas row of the first row for the dither pattern
+    if pixel_format == "RGBA8888":
+        return pixels
+    pixels = bytearray(pixels)
+    count = width * height
+    if pixel_format == "Alpha":
+        pixels[0::4] = pixels[1::4] = pixels[2::4] = b'\xff' * count
+    elif pixel_format == "RGB565":
+        for c, table in enumerate((level_table(5), level_table(6), level_table(5))):
+            pixels[c::4] = pixels[c::4].translate(table)
+        pixels[3::4] = b'\xff' * count
+    else:
+        # a table for each position in the dither matrix, every fourth pixel of a row shares a table
+        tables = [[level_table(4, (t + 0.5) / 16) for t in row] for row in BAYER_4X4]
+        stride = width * 4
+        for y in range(height):
+            row_tables = tables[(y0 + y) % 4]
+            end = (y + 1) * stride
+            for x in range(min(width, 4)):
+                for c in range(4):
+                    i = y * stride + x * 4 + c
+                    pixels[i:end:16] = pixels[i:end:16].translate(row_tables[x])
+    return pixels
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# PNG file helpers for the GIMP SpriteAtlas plug-in
+# plain Python, no GIMP dependencies
+
+import struct
+import sys
+import zlib
+from array import array
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def png_chunk(chunk_type, data):
+    # length, type, data and CRC of type and data
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+def text_chunk(keyword, text):
+    # uncompressed Latin-1 text, keyword is 1-79 characters
+    return png_chunk(b'tEXt', keyword.encode('latin-1') + b'\0' + text.encode('latin-1'))
+
+def add_text_chunks(filename, entries):
+    # insert tEXt chunks directly after the IHDR chunk of an existing PNG file
+    with open(filename, 'rb') as inputfile:
+        data = inputfile.read()
+    if not data.startswith(PNG_SIGNATURE) or data[12:16] != b'IHDR':
+        raise ValueError(f"{filename} is not a PNG file")
+    ihdr_end = 8 + 12 + struct.unpack('>I', data[8:12])[0]
+    chunks = b''.join(text_chunk(keyword, text) for keyword, text in entries)
+    with open(filename, 'wb') as outputfile:
+        outputfile.write(data[:ihdr_end])
+        outputfile.write(chunks)
+        outputfile.write(data[ihdr_end:])
+
+class PngStreamWriter(object):
+    # Write an 8-bit RGBA PNG a few rows at a time, so the whole image never has to be in memory.
+    # Compressed data is written as an IDAT chunk whenever enough has been collected.
+    def __init__(self, outputfile, width, height, compression=9, chunk_size=1 << 20):
+        self.outputfile = outputfile
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.chunk_size = chunk_size
+        self.pending = b''
+        self.compressor = zlib.compressobj(compression)
+        outputfile.write(PNG_SIGNATURE)
+        # 8 bits per channel, color type 6 (RGBA), no interlacing
+        outputfile.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+
+    def write_rows(self, pixels):
+        # add complete rows of RGBA pixels, each row gets filter type 0 (none)
+        stride = self.width * 4
+        rows = len(pixels) // stride
+        if rows * stride != len(pixels) or self.rows_written + rows > self.height:
+            raise ValueError("pixel data does not match the PNG size")
+        filtered = b''.join(b'\0' + pixels[y * stride:(y + 1) * stride] for y in range(rows))
+        self.pending += self.compressor.compress(filtered)
+        self.rows_written += rows
+        if len(self.pending) >= self.chunk_size:
+            self.outputfile.write(png_chunk(b'IDAT', self.pending))
+            self.pending = b''
+
+    def close(self, text_entries=None):
+        # write remaining data, optional text and the end chunk
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG has {self.height} rows, only {self.rows_written} written")
+        self.outputfile.write(png_chunk(b'IDAT', self.pending + self.compressor.flush()))
+        self.pending = b''
+        for keyword, text in text_entries or []:
+            self.outputfile.write(text_chunk(keyword, text))
+        self.outputfile.write(png_chunk(b'IEND', b''))
+
+# masks of the low 7 bits, the high bit and all bytes of a row, by row length
+BYTE_MASKS = {}
+
+def byte_masks(length):
+    masks = BYTE_MASKS.get(length)
+    if masks is None:
+        masks = BYTE_MASKS[length] = (int.from_bytes(b'\x7f' * length, 'little'), int.from_bytes(b'\x80' * length, 'little'),
+                                      (1 << (8 * length)) - 1)
+    return masks
+
+def add_byte_lanes(x, y, low, high):
+    # add two rows as integers per byte modulo 256, without carries between bytes
+    return ((x & low) + (y & low)) ^ ((x ^ y) & high)
+
+def unfilter_sub(row, bpp):
+    # undo filter type 1, each byte plus the byte bpp to the left, as a prefix sum with doubling shifts
+    length = len(row)
+    low, high, full = byte_masks(length)
+    x = int.from_bytes(row, 'little')
+    shift = bpp
+    while shift < length:
+        x = add_byte_lanes(x, (x << (8 * shift)) & full, low, high)
+        shift *= 2
+    return x.to_bytes(length, 'little')
+
+def unfilter_up(row, prior):
+    # undo filter type 2, each byte plus the byte above
+    low, high, _ = byte_masks(len(row))
+    return add_byte_lanes(int.from_bytes(row, 'little'), int.from_bytes(prior, 'little'), low, high).to_bytes(len(row), 'little')
+
+def pixel_lanes(row, bpp):
+    # the bytes of each pixel in the 16-bit lanes of one 64-bit value per pixel
+    buf = bytearray(len(row) // bpp * 8)
+    for c in range(bpp):
+        buf[2 * c::8] = row[c::bpp]
+    lanes = array('Q', bytes(buf))
+    if sys.byteorder == 'big':
+        lanes.byteswap()
+    return lanes
+
+def lane_bytes(lanes, bpp):
+    # bytes of the pixels from pixel_lanes
+    if sys.byteorder == 'big':
+        lanes.byteswap()
+    buf = lanes.tobytes()
+    row = bytearray(len(lanes) * bpp)
+    for c in range(bpp):
+        row[c::bpp] = buf[2 * c::8]
+    return bytes(row)
+
+LOW_BYTE_LANES = 0x00ff00ff00ff00ff
+
+def unfilter_average(row, prior, bpp):
+    # undo filter type 3, each byte plus the average of the bytes to the left and above,
+    # one pixel at a time with all channels in one integer, the halving shifts the low bit
+    # of each lane into the unused high byte of the lane below
+    left = 0
+    out = []
+    append = out.append
+    for x, above in zip(pixel_lanes(row, bpp), pixel_lanes(prior, bpp)):
+        left = (x + ((left + above) >> 1)) & LOW_BYTE_LANES
+        append(left)
+    return lane_bytes(array('Q', out), bpp)
+
+# Paeth predictor as offset from the byte above left, by (left - above left + 255) * 512 + (above - above left + 255),
+# and the unfiltered byte * 512 by filtered byte + byte above left + predictor offset + 255, built on first use
+PAETH_TABLES = []
+
+def paeth_tables():
+    if not PAETH_TABLES:
+        # for d = left - above left >= 0 the predictor is left for e = above - above left in [-(d // 2), d],
+        # above left for e in (-2d, -(d // 2)) and above otherwise, negative d is the mirror image
+        rows = {}
+        for d in range(256):
+            row = list(range(-255, 256)) + [0]
+            low = -(d // 2)
+            row[low + 255:d + 256] = [d] * (d - low + 1)
+            start = max(1 - 2 * d, -255)
+            row[start + 255:low + 255] = [0] * (low - start)
+            rows[d] = row
+            rows[-d] = [-v for v in reversed(row[:511])] + [0]
+        PAETH_TABLES.append([v for d in range(-255, 256) for v in rows[d]])
+        PAETH_TABLES.append([(v & 255) << 9 for v in range(-255, 766)])
+    return PAETH_TABLES
+
+def word_lanes(data):
+    # bytes in the 32-bit lanes of an integer
+    buf = bytearray(len(data) * 4)
+    buf[0::4] = data
+    return int.from_bytes(buf, 'little')
+
+def unfilter_paeth(row, prior, bpp):
+    # undo filter type 4, with a table of the predictor by the differences of the left and above
+    # bytes to the above left byte. All terms without the left byte are computed for the whole row
+    # in 32-bit lanes, then each channel is a chain of two lookups per byte.
+    length = len(row)
+    ones = int.from_bytes(b'\x01\0\0\0' * length, 'little')
+    above_left = word_lanes(bytes(bpp) + prior[:length - bpp])
+    keys = array('I', (ones * (255 * 512 + 255) - (above_left << 9) + word_lanes(prior) - above_left).to_bytes(length * 4, 'little'))
+    filtered = array('I', (word_lanes(row) + above_left + ones * 255).to_bytes(length * 4, 'little'))
+    if sys.byteorder == 'big':
+        keys.byteswap()
+        filtered.byteswap()
+    offsets, unfiltered = paeth_tables()
+    out = bytearray(length)
+    for c in range(bpp):
+        left = 0
+        values = []
+        append = values.append
+        for x, key in zip(filtered[c::bpp], keys[c::bpp]):
+            left = unfiltered[x + offsets[left + key]]
+            append(left >> 9)
+        out[c::bpp] = bytes(values)
+    return bytes(out)
+
+def unfilter_row(filter_type, row, prior, bpp):
+    # undo the PNG filter of one row, prior is the previous unfiltered row (all zeros for the first row)
+    if filter_type == 0:
+        return row
+    if filter_type == 1:
+        return unfilter_sub(row, bpp)
+    if filter_type == 2:
+        return unfilter_up(row, prior)
+    if filter_type == 3:
+        return unfilter_average(row, prior, bpp)
+    if filter_type == 4:
+        return unfilter_paeth(row, prior, bpp)
+    raise ValueError(f"unknown PNG filter type {filter_type}")
+
+def read_png(filename):
+    # Decode an 8-bit non-interlaced PNG (gray, RGB, palette, gray+alpha or RGBA) to RGBA pixels,
+    # returns width, height and pixels. Plain Python, Average and Paeth filtered rows are the slowest.
+    with open(filename, 'rb') as inputfile:
+        data = inputfile.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError(f"{filename} is not a PNG file")
+    pos = len(PNG_SIGNATURE)
+    idat = []
+    palette = b''
+    transparency = b''
+    while pos < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b'IHDR':
+            width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', chunk)
+        elif chunk_type == b'PLTE':
+            palette = chunk
+        elif chunk_type == b'tRNS':
+            transparency = chunk
+        elif chunk_type == b'IDAT':
+            idat.append(chunk)
+        elif chunk_type == b'IEND':
+            break
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type)
+    if depth != 8 or interlace or channels is None:
+        raise ValueError(f"{filename}: only 8-bit non-interlaced PNG files are supported")
+
+    raw = zlib.decompress(b''.join(idat))
+    stride = width * channels
+    prior = bytes(stride)
+    rows = []
+    for y in range(height):
+        start = y * (stride + 1)
+        prior = unfilter_row(raw[start], raw[start + 1:start + 1 + stride], prior, channels)
+        rows.append(prior)
+    pixels = b''.join(rows)
+
+    # convert to RGBA
+    if color_type == 6:
+        return width, height, pixels
+    rgba = bytearray(width * height * 4)
+    if color_type == 2:
+        for c in range(3):
+            rgba[c::4] = pixels[c::3]
+        rgba[3::4] = b'\xff' * (width * height)
+    elif color_type == 0:
+        for c in range(3):
+            rgba[c::4] = pixels
+        rgba[3::4] = b'\xff' * (width * height)
+    elif color_type == 4:
+        for c in range(3):
+            rgba[c::4] = pixels[0::2]
+        rgba[3::4] = pixels[1::2]
+    else:
+        # palette with optional alpha per entry
+        table = [palette[i * 3:i * 3 + 3] + (transparency[i:i + 1] or b'\xff') for i in range(len(palette) // 3)]
+        table += [b'\0\0\0\xff'] * (256 - len(table))
+        rgba = bytearray(b''.join(table[i] for i in pixels))
+    return width, height, bytes(rgba)
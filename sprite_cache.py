@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Decoded sprite cache for the GIMP SpriteAtlas plug-in
+# stores the RGBA pixels of sprite image files, so unchanged files don't have to be decoded again
+# plain Python, no GIMP dependencies
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+import pixel_ops
+
+CACHE_MAGIC = b'GSAC'
+CACHE_VERSION = 3
+CACHE_EXT = '.sprite'
+# magic, version, source modification time and size, width, height, trim x, y, width, height,
+# SHA-1 of the source file
+CACHE_HEADER = struct.Struct('<4sIqQIIIIII20s')
+# offset of the modification time, updated in place when a touched file turns out to be unchanged
+MTIME_OFFSET = 8
+
+def file_digest(path):
+    # SHA-1 of a file, reading it is much faster than decoding the image
+    digest = hashlib.sha1()
+    with open(path, 'rb') as inputfile:
+        for block in iter(lambda: inputfile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
+
+class CachedSprite(object):
+    # one cached sprite, pixels are a read-only view on the memory-mapped cache file,
+    # they are only copied once, into the bytes that are handed to GEGL
+    def __init__(self, filename):
+        with open(filename, 'rb') as inputfile:
+            self.mmap = mmap.mmap(inputfile.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < CACHE_HEADER.size:
+            self.mmap.close()
+            raise ValueError(f"{filename} is not a valid sprite cache file")
+        magic, version, mtime, size, w, h, tx, ty, tw, th, digest = CACHE_HEADER.unpack_from(self.mmap, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or len(self.mmap) != CACHE_HEADER.size + w * h * 4:
+            self.mmap.close()
+            raise ValueError(f"{filename} is not a valid sprite cache file")
+        self.filename = filename
+        self.source_mtime = mtime
+        self.source_size = size
+        self.width = w
+        self.height = h
+        # bounding box of the visible pixels, (0, 0, 0, 0) for a fully transparent sprite
+        self.trim = (tx, ty, tw, th)
+        self.digest = digest
+        self.pixels = memoryview(self.mmap)[CACHE_HEADER.size:]
+
+    def close(self):
+        self.pixels.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class SpriteCache(object):
+    # Cache folder with one file per sprite, named after the source path. An entry is used when the
+    # modification time and size of the source still match, or when only the time changed and the
+    # file content hash is still the same. When the total size exceeds max_bytes the least recently
+    # used files are removed.
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+        # total size is kept up to date by put, so the folder is only scanned when it is too large
+        self.total_bytes = sum(size for _, size, _ in self.entries())
+
+    def cache_filename(self, path):
+        key = os.path.abspath(path)
+        return os.path.join(self.folder, hashlib.sha1(key.encode('utf-8')).hexdigest() + CACHE_EXT)
+
+    def entries(self):
+        # (last used, size, name) of all cache files
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith(CACHE_EXT):
+                stat = os.stat(os.path.join(self.folder, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        return entries
+
+    def get(self, path):
+        # cached sprite for an image file, or None when the file is new or changed
+        filename = self.cache_filename(path)
+        if not os.path.exists(filename):
+            return None
+        try:
+            sprite = CachedSprite(filename)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(path)
+        if stat.st_size != sprite.source_size:
+            sprite.close()
+            return None
+        if stat.st_mtime_ns != sprite.source_mtime:
+            # touched or copied again, only decode it again when the content changed
+            if file_digest(path) != sprite.digest:
+                sprite.close()
+                return None
+            with open(filename, 'r+b') as cachefile:
+                cachefile.seek(MTIME_OFFSET)
+                cachefile.write(struct.pack('<q', stat.st_mtime_ns))
+            sprite.source_mtime = stat.st_mtime_ns
+        # mark as recently used
+        os.utime(filename)
+        return sprite
+
+    def put(self, path, width, height, pixels):
+        # store decoded RGBA pixels of an image file, with their trim bounds and the file hash
+        filename = self.cache_filename(path)
+        stat = os.stat(path)
+        trim = pixel_ops.alpha_bounds(pixels, width, height)
+        header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_mtime_ns, stat.st_size,
+                                   width, height, *trim, file_digest(path))
+        # unique temporary name, so two builds caching the same sprite don't write into one file
+        handle, tmpname = tempfile.mkstemp(suffix='.tmp', dir=self.folder)
+        try:
+            with os.fdopen(handle, 'wb') as outputfile:
+                outputfile.write(header)
+                outputfile.write(pixels)
+            old_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+            os.replace(tmpname, filename)
+        except Exception:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
+        self.total_bytes += len(header) + len(pixels) - old_size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # remove least recently used files until the cache fits in 90% of max_bytes,
+        # the margin keeps the next puts from scanning the folder again right away
+        entries = self.entries()
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes * 9 // 10:
+                break
+            os.remove(os.path.join(self.folder, name))
+            total -= size
+        self.total_bytes = total
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Sprite folder watcher for the GIMP SpriteAtlas plug-in
+# reports changed PNG files in sprite folders, a burst of changes is reported once
+# plain Python, no GIMP dependencies, polls the folders so no extra packages are needed
+#
+# print the changed files of folders from the command line:
+#   python sprite_watch.py spritefolder [more folders]
+
+import os
+import sys
+import time
+
+def folder_snapshot(folder):
+    # modification time and size of each PNG file in a folder, empty when the folder is gone
+    snapshot = {}
+    if not os.path.isdir(folder):
+        return snapshot
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith('.png') and entry.is_file():
+                stat = entry.stat()
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def changed_files(old, new):
+    # files that were added, changed or removed between two snapshots, sorted
+    return sorted(path for path in old.keys() | new.keys() if old.get(path) != new.get(path))
+
+class FolderWatcher(object):
+    # Watches sprite folders for changed PNG files. Editors often write several files, or one file
+    # in steps, so changes are collected until the folders stayed the same for the debounce time.
+    def __init__(self, folders, debounce=0.3, interval=0.05):
+        self.folders = list(folders)
+        self.debounce = debounce
+        self.interval = interval
+        self.snapshots = {folder: folder_snapshot(folder) for folder in self.folders}
+
+    def poll(self):
+        # changed files per folder since the last poll, {folder: [paths]}
+        changes = {}
+        for folder in self.folders:
+            snapshot = folder_snapshot(folder)
+            changed = changed_files(self.snapshots[folder], snapshot)
+            if changed:
+                self.snapshots[folder] = snapshot
+                changes[folder] = changed
+        return changes
+
+    def wait(self, timeout=None):
+        # block until files changed and then stayed the same for the debounce time,
+        # returns {folder: [paths]}, empty when the timeout in seconds passed without changes
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changes = {}
+        last_change = 0.0
+        while True:
+            now = time.monotonic()
+            for folder, changed in self.poll().items():
+                changes.setdefault(folder, set()).update(changed)
+                last_change = now
+            if changes and now - last_change >= self.debounce:
+                return {folder: sorted(paths) for folder, paths in changes.items()}
+            if not changes and deadline is not None and now >= deadline:
+                return {}
+            time.sleep(self.interval)
+
+def main(args):
+    if not args:
+        print("usage: python sprite_watch.py spritefolder [more folders]")
+        return 2
+    watcher = FolderWatcher(args)
+    try:
+        while True:
+            for folder, paths in watcher.wait().items():
+                print(f"{folder}: {len(paths)} changed files")
+                for path in paths:
+                    print(f"  {path}")
+    except KeyboardInterrupt:
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
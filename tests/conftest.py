@@ -0,0 +1,5 @@
+# the modules under test are plain Python files in the repository root, next to the plug-in
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
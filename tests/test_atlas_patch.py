@@ -0,0 +1,73 @@
+import random
+
+import atlas_patch
+import png_writer
+
+def random_pixels(width, height, seed):
+    rng = random.Random(seed)
+    return bytes(rng.randrange(256) for _ in range(width * height * 4))
+
+def write_png(filename, width, height, pixels):
+    with open(filename, 'wb') as outputfile:
+        writer = png_writer.PngStreamWriter(outputfile, width, height)
+        writer.write_rows(pixels)
+        writer.close()
+
+def test_patch_round_trip_with_resize(tmp_path):
+    old_pixels = random_pixels(40, 30, 1)
+    new_pixels = bytearray(atlas_patch.resize_canvas(old_pixels, 40, 30, 48, 40))
+    # change one sprite and fill the new area
+    for y in range(5, 9):
+        new_pixels[(y * 48 + 3) * 4:(y * 48 + 10) * 4] = bytes(28)
+    new_pixels[48 * 4 * 30:] = random_pixels(48, 10, 2)
+    filename = tmp_path / "resize.patch"
+    with open(filename, 'wb') as outputfile:
+        count = atlas_patch.write_patch(outputfile, old_pixels, 40, 30, bytes(new_pixels), 48, 40,
+                                        {"a": (0, 0, 4, 4)}, {"a": (0, 0, 4, 4), "new": (0, 30, 8, 8)})
+    assert count > 0
+    patch = atlas_patch.AtlasPatch(filename)
+    assert (patch.new_w, patch.new_h) == (48, 40)
+    assert patch.apply(old_pixels) == bytes(new_pixels)
+    assert patch.coordinates == {"changed": {"new": [0, 30, 8, 8]}, "removed": []}
+
+def test_patch_file_applies_and_checks_hashes(tmp_path):
+    old_pixels = random_pixels(32, 32, 3)
+    new_pixels = bytearray(old_pixels)
+    new_pixels[100:140] = bytes(40)
+    filename = tmp_path / "sprites.patch"
+    with open(filename, 'wb') as outputfile:
+        atlas_patch.write_patch(outputfile, old_pixels, 32, 32, bytes(new_pixels), 32, 32,
+                                {"a": (0, 0, 4, 4), "gone": (4, 4, 4, 4)}, {"a": (1, 0, 4, 4)})
+    patch = atlas_patch.AtlasPatch(filename)
+    assert patch.apply(old_pixels) == bytes(new_pixels)
+    assert patch.coordinates == {"changed": {"a": [1, 0, 4, 4]}, "removed": ["gone"]}
+    try:
+        patch.apply(new_pixels)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("wrong previous atlas not detected")
+
+def test_patch_command_line_with_png_files(tmp_path):
+    # transparent pixels with colors must survive, the patch compares decoded files
+    old_pixels = bytes([9, 8, 7, 0]) * 16 * 16
+    new_pixels = bytearray(old_pixels)
+    new_pixels[:8] = bytes([1, 2, 3, 255, 4, 5, 6, 0])
+    write_png(tmp_path / "old.png", 16, 16, old_pixels)
+    write_png(tmp_path / "new.png", 16, 16, bytes(new_pixels))
+    with open(tmp_path / "sprites.patch", 'wb') as outputfile:
+        count = atlas_patch.write_patch(outputfile, old_pixels, 16, 16, bytes(new_pixels), 16, 16, {}, {})
+    assert count == 1
+    assert atlas_patch.main([str(tmp_path / "old.png"), str(tmp_path / "sprites.patch"), str(tmp_path / "new.png")]) == 0
+
+def test_patch_command_line_rejects_webp(tmp_path, capsys):
+    (tmp_path / "old.webp").write_bytes(b'RIFF\0\0\0\0WEBPVP8L')
+    assert atlas_patch.main([str(tmp_path / "old.webp"), str(tmp_path / "sprites.patch")]) == 2
+    assert "not a PNG file" in capsys.readouterr().out
+
+def test_diff_atlas_merges_tiles_in_a_row():
+    old_pixels = bytes(64 * 16 * 4)
+    new_pixels = bytearray(old_pixels)
+    for x in (1, 20, 40):
+        new_pixels[x * 4 + 3] = 255
+    assert atlas_patch.diff_atlas(old_pixels, 64, 16, bytes(new_pixels), 64, 16) == [(0, 0, 48, 16)]
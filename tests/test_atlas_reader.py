@@ -0,0 +1,102 @@
+import json
+import random
+
+import atlas_reader
+
+JSON_ARRAY = {
+    "frames": [
+        {"filename": "hero", "frame": {"x": 0, "y": 0, "w": 10, "h": 20}, "rotated": False,
+         "spriteSourceSize": {"x": 2, "y": 1, "w": 10, "h": 20}, "sourceSize": {"w": 14, "h": 22},
+         "pivot": {"x": 0.5, "y": 1}},
+        {"filename": "door", "frame": {"x": 12, "y": 0, "w": 8, "h": 4}, "rotated": True,
+         "borders": {"left": 1, "right": 2, "top": 3, "bottom": 4}},
+    ],
+    "meta": {"image": "sprites.png", "size": {"w": 32, "h": 32}},
+}
+
+LIBGDX = """
+sprites.png
+size: 32,32
+format: RGBA8888
+filter: Linear,Linear
+repeat: none
+walk
+  rotate: false
+  xy: 0, 0
+  size: 10, 20
+  orig: 10, 20
+  offset: 0, 0
+  index: 1
+walk
+  rotate: true
+  xy: 12, 0
+  size: 8, 4
+  orig: 8, 4
+  offset: 0, 0
+  index: 2
+"""
+
+def test_read_json_array_and_hash():
+    atlas = atlas_reader.read_json(json.dumps(JSON_ARRAY))
+    hashed = dict(JSON_ARRAY, frames={f["filename"]: f for f in JSON_ARRAY["frames"]})
+    for current in (atlas, atlas_reader.read_json(json.dumps(hashed))):
+        assert (current.image, current.width, current.height, len(current)) == ("sprites.png", 32, 32, 2)
+        hero = current.find("hero")
+        assert (hero.source_x, hero.source_y, hero.source_w, hero.source_h, hero.pivot) == (2, 1, 14, 22, (0.5, 1))
+        door = current.find("door")
+        assert door.rotated == 90 and door.footprint() == (12, 0, 4, 8) and door.split == (1, 2, 3, 4)
+
+def test_read_libgdx_animation_frames():
+    atlas = atlas_reader.read_libgdx(LIBGDX)
+    assert (atlas.image, atlas.width, atlas.height) == ("sprites.png", 32, 32)
+    assert [frame.key() for frame in atlas.frames] == [("walk", 1), ("walk", 2)]
+    assert atlas.find("walk", 2).rotated == 270
+    assert atlas_reader.validate_atlas(atlas) == []
+
+def test_read_css_and_xml():
+    css = ".hero { background: url('sprites.png') -4px -6px; width: 10px; height: 20px; }"
+    atlas = atlas_reader.read_css(css)
+    assert atlas.image == "sprites.png"
+    assert atlas.find("hero").footprint() == (4, 6, 10, 20)
+    xml = ('<TextureAtlas imagePath="sprites.png"><SubTexture name="hero" x="1" y="2" width="10" height="20" '
+           'frameX="-3" frameY="-4" frameWidth="16" frameHeight="28" rotated="true"/></TextureAtlas>')
+    hero = atlas_reader.read_xml(xml).find("hero")
+    assert (hero.rotated, hero.source_x, hero.source_y, hero.source_w, hero.source_h) == (90, 3, 4, 16, 28)
+
+def test_validate_atlas_errors():
+    data = json.loads(json.dumps(JSON_ARRAY))
+    data["frames"].append({"filename": "hero", "frame": {"x": 5, "y": 5, "w": 0, "h": 3}})
+    data["frames"].append({"filename": "big", "frame": {"x": 30, "y": 2, "w": 10, "h": 3}})
+    data["frames"].append({"filename": "over", "frame": {"x": 2, "y": 2, "w": 4, "h": 4}})
+    atlas = atlas_reader.read_json(json.dumps(data))
+    errors = atlas_reader.validate_atlas(atlas, overlaps=False)
+    assert errors == ["duplicate frame name hero", "frame hero is empty (0x3)",
+                      "frame big (30,2 10x3) is outside the atlas size 32x32"]
+    assert atlas_reader.validate_atlas(atlas)[3:] == ["frames hero and over overlap"]
+
+def test_find_overlaps_matches_pairwise_check():
+    random.seed(3)
+    for count in (2, 10, 60):
+        rects = []
+        for _ in range(count):
+            x, y = random.randrange(40), random.randrange(40)
+            rects.append((x, y, x + random.randrange(1, 8), y + random.randrange(1, 8)))
+        expected = [(a, b) for a in range(count) for b in range(a + 1, count)
+                    if rects[a][0] < rects[b][2] and rects[b][0] < rects[a][2] and
+                    rects[a][1] < rects[b][3] and rects[b][1] < rects[a][3]]
+        assert atlas_reader.find_overlaps(*zip(*rects)) == expected
+    # touching frames don't overlap
+    assert atlas_reader.find_overlaps([0, 4, 0], [0, 0, 4], [4, 8, 4], [4, 4, 8]) == []
+
+def test_frames_are_only_built_when_used():
+    atlas = atlas_reader.read_json(json.dumps(JSON_ARRAY))
+    assert atlas_reader.validate_atlas(atlas) == []
+    assert atlas._records is not None
+    assert [frame.name for frame in atlas.frames] == ["hero", "door"]
+    assert atlas._records is None and len(atlas) == 2
+
+def test_read_atlas_by_extension(tmp_path):
+    filename = tmp_path / "sprites.atlas"
+    filename.write_text(LIBGDX, encoding='utf-8')
+    assert len(atlas_reader.read_atlas(str(filename)).frames) == 2
+    assert atlas_reader.main([str(filename)]) == 0
@@ -0,0 +1,49 @@
+import os
+
+import atlas_reader
+import atlas_unpack
+
+def sprite_pixels(w, h):
+    # every pixel different, the value is its position
+    return [[bytes([x, y, 7, 255]) for x in range(w)] for y in range(h)]
+
+def atlas_pixels(rows, width, height, x0, y0):
+    pixels = bytearray(width * height * 4)
+    for r, row in enumerate(rows):
+        for c, pixel in enumerate(row):
+            i = ((y0 + r) * width + x0 + c) * 4
+            pixels[i:i + 4] = pixel
+    return bytes(pixels)
+
+def flat(rows):
+    return b''.join(b''.join(row) for row in rows)
+
+def test_unpack_plain_frame():
+    sprite = sprite_pixels(3, 2)
+    frame = atlas_reader.AtlasFrame("plain", 1, 2, 3, 2)
+    assert atlas_unpack.unpack_frame(atlas_pixels(sprite, 6, 6, 1, 2), 6, frame) == (3, 2, flat(sprite))
+
+def test_unpack_rotated_frames():
+    w, h = 3, 2
+    sprite = sprite_pixels(w, h)
+    # turned clockwise, the region is h wide and w high
+    clockwise = [[sprite[h - 1 - c][r] for c in range(h)] for r in range(w)]
+    counter = [[sprite[c][w - 1 - r] for c in range(h)] for r in range(w)]
+    for rotated, region in ((90, clockwise), (270, counter)):
+        frame = atlas_reader.AtlasFrame("turned", 2, 1, w, h, rotated)
+        assert atlas_unpack.unpack_frame(atlas_pixels(region, 5, 5, 2, 1), 5, frame) == (w, h, flat(sprite)), rotated
+
+def test_unpack_trimmed_frame_restores_source_size():
+    sprite = sprite_pixels(2, 2)
+    frame = atlas_reader.AtlasFrame("trimmed", 0, 0, 2, 2)
+    frame.source_x, frame.source_y, frame.source_w, frame.source_h = 1, 2, 4, 5
+    w, h, pixels = atlas_unpack.unpack_frame(atlas_pixels(sprite, 4, 4, 0, 0), 4, frame)
+    assert (w, h) == (4, 5)
+    expected = [[bytes(4)] * 4 for _ in range(5)]
+    for r in range(2):
+        expected[2 + r][1:3] = sprite[r]
+    assert pixels == flat(expected)
+
+def test_frame_filename_stays_in_the_output_folder():
+    assert atlas_unpack.frame_filename(atlas_reader.AtlasFrame("../../etc/x", 0, 0, 1, 1)) == os.path.join("etc", "x.png")
+    assert atlas_unpack.frame_filename(atlas_reader.AtlasFrame("walk", 0, 0, 1, 1, index=3)) == "walk_3.png"
@@ -0,0 +1,87 @@
+import importlib.util
+import os
+import random
+import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_plugin():
+    # The plug-in needs the GIMP bindings to run, but packing and metadata are plain Python.
+    # Load it with empty gi modules, only the names used while importing have to exist.
+    gi = types.ModuleType('gi')
+    gi.require_version = lambda *args: None
+    repository = types.ModuleType('gi.repository')
+    for name in ('Gimp', 'GimpUi', 'GObject', 'GLib', 'Gio', 'Gegl'):
+        setattr(repository, name, types.SimpleNamespace())
+    repository.Gimp.PlugIn = type('PlugIn', (), {'__gtype__': None})
+    repository.Gimp.main = lambda *args: None
+    gi.repository = repository
+    spec = importlib.util.spec_from_file_location('create_spriteatlas', os.path.join(ROOT, 'create_spriteatlas.py'))
+    plugin = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(sys.modules, {'gi': gi, 'gi.repository': repository}):
+        spec.loader.exec_module(plugin)
+    return plugin
+
+@pytest.fixture
+def plugin():
+    # a fresh module for every test, the plug-in keeps its settings in module globals
+    return load_plugin()
+
+def test_calc_animations_groups_numbered_sprites(plugin):
+    plugin.layer_rects = [plugin.imgRect(name, 4, 4, i, None)
+                          for i, name in enumerate(["walk_0002", "walk_0001", "jump-1", "jump-3", "logo2", "idle"])]
+    animations = plugin.calc_animations()
+    assert {name: [obj.name for obj in frames] for name, frames in animations.items()} == {
+        "jump": ["jump-1", "jump-3"], "walk": ["walk_0001", "walk_0002"]}
+    # a single numbered sprite is not an animation
+    logo = plugin.layer_rects[4]
+    assert (logo.anim_name, logo.anim_index) == (None, -1)
+    assert plugin.layer_rects[0].anim_index == 2
+
+def test_coordinates_are_published_after_the_image(plugin, tmp_path):
+    plugin.layer_rects = []
+    basename = str(tmp_path / "sprites")
+    for exported in (False, True):
+        executor = ThreadPoolExecutor(1)
+        coordinates, pending = plugin.start_spriteatlas_coordinates(executor, "XML", basename, "sprites", 4, 4)
+        executor.shutdown()
+        assert not os.path.exists(basename + ".xml")
+        plugin.publish_spriteatlas_coordinates(coordinates, pending, "XML", basename, exported)
+        assert os.listdir(str(tmp_path)) == (["sprites.xml"] if exported else [])
+
+def pack_sizes(plugin, max_trials):
+    random.seed(5)
+    plugin.layer_rects = [plugin.imgRect(f"s{i}", random.randint(2, 40), random.randint(2, 40), i, None)
+                          for i in range(40)]
+    result = plugin.calc_best_packing(max_trials)
+    return result, plugin.calc_spriteatlas_size(), [(obj.name, obj.pack_x, obj.pack_y) for obj in plugin.layer_rects]
+
+def test_calc_best_packing_tries_a_fixed_list(plugin):
+    assert pack_sizes(plugin, 1)[0] == ("Height", 100)
+    (order, width_percent), (img_w, img_h), layout = pack_sizes(plugin, len(plugin.PACKING_TRIALS))
+    # each trial again on its own, the best one is selected
+    areas = {}
+    for trial_width, trial_order in plugin.PACKING_TRIALS:
+        plugin.layer_rects.sort(key=plugin.PACKING_ORDERS[trial_order])
+        plugin.calc_layers_packing_fit(plugin.calc_start_width(plugin.layer_rects, trial_width))
+        w, h = plugin.calc_spriteatlas_size()
+        areas[(trial_width, trial_order)] = w * h
+    assert img_w * img_h == areas[(width_percent, order)] == min(areas.values())
+    assert pack_sizes(plugin, len(plugin.PACKING_TRIALS))[2] == layout
+
+def test_stable_key_does_not_depend_on_layer_order(plugin):
+    sizes = [("b", 4, 8), ("a", 4, 8), ("c", 6, 8), ("d", 9, 2), ("a", 4, 8)]
+    orders = []
+    for shuffle in range(5):
+        rects = [plugin.imgRect(name, w, h, i, None) for i, (name, w, h) in enumerate(sizes)]
+        rects[1].digest, rects[4].digest = b'\x02', b'\x01'
+        random.Random(shuffle).shuffle(rects)
+        rects.sort(key=plugin.imgRect.stable_key)
+        orders.append([(obj.name, obj.width, obj.height, obj.digest) for obj in rects])
+    assert orders[0] == [("c", 6, 8, b''), ("a", 4, 8, b'\x01'), ("a", 4, 8, b'\x02'), ("b", 4, 8, b''), ("d", 9, 2, b'')]
+    assert all(order == orders[0] for order in orders)
@@ -0,0 +1,131 @@
+import random
+
+import pixel_ops
+
+def rgba(*pixels):
+    return bytes(v for pixel in pixels for v in pixel)
+
+def test_bleed_alpha_fills_neighbours_and_keeps_alpha():
+    # 3x1, red visible pixel in the middle
+    pixels = rgba((0, 0, 0, 0), (200, 10, 20, 255), (0, 0, 0, 0))
+    bled = pixel_ops.bleed_alpha(pixels, 3, 1, 1)
+    assert bytes(bled) == rgba((200, 10, 20, 0), (200, 10, 20, 255), (200, 10, 20, 0))
+
+def test_bleed_alpha_spreads_one_pixel_per_iteration():
+    pixels = rgba((0, 0, 0, 0), (0, 0, 0, 0), (0, 0, 0, 0), (50, 60, 70, 255))
+    assert bytes(pixel_ops.bleed_alpha(pixels, 4, 1, 1))[:8] == bytes(8)
+    assert bytes(pixel_ops.bleed_alpha(pixels, 4, 1, 3))[:4] == rgba((50, 60, 70, 0))
+
+def test_bleed_alpha_averages_the_8_neighbours():
+    # 3x3 with visible pixels in two corners, the center gets the rounded average
+    pixels = bytearray(9 * 4)
+    pixels[0:4] = rgba((10, 20, 30, 255))
+    pixels[32:36] = rgba((21, 40, 61, 1))
+    bled = pixel_ops.bleed_alpha(pixels, 3, 3, 1)
+    assert bled[16:20] == rgba((16, 30, 46, 0))
+    # next to one corner only
+    assert bled[4:8] == rgba((10, 20, 30, 0))
+
+def reference_bleed(pixels, width, height, iterations):
+    # straightforward per-pixel version of the alpha bleeding
+    pixels = bytearray(pixels)
+    known = [pixels[i * 4 + 3] > 0 for i in range(width * height)]
+    for _ in range(iterations):
+        frontier = []
+        for y in range(height):
+            for x in range(width):
+                if known[y * width + x]:
+                    continue
+                near = [(nx, ny) for ny in range(max(y - 1, 0), min(y + 2, height))
+                        for nx in range(max(x - 1, 0), min(x + 2, width)) if known[ny * width + nx]]
+                if near:
+                    frontier.append((x, y, near))
+        for x, y, near in frontier:
+            for c in range(3):
+                total = sum(pixels[(ny * width + nx) * 4 + c] for nx, ny in near)
+                pixels[(y * width + x) * 4 + c] = (total + len(near) // 2) // len(near)
+        for x, y, _ in frontier:
+            known[y * width + x] = True
+    return pixels
+
+def test_bleed_alpha_matches_reference():
+    rng = random.Random(5)
+    width, height = 23, 17
+    pixels = bytearray(rng.randrange(256) for _ in range(width * height * 4))
+    for i in range(width * height):
+        if rng.random() < 0.9:
+            pixels[i * 4 + 3] = 0
+    for iterations in (1, 2, 5):
+        assert bytes(pixel_ops.bleed_alpha(pixels, width, height, iterations)) == bytes(reference_bleed(pixels, width, height, iterations))
+
+def test_transparent_colors_only_keeps_alpha_zero_pixels():
+    pixels = rgba((1, 2, 3, 0), (4, 5, 6, 7))
+    assert pixel_ops.transparent_colors(pixels) == rgba((1, 2, 3, 0), (0, 0, 0, 0))
+
+def test_watermark_fits_the_block_both_ways():
+    w, h = pixel_ops.WATERMARK_WIDTH, pixel_ops.WATERMARK_HEIGHT
+    horizontal = pixel_ops.draw_watermark(bytes(w * h * 4), True)
+    vertical = pixel_ops.draw_watermark(bytes(w * h * 4), False)
+    assert len(horizontal) == len(vertical) == w * h * 4
+    # the same pixels, turned clockwise
+    for y in range(h):
+        for x in range(w):
+            i = (y * w + x) * 4
+            j = (x * h + (h - 1 - y)) * 4
+            assert horizontal[i:i + 4] == vertical[j:j + 4]
+    assert horizontal.count(b'\xff\xff\xff\xff') == sum(bin(bits).count('1') for bits in pixel_ops.WATERMARK_COLUMNS)
+
+def hull_contains(hull, points):
+    n = len(hull)
+    return all(pixel_ops.cross(hull[i], hull[(i + 1) % n], p) >= 0 for i in range(n) for p in points)
+
+def test_alpha_hull_contains_all_visible_pixels():
+    width = height = 8
+    pixels = bytearray(width * height * 4)
+    visible = ((2, 1), (5, 2), (6, 6), (1, 5))
+    for x, y in visible:
+        pixels[(y * width + x) * 4 + 3] = 255
+    hull = pixel_ops.alpha_hull(bytes(pixels), width, height, 8)
+    assert len(hull) <= 8
+    assert hull_contains(hull, [(x + dx, y + dy) for x, y in visible for dx in (0, 1) for dy in (0, 1)])
+    assert pixel_ops.fan_triangles(len(hull)) == [(0, i, i + 1) for i in range(1, len(hull) - 1)]
+
+def test_alpha_hull_stays_convex_after_rounding():
+    # rounding the reduced hull outwards turns one of these vertices into a reflex one
+    width = height = 10
+    pixels = bytearray(width * height * 4)
+    visible = ((5, 5), (4, 5), (0, 3), (4, 2), (2, 8), (2, 7), (3, 1))
+    for x, y in visible:
+        pixels[(y * width + x) * 4 + 3] = 255
+    hull = pixel_ops.alpha_hull(bytes(pixels), width, height, 7)
+    n = len(hull)
+    assert all(pixel_ops.cross(hull[i - 2], hull[i - 1], hull[i]) > 0 for i in range(n))
+    assert hull_contains(hull, [(x + dx, y + dy) for x, y in visible for dx in (0, 1) for dy in (0, 1)])
+
+def test_alpha_hull_of_empty_and_full_sprites():
+    assert pixel_ops.alpha_hull(bytes(4 * 4 * 4), 4, 4, 8) is None
+    assert sorted(pixel_ops.alpha_hull(b'\xff' * 4 * 3 * 4, 4, 3, 8)) == [(0, 0), (0, 3), (4, 0), (4, 3)]
+
+def test_analyze_channels():
+    # opaque, gray, white
+    assert pixel_ops.analyze_channels(rgba((5, 5, 5, 255), (9, 9, 9, 255))) == (True, True, False)
+    assert pixel_ops.analyze_channels(rgba((5, 6, 5, 255))) == (True, False, False)
+    # transparent pixels don't count for the color
+    assert pixel_ops.analyze_channels(rgba((255, 255, 255, 10), (3, 4, 5, 0))) == (False, True, True)
+
+def test_quantize_pixels_rgb565_is_opaque_and_on_levels():
+    pixels = bytes(range(256)) * 4
+    quantized = pixel_ops.quantize_pixels(pixels, 256, 1, "RGB565")
+    assert set(quantized[3::4]) == {255}
+    assert len(set(quantized[0::4])) <= 32
+    assert len(set(quantized[1::4])) <= 64
+
+def test_quantize_pixels_rgba4444_dither_keeps_the_average():
+    gradient = bytes(v for x in range(256) for v in (x, x, x, 255))
+    quantized = pixel_ops.quantize_pixels(gradient * 4, 256, 4, "RGBA4444")
+    assert set(quantized) <= {level * 17 for level in range(16)}
+    assert abs(sum(quantized[0::4]) / 1024 - 127.5) < 1
+
+def test_quantize_pixels_alpha_is_white():
+    quantized = pixel_ops.quantize_pixels(rgba((1, 2, 3, 4)), 1, 1, "Alpha")
+    assert bytes(quantized) == rgba((255, 255, 255, 4))
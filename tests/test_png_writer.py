@@ -0,0 +1,149 @@
+import io
+import random
+import struct
+import zlib
+
+import png_writer
+
+def chunks(data):
+    # chunk types and data of a PNG file
+    assert data.startswith(png_writer.PNG_SIGNATURE)
+    pos = len(png_writer.PNG_SIGNATURE)
+    found = []
+    while pos < len(data):
+        length = struct.unpack_from('>I', data, pos)[0]
+        chunk_type = data[pos + 4:pos + 8]
+        chunk_data = data[pos + 8:pos + 8 + length]
+        assert struct.unpack_from('>I', data, pos + 8 + length)[0] == zlib.crc32(chunk_type + chunk_data)
+        found.append((chunk_type, chunk_data))
+        pos += 12 + length
+    return found
+
+def write_simple_png(filename, width, height, pixels):
+    # unfiltered RGBA PNG in one IDAT chunk
+    stride = width * 4
+    raw = b''.join(b'\0' + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    with open(filename, 'wb') as outputfile:
+        outputfile.write(png_writer.PNG_SIGNATURE)
+        outputfile.write(png_writer.png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        outputfile.write(png_writer.png_chunk(b'IDAT', zlib.compress(raw)))
+        outputfile.write(png_writer.png_chunk(b'IEND', b''))
+
+def test_add_text_chunks_after_header(tmp_path):
+    filename = tmp_path / "text.png"
+    write_simple_png(filename, 2, 2, bytes(range(16)))
+    before = chunks(filename.read_bytes())
+    png_writer.add_text_chunks(filename, [("Software", "test"), ("BuildHash", "abc")])
+    after = chunks(filename.read_bytes())
+    assert after == before[:1] + [(b'tEXt', b'Software\0test'), (b'tEXt', b'BuildHash\0abc')] + before[1:]
+
+def test_add_text_chunks_rejects_other_files(tmp_path):
+    filename = tmp_path / "text.png"
+    filename.write_bytes(b'GIF89a')
+    try:
+        png_writer.add_text_chunks(filename, [("Software", "test")])
+    except ValueError:
+        return
+    raise AssertionError("not a PNG file")
+
+def test_stream_writer_writes_rows_in_parts(tmp_path):
+    width, height = 13, 7
+    pixels = bytes((i * 7) & 0xff for i in range(width * height * 4))
+    filename = tmp_path / "atlas.png"
+    with open(filename, 'wb') as outputfile:
+        writer = png_writer.PngStreamWriter(outputfile, width, height, chunk_size=64)
+        writer.write_rows(pixels[:width * 4 * 3])
+        writer.write_rows(pixels[width * 4 * 3:])
+        writer.close([("Software", "test")])
+    found = chunks(filename.read_bytes())
+    assert found[0] == (b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+    assert [chunk_type for chunk_type, _ in found[-2:]] == [b'tEXt', b'IEND']
+    idat = [data for chunk_type, data in found if chunk_type == b'IDAT']
+    raw = zlib.decompress(b''.join(idat))
+    stride = width * 4 + 1
+    assert all(raw[y * stride] == 0 for y in range(height))
+    assert b''.join(raw[y * stride + 1:(y + 1) * stride] for y in range(height)) == pixels
+
+def test_stream_writer_checks_the_row_count():
+    writer = png_writer.PngStreamWriter(io.BytesIO(), 2, 2)
+    try:
+        writer.write_rows(bytes(12))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("partial row not detected")
+    writer.write_rows(bytes(8))
+    try:
+        writer.close()
+    except ValueError:
+        return
+    raise AssertionError("missing rows not detected")
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    return a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+
+def filter_row(filter_type, row, prior, bpp):
+    # reference PNG filters, to check the decoder with every filter type
+    out = bytearray()
+    for i, value in enumerate(row):
+        a = row[i - bpp] if i >= bpp else 0
+        b = prior[i]
+        c = prior[i - bpp] if i >= bpp else 0
+        predictor = (0, a, b, (a + b) // 2, paeth(a, b, c))[filter_type]
+        out.append((value - predictor) & 0xff)
+    return bytes(out)
+
+def write_filtered_png(filename, width, height, pixels):
+    # every row uses the next filter type
+    stride = width * 4
+    raw = b''
+    prior = bytes(stride)
+    for y in range(height):
+        row = pixels[y * stride:(y + 1) * stride]
+        filter_type = y % 5
+        raw += bytes([filter_type]) + filter_row(filter_type, row, prior, 4)
+        prior = row
+    with open(filename, 'wb') as outputfile:
+        outputfile.write(png_writer.PNG_SIGNATURE)
+        outputfile.write(png_writer.png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        outputfile.write(png_writer.png_chunk(b'IDAT', zlib.compress(raw)))
+        outputfile.write(png_writer.png_chunk(b'IEND', b''))
+
+def random_pixels(width, height, seed):
+    rng = random.Random(seed)
+    return bytes(rng.randrange(256) for _ in range(width * height * 4))
+
+def test_read_png_all_filter_types(tmp_path):
+    width, height = 9, 10
+    pixels = random_pixels(width, height, 2)
+    filename = tmp_path / "filtered.png"
+    write_filtered_png(filename, width, height, pixels)
+    assert png_writer.read_png(filename) == (width, height, pixels)
+
+def test_unfilter_row_every_pixel_size():
+    rng = random.Random(4)
+    for bpp in (1, 2, 3, 4):
+        prior = bytes(rng.randrange(256) for _ in range(bpp * 11))
+        row = bytes(rng.randrange(256) for _ in range(bpp * 11))
+        for filter_type in range(5):
+            assert png_writer.unfilter_row(filter_type, filter_row(filter_type, row, prior, bpp), prior, bpp) == row
+
+def test_paeth_table_matches_predictor():
+    offsets, _ = png_writer.paeth_tables()
+    for a in range(0, 256, 5):
+        for b in range(0, 256, 3):
+            for c in range(0, 256, 3):
+                assert c + offsets[(a - c + 255) * 512 + b - c + 255] == paeth(a, b, c)
+
+def test_read_png_of_stream_writer(tmp_path):
+    width, height = 13, 7
+    pixels = random_pixels(width, height, 1)
+    filename = tmp_path / "atlas.png"
+    with open(filename, 'wb') as outputfile:
+        writer = png_writer.PngStreamWriter(outputfile, width, height)
+        writer.write_rows(pixels)
+        writer.close()
+    png_writer.add_text_chunks(filename, [("BuildHash", "abc")])
+    assert png_writer.read_png(filename) == (width, height, pixels)
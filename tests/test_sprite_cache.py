@@ -0,0 +1,74 @@
+import os
+
+import sprite_cache
+
+def write_sprite_file(folder, name, data=b'png'):
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as outputfile:
+        outputfile.write(data)
+    return path
+
+def test_put_and_get(tmp_path):
+    cache = sprite_cache.SpriteCache(str(tmp_path / "cache"))
+    path = write_sprite_file(str(tmp_path), "hero.png")
+    assert cache.get(path) is None
+    cache.put(path, 2, 1, bytes(range(8)))
+    with cache.get(path) as sprite:
+        assert (sprite.width, sprite.height, bytes(sprite.pixels)) == (2, 1, bytes(range(8)))
+    # a changed file is a cache miss
+    write_sprite_file(str(tmp_path), "hero.png", b'changed png')
+    assert cache.get(path) is None
+
+def test_touched_file_is_checked_by_content(tmp_path):
+    cache = sprite_cache.SpriteCache(str(tmp_path / "cache"))
+    path = write_sprite_file(str(tmp_path), "hero.png")
+    cache.put(path, 2, 1, bytes(8))
+    os.utime(path, ns=(10**9, 10**9))
+    with cache.get(path) as sprite:
+        assert sprite.source_mtime == 10**9
+    # same size, other content
+    write_sprite_file(str(tmp_path), "hero.png", b'PNG')
+    os.utime(path, ns=(2 * 10**9, 2 * 10**9))
+    assert cache.get(path) is None
+
+def test_trim_bounds(tmp_path):
+    cache = sprite_cache.SpriteCache(str(tmp_path / "cache"))
+    path = write_sprite_file(str(tmp_path), "hero.png")
+    pixels = bytearray(4 * 3 * 4)
+    pixels[(1 * 4 + 1) * 4 + 3] = 255
+    pixels[(2 * 4 + 2) * 4 + 3] = 10
+    cache.put(path, 4, 3, bytes(pixels))
+    with cache.get(path) as sprite:
+        assert sprite.trim == (1, 1, 2, 2)
+        assert sprite.digest == sprite_cache.file_digest(path)
+    cache.put(path, 4, 3, bytes(4 * 3 * 4))
+    with cache.get(path) as sprite:
+        assert sprite.trim == (0, 0, 0, 0)
+
+def test_invalid_cache_file_is_a_miss(tmp_path):
+    cache = sprite_cache.SpriteCache(str(tmp_path / "cache"))
+    path = write_sprite_file(str(tmp_path), "hero.png")
+    with open(cache.cache_filename(path), 'wb') as outputfile:
+        outputfile.write(b'GSAC' + bytes(20))
+    assert cache.get(path) is None
+
+def test_evict_keeps_total_size(tmp_path):
+    entry_size = sprite_cache.CACHE_HEADER.size + 400
+    cache = sprite_cache.SpriteCache(str(tmp_path / "cache"), max_bytes=entry_size * 4)
+    paths = [write_sprite_file(str(tmp_path), f"{i}.png", bytes([i])) for i in range(6)]
+    for i, path in enumerate(paths):
+        cache.put(path, 10, 10, bytes(400))
+        os.utime(cache.cache_filename(path), ns=(i * 10**9, i * 10**9))
+    assert cache.total_bytes == sum(size for _, size, _ in cache.entries()) <= entry_size * 4
+    # the most recently used sprite is kept
+    assert cache.get(paths[-1]) is not None
+    assert cache.get(paths[0]) is None
+    assert sprite_cache.SpriteCache(cache.folder, cache.max_bytes).total_bytes == cache.total_bytes
+
+def test_overwrite_keeps_total_size(tmp_path):
+    cache = sprite_cache.SpriteCache(str(tmp_path / "cache"))
+    path = write_sprite_file(str(tmp_path), "hero.png")
+    for _ in range(3):
+        cache.put(path, 10, 10, bytes(400))
+    assert cache.total_bytes == sprite_cache.CACHE_HEADER.size + 400
+    assert os.listdir(cache.folder) == [os.path.basename(cache.cache_filename(path))]
@@ -0,0 +1,25 @@
+import os
+
+import sprite_watch
+
+def test_changed_files():
+    old = {"a.png": (1, 10), "b.png": (1, 10), "c.png": (1, 10)}
+    new = {"a.png": (1, 10), "b.png": (2, 10), "d.png": (1, 5)}
+    assert sprite_watch.changed_files(old, new) == ["b.png", "c.png", "d.png"]
+
+def test_snapshot_only_has_png_files(tmp_path):
+    (tmp_path / "hero.PNG").write_bytes(b'1')
+    (tmp_path / "notes.txt").write_bytes(b'2')
+    (tmp_path / "sub.png").mkdir()
+    assert list(sprite_watch.folder_snapshot(str(tmp_path))) == [str(tmp_path / "hero.PNG")]
+    assert sprite_watch.folder_snapshot(str(tmp_path / "gone")) == {}
+
+def test_wait_reports_a_burst_once(tmp_path):
+    folder = str(tmp_path)
+    watcher = sprite_watch.FolderWatcher([folder], debounce=0.1, interval=0.01)
+    assert watcher.wait(timeout=0.05) == {}
+    for i in range(3):
+        (tmp_path / f"{i}.png").write_bytes(b'png')
+    changes = watcher.wait(timeout=1)
+    assert changes == {folder: [os.path.join(folder, f"{i}.png") for i in range(3)]}
+    assert watcher.poll() == {}
@@ -0,0 +1,83 @@
+import struct
+
+import pixel_ops
+import texture_container
+
+def gradient(width, height):
+    return bytes((x * 16 + c * 40) & 0xff if c < 3 else (y * 60) & 0xff
+                 for y in range(height) for x in range(width) for c in range(4))
+
+def ktx2_header(filename):
+    data = open(filename, 'rb').read()
+    assert data[:12] == texture_container.KTX2_IDENTIFIER
+    vk_format, type_size, width, height = struct.unpack_from('<4I', data, 12)
+    dfd_offset, dfd_length = struct.unpack_from('<II', data, 48)
+    data_offset, data_length = struct.unpack_from('<QQ', data, 80)
+    return vk_format, type_size, width, height, data[dfd_offset:dfd_offset + dfd_length], data[data_offset:data_offset + data_length]
+
+def check_ktx2(tmp_path, expected):
+    # vkFormat, typeSize and level size for each compression
+    pixels = gradient(8, 4)
+    for compression, (vk_format, type_size, size) in expected.items():
+        filename = tmp_path / f"{compression}.ktx2"
+        texture_container.write_ktx2(filename, pixels, 8, 4, compression)
+        fmt, ts, width, height, dfd, data = ktx2_header(filename)
+        assert (fmt, ts, width, height, len(data)) == (vk_format, type_size, 8, 4, size), compression
+        # the descriptor starts with its total size
+        assert struct.unpack_from('<I', dfd, 0)[0] == len(dfd)
+
+def test_ktx2_format_and_type_size(tmp_path):
+    check_ktx2(tmp_path, {"RGBA8": (43, 1, 128), "BC3": (138, 1, 32)})
+
+def test_ktx2_rgba8_keeps_pixels(tmp_path):
+    pixels = gradient(8, 4)
+    filename = tmp_path / "rgba.ktx2"
+    texture_container.write_ktx2(filename, pixels, 8, 4, "RGBA8")
+    assert ktx2_header(filename)[5] == pixels
+
+def test_dds_rgba8_masks_and_pitch(tmp_path):
+    filename = tmp_path / "rgba.dds"
+    pixels = gradient(4, 4)
+    texture_container.write_dds(filename, pixels, 4, 4)
+    data = open(filename, 'rb').read()
+    assert data[:4] == b'DDS '
+    assert struct.unpack_from('<I', data, 4 + 16)[0] == 16
+    assert struct.unpack_from('<4I', data, 4 + 88) == (0x000000ff, 0x0000ff00, 0x00ff0000, 0xff000000)
+    assert data[128:] == pixels
+
+def test_bc3_solid_block():
+    # one solid color block keeps the 565 color and exact alpha
+    block = texture_container.encode_bc3(bytes([255, 0, 0, 128]) * 16, 4, 4)
+    assert len(block) == 16
+    assert block[0] == block[1] == 128
+    c0, _ = struct.unpack_from('<HH', block, 8)
+    assert texture_container.rgb_from_565(c0) == (255, 0, 0)
+
+def test_bc3_is_16_bytes_per_block():
+    assert len(texture_container.encode_bc3(gradient(8, 4), 8, 4)) == 32
+
+def test_ktx2_packed_formats(tmp_path):
+    # 16-bit packed formats have a typeSize of 2
+    check_ktx2(tmp_path, {"RGB565": (4, 2, 64), "RGBA4444": (2, 2, 64), "A8": (9, 1, 32)})
+
+def test_ktx2_a8_has_swizzle(tmp_path):
+    filename = tmp_path / "a8.ktx2"
+    texture_container.write_ktx2(filename, gradient(4, 4), 4, 4, "A8")
+    assert b'KTXswizzle\x00111r\x00' in open(filename, 'rb').read()
+
+def test_rgb565_values_decode_to_the_quantized_pixels():
+    quantized = pixel_ops.quantize_pixels(gradient(8, 4), 8, 4, "RGB565")
+    data = texture_container.encode_texture(quantized, 8, 4, "RGB565")
+    for i in range(32):
+        value = struct.unpack_from('<H', data, i * 2)[0]
+        r, g, b = value >> 11, (value >> 5) & 63, value & 31
+        assert ((r * 255 + 15) // 31, (g * 255 + 31) // 63, (b * 255 + 15) // 31) == tuple(quantized[i * 4:i * 4 + 3])
+
+def test_dds_rgba4444_is_a4r4g4b4(tmp_path):
+    filename = tmp_path / "argb.dds"
+    texture_container.write_dds(filename, bytes([0x11, 0x22, 0x33, 0x44]) * 16, 4, 4, "RGBA4444")
+    data = open(filename, 'rb').read()
+    flags, _, bits, r_mask, g_mask, b_mask, a_mask = struct.unpack_from('<I4sIIIII', data, 4 + 76)
+    assert (bits, r_mask, g_mask, b_mask, a_mask) == (16, 0x0f00, 0x00f0, 0x000f, 0xf000)
+    assert flags == texture_container.DDPF_RGB | texture_container.DDPF_ALPHAPIXELS
+    assert struct.unpack_from('<H', data, 128)[0] == 0x4123
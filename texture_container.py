@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# GPU texture containers for the GIMP SpriteAtlas plug-in
+# write the atlas pixels as DDS or KTX2 file, uncompressed RGBA8, packed RGB565 or RGBA4444,
+# alpha-only A8 or BC3 (DXT5)
+# plain Python, no GIMP dependencies, pixels are 8-bit RGBA rows top to bottom
+
+import operator
+import struct
+
+KTX2_IDENTIFIER = b'\xabKTX 20\xbb\r\n\x1a\n'
+
+# Vulkan formats used in KTX2
+VK_FORMAT_R4G4B4A4_UNORM_PACK16 = 2
+VK_FORMAT_R5G6B5_UNORM_PACK16 = 4
+VK_FORMAT_R8_UNORM = 9
+VK_FORMAT_R8G8B8A8_SRGB = 43
+VK_FORMAT_BC3_SRGB_BLOCK = 138
+
+VK_FORMATS = {"RGBA8": VK_FORMAT_R8G8B8A8_SRGB, "RGB565": VK_FORMAT_R5G6B5_UNORM_PACK16,
+              "RGBA4444": VK_FORMAT_R4G4B4A4_UNORM_PACK16, "A8": VK_FORMAT_R8_UNORM, "BC3": VK_FORMAT_BC3_SRGB_BLOCK}
+# bytes per pixel of the uncompressed formats
+PIXEL_SIZES = {"RGBA8": 4, "RGB565": 2, "RGBA4444": 2, "A8": 1}
+# KTX2 typeSize, the size of the data type that needs byte swapping on big-endian machines
+KTX2_TYPE_SIZES = {"RGB565": 2, "RGBA4444": 2}
+
+# Khronos data format descriptor values
+KHR_DF_MODEL_RGBSDA = 1
+KHR_DF_MODEL_BC3 = 130
+KHR_DF_PRIMARIES_BT709 = 1
+KHR_DF_TRANSFER_LINEAR = 1
+KHR_DF_TRANSFER_SRGB = 2
+KHR_DF_FLAG_ALPHA_PREMULTIPLIED = 1
+KHR_DF_SAMPLE_DATATYPE_LINEAR = 0x10
+
+# DDS header flags
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_LINEARSIZE = 0x80000
+DDPF_ALPHAPIXELS = 0x1
+DDPF_ALPHA = 0x2
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDSCAPS_TEXTURE = 0x1000
+
+def rgb_to_565(r, g, b):
+    return ((r * 31 + 127) // 255 << 11) | ((g * 63 + 127) // 255 << 5) | ((b * 31 + 127) // 255)
+
+def rgb_from_565(c):
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return (r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)
+
+# BC3 alpha index by position 0..7 from a0 to a1, and BC1 color index by position 0..3 from c0 to c1,
+# positions outside the line, up to COLOR_MARGIN, use the nearest endpoint (the rounded endpoints
+# are at most half a RGB565 step outside the bounding box of the colors, less than 2 positions)
+ALPHA_INDEXES = (0, 2, 3, 4, 5, 6, 7, 1)
+COLOR_MARGIN = 16
+COLOR_INDEXES = (0,) * COLOR_MARGIN + (0, 2, 3, 1) + (1,) * COLOR_MARGIN
+ALPHA_SHIFTS = tuple(range(0, 48, 3))
+COLOR_SHIFTS = tuple(range(0, 32, 2))
+
+def encode_bc3_alpha(alpha):
+    # alpha block, two endpoints and 16 3-bit indices into 8 interpolated values
+    a0 = max(alpha)
+    a1 = min(alpha)
+    bits = 0
+    if a0 > a1:
+        span = a0 - a1
+        half = span // 2
+        indexes = [ALPHA_INDEXES[((a0 - a) * 7 + half) // span] for a in alpha]
+        bits = sum(map(operator.lshift, indexes, ALPHA_SHIFTS))
+    return struct.pack('<BB', a0, a1) + bits.to_bytes(6, 'little')
+
+def encode_bc1_color(reds, greens, blues):
+    # color block of the red, green and blue bytes of 16 pixels, two RGB565 endpoints from the
+    # bounding box and 16 2-bit indices, always in four color mode (c0 > c1) as required for BC3
+    r_min, r_max = min(reds), max(reds)
+    g_min, g_max = min(greens), max(greens)
+    b_min, b_max = min(blues), max(blues)
+    # pick the bounding box diagonal that follows the colors, flip green/blue when they
+    # go down while red (or green, when red is flat) goes up, the covariances are
+    # scaled by the pixel count squared so they stay integers
+    n = len(reds)
+    r_sum, g_sum, b_sum = sum(reds), sum(greens), sum(blues)
+    if r_max > r_min:
+        flip_g = n * sum(map(operator.mul, reds, greens)) < r_sum * g_sum
+        flip_b = n * sum(map(operator.mul, reds, blues)) < r_sum * b_sum
+    else:
+        flip_g = False
+        flip_b = n * sum(map(operator.mul, greens, blues)) < g_sum * b_sum
+    if flip_g:
+        g_min, g_max = g_max, g_min
+    if flip_b:
+        b_min, b_max = b_max, b_min
+    c0 = rgb_to_565(r_max, g_max, b_max)
+    c1 = rgb_to_565(r_min, g_min, b_min)
+    if c0 < c1:
+        c0, c1 = c1, c0
+    bits = 0
+    if c0 != c1:
+        r0, g0, b0 = rgb_from_565(c0)
+        r1, g1, b1 = rgb_from_565(c1)
+        dr = r1 - r0
+        dg = g1 - g0
+        db = b1 - b0
+        length = dr * dr + dg * dg + db * db
+        # position 0..3 along the line from c0 to c1, the offset of c0 is taken out of the sum
+        offset = length // 2 - 3 * (r0 * dr + g0 * dg + b0 * db) + COLOR_MARGIN * length
+        indexes = [COLOR_INDEXES[((r * dr + g * dg + b * db) * 3 + offset) // length]
+                   for r, g, b in zip(reds, greens, blues)]
+        bits = sum(map(operator.lshift, indexes, COLOR_SHIFTS))
+    return struct.pack('<HHI', c0, c1, bits)
+
+def encode_bc3(pixels, width, height):
+    # Compress RGBA pixels to BC3 blocks, width and height must be multiples of 4. Plain Python,
+    # about 1.5 s per megapixel of varied blocks, a block that repeats the one before it (such as
+    # the empty space between sprites) is copied instead of encoded again.
+    if width % 4 or height % 4:
+        raise ValueError(f"BC3 needs a width and height that are multiples of 4, not {width}x{height}")
+    stride = width * 4
+    blocks = bytearray()
+    last_texels = last_block = None
+    for by in range(0, height, 4):
+        rows = [pixels[(by + y) * stride:(by + y + 1) * stride] for y in range(4)]
+        for bx in range(0, stride, 16):
+            texels = b''.join(row[bx:bx + 16] for row in rows)
+            if texels != last_texels:
+                last_texels = texels
+                last_block = encode_bc3_alpha(texels[3::4]) + encode_bc1_color(texels[0::4], texels[1::4], texels[2::4])
+            blocks += last_block
+    return bytes(blocks)
+
+def level_bits_table(bits, shift):
+    # translate table from an 8-bit channel to its value with fewer bits, shifted into place in a byte
+    levels = (1 << bits) - 1
+    return bytes((((v * levels + 127) // 255) << shift) & 0xff for v in range(256))
+
+def or_bytes(a, b):
+    return (int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+def encode_packed16(pixels, compression):
+    # 16-bit little-endian pixels, each byte is put together from two channels with translate tables,
+    # RGB565 is red in the top 5 bits, RGBA4444 is red in the top 4 bits and alpha in the lowest (Vulkan),
+    # ARGB4444 is alpha in the top 4 bits and blue in the lowest (DDS)
+    r, g, b, a = pixels[0::4], pixels[1::4], pixels[2::4], pixels[3::4]
+    if compression == "RGB565":
+        high = or_bytes(r.translate(level_bits_table(5, 3)), g.translate(bytes(v >> 3 for v in level_bits_table(6, 0))))
+        low = or_bytes(g.translate(level_bits_table(6, 5)), b.translate(level_bits_table(5, 0)))
+    elif compression == "ARGB4444":
+        high = or_bytes(a.translate(level_bits_table(4, 4)), r.translate(level_bits_table(4, 0)))
+        low = or_bytes(g.translate(level_bits_table(4, 4)), b.translate(level_bits_table(4, 0)))
+    else:
+        high = or_bytes(r.translate(level_bits_table(4, 4)), g.translate(level_bits_table(4, 0)))
+        low = or_bytes(b.translate(level_bits_table(4, 4)), a.translate(level_bits_table(4, 0)))
+    data = bytearray(len(low) * 2)
+    data[0::2] = low
+    data[1::2] = high
+    return bytes(data)
+
+def encode_texture(pixels, width, height, compression):
+    # returns encoded texture data for "RGBA8", "RGB565", "RGBA4444", "ARGB4444", "A8" or "BC3"
+    if compression == "BC3":
+        return encode_bc3(pixels, width, height)
+    if len(pixels) != width * height * 4:
+        raise ValueError(f"expected {width * height * 4} bytes of RGBA pixels, got {len(pixels)}")
+    pixels = bytes(pixels)
+    if compression in ("RGB565", "RGBA4444", "ARGB4444"):
+        return encode_packed16(pixels, compression)
+    if compression == "A8":
+        return pixels[3::4]
+    return pixels
+
+def write_dds(filename, pixels, width, height, compression="RGBA8"):
+    # DirectDraw Surface with a single mip level, 4-bit RGBA is stored as A4R4G4B4 that DDS readers know
+    data = encode_texture(pixels, width, height, "ARGB4444" if compression == "RGBA4444" else compression)
+    flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT
+    if compression == "BC3":
+        flags |= DDSD_LINEARSIZE
+        pitch = len(data)
+        pixelformat = struct.pack('<II4sIIIII', 32, DDPF_FOURCC, b'DXT5', 0, 0, 0, 0, 0)
+    else:
+        flags |= DDSD_PITCH
+        pitch = width * PIXEL_SIZES[compression]
+        # flags, bit count and red, green, blue, alpha masks
+        masks = {"RGBA8": (DDPF_RGB | DDPF_ALPHAPIXELS, 32, 0x000000ff, 0x0000ff00, 0x00ff0000, 0xff000000),
+                 "RGB565": (DDPF_RGB, 16, 0xf800, 0x07e0, 0x001f, 0),
+                 "RGBA4444": (DDPF_RGB | DDPF_ALPHAPIXELS, 16, 0x0f00, 0x00f0, 0x000f, 0xf000),
+                 "A8": (DDPF_ALPHA, 8, 0, 0, 0, 0xff)}[compression]
+        pixelformat = struct.pack('<II4sIIIII', 32, masks[0], b'\0\0\0\0', *masks[1:])
+    header = struct.pack('<IIIIIII', 124, flags, height, width, pitch, 0, 0) + bytes(4 * 11)
+    header += pixelformat + struct.pack('<IIIII', DDSCAPS_TEXTURE, 0, 0, 0, 0)
+
+    with open(filename, 'wb') as outputfile:
+        outputfile.write(b'DDS ')
+        outputfile.write(header)
+        outputfile.write(data)
+
+def ktx2_data_format_descriptor(compression, premultiplied=False):
+    # basic data format descriptor block for sRGB RGBA8 or BC3,
+    # the packed and A8 formats only exist as UNORM in Vulkan so they use the linear transfer function
+    flags = KHR_DF_FLAG_ALPHA_PREMULTIPLIED if premultiplied else 0
+    alpha_type = KHR_DF_SAMPLE_DATATYPE_LINEAR # alpha is never sRGB encoded
+    transfer = KHR_DF_TRANSFER_SRGB
+    if compression == "BC3":
+        model, block, plane = KHR_DF_MODEL_BC3, (3, 3, 0, 0), 16
+        # bitOffset, bitLength - 1, channelType, sampleLower, sampleUpper
+        samples = [(0, 63, 15 | alpha_type, 0, 0xffffffff), (64, 63, 0, 0, 0xffffffff)]
+    elif compression == "RGB565":
+        model, block, plane, transfer = KHR_DF_MODEL_RGBSDA, (0, 0, 0, 0), 2, KHR_DF_TRANSFER_LINEAR
+        samples = [(0, 4, 2, 0, 31), (5, 5, 1, 0, 63), (11, 4, 0, 0, 31)]
+    elif compression == "RGBA4444":
+        model, block, plane, transfer = KHR_DF_MODEL_RGBSDA, (0, 0, 0, 0), 2, KHR_DF_TRANSFER_LINEAR
+        samples = [(0, 3, 15, 0, 15), (4, 3, 2, 0, 15), (8, 3, 1, 0, 15), (12, 3, 0, 0, 15)]
+    elif compression == "A8":
+        # stored in the red channel, the KTXswizzle key maps it to alpha
+        model, block, plane, transfer = KHR_DF_MODEL_RGBSDA, (0, 0, 0, 0), 1, KHR_DF_TRANSFER_LINEAR
+        samples = [(0, 7, 0, 0, 255)]
+    else:
+        model, block, plane = KHR_DF_MODEL_RGBSDA, (0, 0, 0, 0), 4
+        samples = [(0, 7, 0, 0, 255), (8, 7, 1, 0, 255), (16, 7, 2, 0, 255), (24, 7, 15 | alpha_type, 0, 255)]
+
+    block_size = 24 + 16 * len(samples)
+    dfd = struct.pack('<IHH', 0, 2, block_size)
+    dfd += struct.pack('<BBBB', model, KHR_DF_PRIMARIES_BT709, transfer, flags)
+    dfd += struct.pack('<BBBB', *block)
+    dfd += struct.pack('<8B', plane, 0, 0, 0, 0, 0, 0, 0)
+    for bit_offset, bit_length, channel, lower, upper in samples:
+        dfd += struct.pack('<HBBBBBBII', bit_offset, bit_length, channel, 0, 0, 0, 0, lower, upper)
+    return struct.pack('<I', 4 + len(dfd)) + dfd
+
+def ktx2_key_values(entries):
+    # key/value data, keys sorted and every entry padded to 4 bytes
+    kvd = b''
+    for key in sorted(entries):
+        kv = key.encode('utf-8') + b'\0' + entries[key].encode('utf-8') + b'\0'
+        kvd += struct.pack('<I', len(kv)) + kv
+        kvd += bytes(-len(kvd) % 4)
+    return kvd
+
+def write_ktx2(filename, pixels, width, height, compression="RGBA8", writer="", premultiplied=False):
+    # Khronos KTX2 texture with a single mip level and no supercompression
+    data = encode_texture(pixels, width, height, compression)
+    vk_format = VK_FORMATS[compression]
+    dfd = ktx2_data_format_descriptor(compression, premultiplied)
+    entries = {"KTXorientation": "rd", "KTXwriter": writer or "GIMP SpriteAtlas plug-in"}
+    if compression == "A8":
+        # white sprites with the alpha from the red channel
+        entries["KTXswizzle"] = "111r"
+    kvd = ktx2_key_values(entries)
+
+    # identifier + header (48), index (32), one level (24)
+    dfd_offset = 48 + 32 + 24
+    kvd_offset = dfd_offset + len(dfd)
+    data_offset = kvd_offset + len(kvd)
+    # level data alignment is lcm(texel block size, 4)
+    data_offset += -data_offset % (16 if compression == "BC3" else 4)
+
+    header = KTX2_IDENTIFIER
+    header += struct.pack('<9I', vk_format, KTX2_TYPE_SIZES.get(compression, 1), width, height, 0, 0, 1, 1, 0)
+    header += struct.pack('<IIIIQQ', dfd_offset, len(dfd), kvd_offset, len(kvd), 0, 0)
+    header += struct.pack('<QQQ', data_offset, len(data), len(data))
+    header += dfd + kvd
+    header += bytes(data_offset - len(header))
+
+    with open(filename, 'wb') as outputfile:
+        outputfile.write(header)
+        outputfile.write(data)